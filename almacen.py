@@ -0,0 +1,276 @@
+"""Almacenamiento del grafo: base SQLite (WAL) con las modificaciones y snapshot binario leído con mmap"""
+import json
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+
+from compilado import GrafoCompilado
+
+# magia, versión, ciudades (incluye ids eliminados), conexiones, bytes de metadatos
+CABECERA = struct.Struct('=8sqqqq')
+MAGIA = b'GRAFOCSR'
+
+
+class AlmacenGrafo:
+    def __init__(self, ruta_db, ruta_snapshot=None):
+        self.ruta_db = ruta_db
+        self.ruta_snapshot = ruta_snapshot or ruta_db + '.snapshot'
+        self._lock = threading.Lock()
+        # Los hilos que publican el snapshot a la vez lo escriben de a uno
+        self._lock_snapshot = threading.Lock()
+        self._version_snapshot = None
+        self._conexion = sqlite3.connect(ruta_db, isolation_level=None, check_same_thread=False)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.execute("PRAGMA synchronous=NORMAL")
+        self._conexion.executescript("""
+            CREATE TABLE IF NOT EXISTS ciudades (
+                id INTEGER PRIMARY KEY,
+                nombre TEXT NOT NULL UNIQUE,
+                tipo TEXT NOT NULL DEFAULT 'normal',
+                lat REAL,
+                lon REAL
+            );
+            CREATE TABLE IF NOT EXISTS aristas (
+                id INTEGER PRIMARY KEY,
+                ciudad1 TEXT NOT NULL,
+                ciudad2 TEXT NOT NULL,
+                distancia,
+                tiempo,
+                peaje
+            );
+            CREATE INDEX IF NOT EXISTS aristas_ciudad1 ON aristas(ciudad1);
+            CREATE INDEX IF NOT EXISTS aristas_ciudad2 ON aristas(ciudad2);
+            CREATE TABLE IF NOT EXISTS meta (
+                clave TEXT PRIMARY KEY,
+                valor INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO meta (clave, valor) VALUES ('version', 0);
+        """)
+        # Las ciudades se guardan con el mismo id que les da el Grafo: el
+        # siguiente de un contador que sólo vuelve a 0 al limpiar. Las bases
+        # anteriores conservan sus ids, y su snapshot (con otra numeración) se descarta.
+        if self._conexion.execute(
+                "INSERT OR IGNORE INTO meta (clave, valor) "
+                "SELECT 'siguiente_id', coalesce(max(id) + 1, 0) FROM ciudades").rowcount:
+            if os.path.exists(self.ruta_snapshot):
+                os.remove(self.ruta_snapshot)
+        # Las bases creadas antes de guardar coordenadas no tienen esas columnas
+        columnas = {fila[1] for fila in self._conexion.execute("PRAGMA table_info(ciudades)")}
+        for columna in ('lat', 'lon'):
+            if columna not in columnas:
+                self._conexion.execute(f"ALTER TABLE ciudades ADD COLUMN {columna} REAL")
+
+    def version(self):
+        """Versión actual del grafo guardado"""
+        with self._lock:
+            return self._conexion.execute(
+                "SELECT valor FROM meta WHERE clave = 'version'").fetchone()[0]
+
+    def vacio(self):
+        """Indica si todavía no se guardó ninguna ciudad"""
+        with self._lock:
+            return self._conexion.execute("SELECT 1 FROM ciudades LIMIT 1").fetchone() is None
+
+    def aplicar(self, operaciones):
+        """
+        Aplica una lista de operaciones del Grafo, como
+        ('agregar_arista', ciudad1, ciudad2, distancia, tiempo, peaje), en
+        una sola transacción. Retorna la nueva versión.
+        """
+        with self._lock:
+            cursor = self._conexion.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                for operacion in operaciones:
+                    getattr(self, '_' + operacion[0])(cursor, *operacion[1:])
+                cursor.execute("UPDATE meta SET valor = valor + 1 WHERE clave = 'version'")
+                version = cursor.execute(
+                    "SELECT valor FROM meta WHERE clave = 'version'").fetchone()[0]
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+        return version
+
+    def _registrar(self, cursor, nombre):
+        """Agrega la ciudad si no existe, con el siguiente id (el mismo que en el Grafo)"""
+        if cursor.execute("SELECT 1 FROM ciudades WHERE nombre = ?", (nombre,)).fetchone() is None:
+            cursor.execute("INSERT INTO ciudades (id, nombre) "
+                           "SELECT valor, ? FROM meta WHERE clave = 'siguiente_id'", (nombre,))
+            cursor.execute("UPDATE meta SET valor = valor + 1 WHERE clave = 'siguiente_id'")
+
+    def _agregar_ciudad(self, cursor, nombre, tipo="normal", lat=None, lon=None):
+        self._registrar(cursor, nombre)
+        # Sin coordenadas se conservan las que tuviera la ciudad
+        cursor.execute(
+            "UPDATE ciudades SET tipo = ?, lat = coalesce(?, lat), lon = coalesce(?, lon) "
+            "WHERE nombre = ?", (tipo, lat, lon, nombre))
+
+    def _ubicar_ciudad(self, cursor, nombre, lat, lon):
+        self._registrar(cursor, nombre)
+        cursor.execute("UPDATE ciudades SET lat = ?, lon = ? WHERE nombre = ?", (lat, lon, nombre))
+
+    def _agregar_arista(self, cursor, ciudad1, ciudad2, distancia, tiempo, peaje):
+        for ciudad in (ciudad1, ciudad2):
+            self._registrar(cursor, ciudad)
+        cursor.execute(
+            "UPDATE aristas SET distancia = ?, tiempo = ?, peaje = ? "
+            "WHERE (ciudad1 = ? AND ciudad2 = ?) OR (ciudad1 = ? AND ciudad2 = ?)",
+            (distancia, tiempo, peaje, ciudad1, ciudad2, ciudad2, ciudad1))
+        if cursor.rowcount == 0:
+            cursor.execute(
+                "INSERT INTO aristas (ciudad1, ciudad2, distancia, tiempo, peaje) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (ciudad1, ciudad2, distancia, tiempo, peaje))
+
+    def _eliminar_arista(self, cursor, ciudad1, ciudad2):
+        cursor.execute(
+            "DELETE FROM aristas "
+            "WHERE (ciudad1 = ? AND ciudad2 = ?) OR (ciudad1 = ? AND ciudad2 = ?)",
+            (ciudad1, ciudad2, ciudad2, ciudad1))
+
+    def _eliminar_ciudad(self, cursor, ciudad):
+        cursor.execute("DELETE FROM aristas WHERE ciudad1 = ? OR ciudad2 = ?", (ciudad, ciudad))
+        cursor.execute("DELETE FROM ciudades WHERE nombre = ?", (ciudad,))
+
+    def _limpiar(self, cursor):
+        cursor.execute("DELETE FROM aristas")
+        cursor.execute("DELETE FROM ciudades")
+        cursor.execute("UPDATE meta SET valor = 0 WHERE clave = 'siguiente_id'")
+
+    def cargar(self, ciudades, aristas):
+        """
+        Escribe un grafo completo en una base sin ciudades, en una sola
+        transacción: [(id, nombre, tipo, lat, lon)] con ids 0, 1, 2... y
+        [(ciudad1, ciudad2, distancia, tiempo, peaje)]. Retorna la nueva versión.
+        """
+        with self._lock:
+            cursor = self._conexion.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                if cursor.execute("SELECT 1 FROM ciudades LIMIT 1").fetchone() is not None:
+                    raise ValueError("La base ya tiene ciudades")
+                cursor.executemany(
+                    "INSERT INTO ciudades (id, nombre, tipo, lat, lon) VALUES (?, ?, ?, ?, ?)", ciudades)
+                cursor.executemany(
+                    "INSERT INTO aristas (ciudad1, ciudad2, distancia, tiempo, peaje) "
+                    "VALUES (?, ?, ?, ?, ?)", aristas)
+                cursor.execute("UPDATE meta SET valor = ? WHERE clave = 'siguiente_id'", (len(ciudades),))
+                cursor.execute("UPDATE meta SET valor = valor + 1 WHERE clave = 'version'")
+                version = cursor.execute(
+                    "SELECT valor FROM meta WHERE clave = 'version'").fetchone()[0]
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+        return version
+
+    def leer(self):
+        """
+        Lee el grafo guardado. Retorna (version, ids, ciudades, aristas):
+        `ids` es la cantidad de ids asignados (incluye los de ciudades
+        eliminadas), [(id, nombre, tipo, lat, lon)] en orden de id y
+        [(ciudad1, ciudad2, distancia, tiempo, peaje)] en orden de inserción;
+        lat y lon son None si la ciudad no tiene coordenadas.
+        """
+        with self._lock:
+            cursor = self._conexion.cursor()
+            cursor.execute("BEGIN")
+            try:
+                version = cursor.execute(
+                    "SELECT valor FROM meta WHERE clave = 'version'").fetchone()[0]
+                ids = cursor.execute(
+                    "SELECT valor FROM meta WHERE clave = 'siguiente_id'").fetchone()[0]
+                ciudades = cursor.execute(
+                    "SELECT id, nombre, tipo, lat, lon FROM ciudades ORDER BY id").fetchall()
+                aristas = cursor.execute(
+                    "SELECT ciudad1, ciudad2, distancia, tiempo, peaje "
+                    "FROM aristas ORDER BY id").fetchall()
+            finally:
+                cursor.execute("COMMIT")
+        return version, ids, ciudades, aristas
+
+    def guardar_snapshot(self, compilado, version):
+        """
+        Escribe el snapshot binario de la forma compilada (reemplazo atómico).
+        No hace nada si este proceso ya escribió esa versión o una posterior.
+        """
+        with self._lock_snapshot:
+            if self._version_snapshot is not None and version <= self._version_snapshot:
+                return
+            temporal = f"{self.ruta_snapshot}.{os.getpid()}.tmp"
+            with open(temporal, 'wb') as archivo:
+                for bloque in serializar(compilado, version):
+                    archivo.write(bloque)
+            os.replace(temporal, self.ruta_snapshot)
+            self._version_snapshot = version
+
+    def cargar_snapshot(self):
+        """
+        Abre el snapshot con mmap. Retorna (version, GrafoCompilado) cuyos
+        arreglos apuntan directamente al archivo, o None si no existe.
+        """
+        try:
+            with open(self.ruta_snapshot, 'rb') as archivo:
+                datos = mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        leido = leer_compilado(memoryview(datos))
+        if leido is None:
+            return None
+        leido[1].mapa_memoria = datos  # Mantiene abierto el archivo mapeado
+        return leido
+
+
+def serializar(compilado, version):
+    """
+    Bloques de bytes del formato binario de la forma compilada: cabecera,
+    offsets, destinos, las tres columnas de costos y los nombres, tipos y
+    coordenadas en JSON. Es el formato del snapshot y de la memoria compartida de paralelo.py.
+    """
+    meta = json.dumps({"nombres": compilado.nombres, "tipos": compilado.tipos,
+                       "coordenadas": compilado.coordenadas}).encode('utf-8')
+    destinos = compilado.destinos.tobytes()
+    yield CABECERA.pack(MAGIA, version, len(compilado.nombres), len(compilado.destinos), len(meta))
+    yield compilado.offsets.tobytes()
+    yield destinos
+    yield b'\0' * (-len(destinos) % 8)
+    for columna in compilado.costos[1:]:
+        yield columna.tobytes()
+    yield meta
+
+
+def leer_compilado(vista):
+    """
+    Arma un GrafoCompilado cuyos arreglos apuntan directamente a `vista`
+    (un memoryview con el formato de serializar). Retorna (version,
+    GrafoCompilado), o None si los datos no tienen ese formato.
+    """
+    magia, version, n, m, largo_meta = CABECERA.unpack_from(vista, 0)
+    if magia != MAGIA:
+        return None
+
+    posicion = CABECERA.size
+
+    def tomar(tipo, cantidad, tamano):
+        nonlocal posicion
+        inicio = posicion
+        posicion += cantidad * tamano
+        return vista[inicio:posicion].cast(tipo)
+
+    offsets = tomar('q', n + 1, 8)
+    destinos = tomar('i', m, 4)
+    posicion += -(m * 4) % 8
+    distancias = tomar('d', m, 8)
+    tiempos = tomar('d', m, 8)
+    peajes = tomar('d', m, 8)
+    meta = json.loads(bytes(vista[posicion:posicion + largo_meta]).decode('utf-8'))
+
+    # Los snapshots anteriores a las coordenadas no las traen
+    coordenadas = {nombre: tuple(punto) for nombre, punto in meta.get("coordenadas", {}).items()}
+    compilado = GrafoCompilado(meta["nombres"], meta["tipos"], offsets, destinos,
+                               distancias, tiempos, peajes, coordenadas)
+    return version, compilado
@@ -1,42 +1,279 @@
-from flask import Flask, render_template, request, jsonify
-from grafo import Grafo
+from functools import wraps
+import hashlib
+from itertools import islice
+import os
+import time
+from urllib.parse import urlencode
+
+from flask import Flask, Response, g, make_response, render_template, request, jsonify
+from grafo import Grafo, CRITERIOS, METODOS
+from almacen import AlmacenGrafo
+from cache import CacheRutas
+import espacial
+import metricas
 
 app = Flask(__name__)
 
-# Inicializar grafo con datos de ejemplo
-mapa = Grafo()
+# Límites de las consultas en lote
+MAX_PARES_LOTE = 10000
+MAX_CELDAS_MATRIZ = 250000
+MAX_OPERACIONES_LOTE = 50000
+
+# Máximo de rutas alternativas por consulta (parámetro k)
+MAX_RUTAS_ALTERNATIVAS = 10
+
+# Máximo de ciudades por consulta de ciudades cercanas (parámetro k)
+MAX_CIUDADES_CERCANAS = 100
+
+# Tamaño de página de los listados (por defecto y máximo)
+LIMITE_PAGINA = 100
+MAX_LIMITE_PAGINA = 1000
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Base SQLite donde se guardan ciudades y rutas (el snapshot binario va al lado)
+RUTA_DB = os.environ.get('GRAFO_DB', os.path.join(BASE_DIR, 'grafo.db'))
+
+# Procesos para calcular la tabla de todas las rutas (1: en el mismo proceso)
+PROCESOS_RUTAS = int(os.environ.get('GRAFO_PROCESOS_RUTAS', 1))
+
+# Archivo con las jerarquías de contracción precalculadas (python jerarquia.py)
+RUTA_JERARQUIAS = os.environ.get('GRAFO_JERARQUIAS', os.path.join(BASE_DIR, 'jerarquias.json'))
+
+
+def cargar_datos_iniciales(grafo):
+    """Carga el grafo de ejemplo con los departamentos de Bolivia"""
+    # Agregar departamentos de Bolivia, ubicados en su capital (lat, lon)
+    departamentos_bolivia = {
+        "La Paz": (-16.4955, -68.1336),
+        "Cochabamba": (-17.3895, -66.1568),
+        "Santa Cruz": (-17.7833, -63.1821),
+        "Oruro": (-17.9647, -67.1060),
+        "Potosí": (-19.5836, -65.7531),
+        "Chuquisaca": (-19.0196, -65.2619),
+        "Tarija": (-21.5355, -64.7296),
+        "Beni": (-14.8333, -64.9000),
+        "Pando": (-11.0267, -68.7692)
+    }
+
+    for departamento, (lat, lon) in departamentos_bolivia.items():
+        grafo.agregar_ciudad(departamento, "normal", lat, lon)
 
-# Agregar departamentos de Bolivia
-departamentos_bolivia = [
-    "La Paz", "Cochabamba", "Santa Cruz", "Oruro", "Potosí", 
-    "Chuquisaca", "Tarija", "Beni", "Pando"
-]
+    # Agregar rutas con parámetros realistas (distancia en km, tiempo en minutos, peaje en Bs)
+    # Eje Troncal (La Paz - Santa Cruz)
+    grafo.agregar_arista("La Paz", "Oruro", 230, 180, 10)
+    grafo.agregar_arista("Oruro", "Cochabamba", 204, 240, 15)
+    grafo.agregar_arista("Cochabamba", "Santa Cruz", 473, 420, 20)
 
-for departamento in departamentos_bolivia:
-    mapa.agregar_ciudad(departamento)
+    # Ruta La Paz - Beni - Pando (Norte)
+    grafo.agregar_arista("La Paz", "Beni", 525, 480, 5)
+    grafo.agregar_arista("Beni", "Pando", 598, 720, 0)
 
-# Agregar rutas con parámetros realistas (distancia en km, tiempo en minutos, peaje en Bs)
-# Eje Troncal (La Paz - Santa Cruz)
-mapa.agregar_arista("La Paz", "Oruro", 230, 180, 10)
-mapa.agregar_arista("Oruro", "Cochabamba", 204, 240, 15)
-mapa.agregar_arista("Cochabamba", "Santa Cruz", 473, 420, 20)
+    # Ruta Santa Cruz - Beni
+    grafo.agregar_arista("Santa Cruz", "Beni", 502, 540, 10)
 
-# Ruta La Paz - Beni - Pando (Norte)
-mapa.agregar_arista("La Paz", "Beni", 525, 480, 5)
-mapa.agregar_arista("Beni", "Pando", 598, 720, 0)
+    # Ruta Sur (Potosí - Chuquisaca - Tarija)
+    grafo.agregar_arista("Oruro", "Potosí", 237, 240, 8)
+    grafo.agregar_arista("Potosí", "Chuquisaca", 165, 180, 5)
+    grafo.agregar_arista("Chuquisaca", "Tarija", 250, 300, 12)
 
-# Ruta Santa Cruz - Beni
-mapa.agregar_arista("Santa Cruz", "Beni", 502, 540, 10)
+    # Conexiones adicionales
+    grafo.agregar_arista("Cochabamba", "Chuquisaca", 410, 480, 15)
+    grafo.agregar_arista("Santa Cruz", "Tarija", 650, 720, 25)
+    grafo.agregar_arista("Cochabamba", "Beni", 560, 600, 8)
 
-# Ruta Sur (Potosí - Chuquisaca - Tarija)
-mapa.agregar_arista("Oruro", "Potosí", 237, 240, 8)
-mapa.agregar_arista("Potosí", "Chuquisaca", 165, 180, 5)
-mapa.agregar_arista("Chuquisaca", "Tarija", 250, 300, 12)
 
-# Conexiones adicionales
-mapa.agregar_arista("Cochabamba", "Chuquisaca", 410, 480, 15)
-mapa.agregar_arista("Santa Cruz", "Tarija", 650, 720, 25)
-mapa.agregar_arista("Cochabamba", "Beni", 560, 600, 8)
+# Caché de las rutas más consultadas (tamaño máximo y segundos de vida)
+cache_rutas = CacheRutas(int(os.environ.get('GRAFO_CACHE_RUTAS', 1024)),
+                         int(os.environ.get('GRAFO_CACHE_TTL', 300)))
+
+
+# Inicializar grafo: se lee del almacén, o se crea con datos de ejemplo la primera vez
+almacen = AlmacenGrafo(RUTA_DB)
+if almacen.version() == 0:
+    mapa = Grafo(almacen, preparar_escrituras=True)
+    cargar_datos_iniciales(mapa)
+    mapa.guardar_snapshot()
+else:
+    mapa = Grafo.desde_almacen(almacen, preparar_escrituras=True)
+
+if os.path.exists(RUTA_JERARQUIAS):
+    mapa.cargar_jerarquias(RUTA_JERARQUIAS)
+
+# Medidores que se leen del grafo y de la caché al exponer /metrics
+for nombre, ayuda, funcion, tipo in [
+    ('grafo_ciudades', 'Ciudades del grafo', mapa.total_ciudades, 'gauge'),
+    ('grafo_rutas', 'Carreteras del grafo', mapa.total_aristas, 'gauge'),
+    ('grafo_version', 'Versión del grafo', lambda: mapa.version, 'gauge'),
+    ('cache_rutas_aciertos_total', 'Aciertos de la caché de rutas', lambda: cache_rutas.aciertos, 'counter'),
+    ('cache_rutas_fallos_total', 'Fallos de la caché de rutas', lambda: cache_rutas.fallos, 'counter'),
+    ('cache_rutas_desalojos_total', 'Entradas desalojadas de la caché de rutas',
+     lambda: cache_rutas.desalojos, 'counter'),
+    ('cache_rutas_entradas', 'Entradas en la caché de rutas',
+     lambda: cache_rutas.estadisticas()["entradas"], 'gauge'),
+    ('cache_rutas_tasa_aciertos', 'Proporción de aciertos de la caché de rutas',
+     lambda: cache_rutas.estadisticas()["tasa_aciertos"], 'gauge'),
+]:
+    metricas.REGISTRO.registrar(metricas.Medidor(nombre, ayuda, funcion, tipo))
+
+@app.before_request
+def iniciar_medicion():
+    if metricas.activo:
+        g.inicio_solicitud = time.perf_counter()
+
+@app.after_request
+def registrar_medicion(response):
+    """Cuenta la solicitud y su duración por endpoint (se ejecuta después de los demás hooks)"""
+    inicio = g.get('inicio_solicitud')
+    if inicio is not None:
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'desconocido'
+        metricas.registrar_solicitud(endpoint, request.method, response.status_code,
+                                     time.perf_counter() - inicio)
+    return response
+
+@app.before_request
+def sincronizar_grafo():
+    """Carga los cambios hechos por otros workers antes de atender la solicitud"""
+    mapa.sincronizar()
+    g.version_grafo = mapa.version
+
+@app.after_request
+def publicar_snapshot(response):
+    """Si la solicitud modificó el grafo, publica el snapshot para los demás workers"""
+    if g.get('version_grafo', mapa.version) != mapa.version:
+        mapa.guardar_snapshot()
+    return response
+
+def con_etag(vista):
+    """
+    Agrega a las respuestas GET un ETag fuerte derivado de la versión del
+    grafo y de la consulta. Si el cliente ya tiene esa versión se responde
+    304 sin volver a armar el listado.
+    """
+    @wraps(vista)
+    def envoltura(*args, **kwargs):
+        if request.method != 'GET':
+            return vista(*args, **kwargs)
+        consulta = hashlib.sha1(request.full_path.encode('utf-8')).hexdigest()[:16]
+        etag = f"{g.version_grafo}-{consulta}"
+        if etag in request.if_none_match:
+            respuesta = Response(status=304)
+        else:
+            respuesta = make_response(vista(*args, **kwargs))
+            if respuesta.status_code != 200:
+                return respuesta
+        respuesta.set_etag(etag)
+        respuesta.headers['Cache-Control'] = 'no-cache'
+        return respuesta
+    return envoltura
+
+def leer_pagina():
+    """
+    Lee `limite` y `cursor` de la consulta. Retorna (None, None) si no se
+    pidió paginar; lanza ValueError si los valores no son válidos.
+    """
+    limite = request.args.get('limite')
+    cursor = request.args.get('cursor')
+    if limite is None and cursor is None:
+        return None, None
+    try:
+        limite = int(limite) if limite is not None else LIMITE_PAGINA
+    except ValueError:
+        raise ValueError("limite debe ser un entero positivo")
+    if limite < 1:
+        raise ValueError("limite debe ser un entero positivo")
+    return min(limite, MAX_LIMITE_PAGINA), cursor
+
+def leer_cursor(cursor, partes):
+    """Convierte un cursor como "3.8" a la tupla de ids que representa"""
+    if cursor is None:
+        return (-1,) * partes
+    try:
+        ids = tuple(int(parte) for parte in cursor.split('.'))
+    except ValueError:
+        ids = ()
+    if len(ids) != partes:
+        raise ValueError("Cursor no válido")
+    return ids
+
+def leer_filtros_aristas():
+    """Filtros de carreteras: ciudad, tipo y rangos <criterio>_min / <criterio>_max"""
+    rangos = {}
+    for criterio in CRITERIOS:
+        limites = []
+        for sufijo in ('min', 'max'):
+            valor = request.args.get(f'{criterio}_{sufijo}')
+            try:
+                limites.append(float(valor) if valor is not None else None)
+            except ValueError:
+                raise ValueError(f"{criterio}_{sufijo} debe ser un número")
+        if limites != [None, None]:
+            rangos[criterio] = tuple(limites)
+    filtros = {
+        "ciudad": request.args.get('ciudad'),
+        "tipo": request.args.get('tipo'),
+        "rangos": rangos,
+        "caja": leer_caja(),
+        "sin_coordenadas": leer_sin_coordenadas()
+    }
+    return {clave: valor for clave, valor in filtros.items() if valor}
+
+def leer_caja():
+    """Caja `bbox` (lon_min,lat_min,lon_max,lat_max) de la consulta, o None"""
+    bbox = request.args.get('bbox')
+    return espacial.leer_caja(bbox) if bbox is not None else None
+
+def leer_sin_coordenadas():
+    """Si la consulta pide sólo lo que no tiene coordenadas (`sin_coordenadas=1`)"""
+    return request.args.get('sin_coordenadas', '').lower() in ('1', 'true')
+
+def leer_punto(datos, prefijo=''):
+    """
+    Coordenadas `<prefijo>lat` y `<prefijo>lon` de un dict (parámetros o
+    JSON) como (lat, lon), o None si no vienen. Lanza ValueError si falta
+    una de las dos o no son válidas.
+    """
+    lat, lon = datos.get(prefijo + 'lat'), datos.get(prefijo + 'lon')
+    if lat is None and lon is None:
+        return None
+    if lat is None or lon is None:
+        raise ValueError(f"Se requieren {prefijo}lat y {prefijo}lon")
+    return espacial.leer_coordenadas(lat, lon)
+
+def cortar_pagina(filas, limite):
+    """
+    Toma hasta `limite` filas (cuyo primer elemento es su cursor) y el cursor
+    de la página siguiente, o None si no hay más
+    """
+    filas = list(islice(filas, limite + 1))
+    if len(filas) <= limite:
+        return filas, None
+    return filas[:limite], '.'.join(str(i) for i in filas[limite - 1][0])
+
+def enlazar_siguiente(respuesta, cursor):
+    """Publica el cursor de la página siguiente en las cabeceras"""
+    respuesta = make_response(respuesta)
+    if cursor is not None:
+        parametros = request.args.to_dict()
+        parametros['cursor'] = cursor
+        respuesta.headers['X-Cursor-Siguiente'] = cursor
+        respuesta.headers['Link'] = f'<{request.path}?{urlencode(parametros)}>; rel="next"'
+    return respuesta
+
+def aristas_consultadas():
+    """
+    Carreteras pedidas en la consulta como (cursor, ciudad1, ciudad2,
+    distancia, tiempo, peaje) y el cursor siguiente. Sin filtros ni
+    paginación son todas, en el orden de siempre.
+    """
+    limite, cursor = leer_pagina()
+    filtros = leer_filtros_aristas()
+    if limite is None and not filtros:
+        return [(None,) + arista for arista in mapa.aristas()], None
+    filas = mapa.filtrar_aristas(despues=leer_cursor(cursor, 2), **filtros)
+    if limite is None:
+        return list(filas), None
+    return cortar_pagina(filas, limite)
 
 @app.route('/')
 def index():
@@ -49,6 +286,11 @@ def calcular_ruta():
         origen = request.form.get('origen', '').strip()
         destino = request.form.get('destino', '').strip()
         criterio = request.form.get('criterio', 'distancia')
+        metodo = request.form.get('metodo', 'ch')
+        try:
+            k = min(max(int(request.form.get('k', 1)), 1), MAX_RUTAS_ALTERNATIVAS)
+        except ValueError:
+            k = 1
         
         if not origen or not destino:
             return render_template('resultado.html', 
@@ -61,58 +303,228 @@ def calcular_ruta():
                                  error="El origen y destino no pueden ser iguales",
                                  camino=[], costo_total=0, criterio=criterio,
                                  origen=origen, destino=destino)
+
+        # Los valores desconocidos no llegan a la búsqueda ni a las claves de la caché
+        if criterio not in CRITERIOS or metodo not in METODOS:
+            return render_template('resultado.html',
+                                 error="Criterio o método no válido",
+                                 camino=[], costo_total=0, criterio='distancia',
+                                 origen=origen, destino=destino), 400
         
-        camino, costo_total = mapa.dijkstra(origen, destino, criterio)
+        clave = ('html', origen, destino, criterio, metodo, k)
+        version = mapa.version
+        pagina = cache_rutas.obtener(clave, version)
+        if pagina is not None:
+            return pagina
         
-        if not camino:
-            return render_template('resultado.html',
-                                 origen=origen,
-                                 destino=destino,
-                                 camino=[], costo_total=0, criterio=criterio,
-                                 error=f"No existe ruta entre {origen} y {destino}")
+        alternativas = []
+        if k > 1:
+            alternativas = mapa.rutas_alternativas(origen, destino, k, criterio)
+            camino, costo_total = (alternativas[0]["camino"], alternativas[0]["costo"]) if alternativas else ([], 0)
+        else:
+            camino, costo_total = mapa.dijkstra(origen, destino, criterio, metodo)
         
-        return render_template('resultado.html', 
-                             origen=origen, 
-                             destino=destino,
-                             camino=camino, 
-                             costo_total=costo_total,
-                             criterio=criterio,
-                             error=None)
+        if not camino:
+            pagina = render_template('resultado.html',
+                                   origen=origen,
+                                   destino=destino,
+                                   camino=[], costo_total=0, criterio=criterio,
+                                   error=f"No existe ruta entre {origen} y {destino}")
+        else:
+            pagina = render_template('resultado.html', 
+                                   origen=origen, 
+                                   destino=destino,
+                                   camino=camino, 
+                                   costo_total=costo_total,
+                                   criterio=criterio,
+                                   alternativas=alternativas,
+                                   error=None)
+        cache_rutas.guardar(clave, version, pagina)
+        return pagina
     except Exception as e:
         return render_template('resultado.html', 
                              error=f"Error al calcular la ruta: {str(e)}",
                              camino=[], costo_total=0, criterio='distancia',
                              origen='', destino='')
 
+def leer_consulta_ruta(args):
+    """
+    Lee origen, destino, criterio, metodo y k de los parámetros de una
+    consulta de ruta. En lugar del nombre, origen y destino pueden venir
+    como coordenadas (origen_lat y origen_lon, destino_lat y destino_lon):
+    en ese caso son tuplas (lat, lon). Lanza ValueError si no son válidos.
+    """
+    origen = leer_punto(args, 'origen_') or args.get('origen', '').strip()
+    destino = leer_punto(args, 'destino_') or args.get('destino', '').strip()
+    criterio = args.get('criterio', 'distancia')
+    metodo = args.get('metodo', 'ch')
+    
+    if not origen or not destino:
+        raise ValueError("Se requiere origen y destino")
+    
+    if criterio not in CRITERIOS:
+        raise ValueError(f"Criterio no válido: {criterio}")
+
+    if metodo not in METODOS:
+        raise ValueError(f"Método no válido: {metodo}")
+    
+    try:
+        k = int(args.get('k', 1))
+    except ValueError:
+        k = 0
+    if not 1 <= k <= MAX_RUTAS_ALTERNATIVAS:
+        raise ValueError(f"k debe ser un entero entre 1 y {MAX_RUTAS_ALTERNATIVAS}")
+    return origen, destino, criterio, metodo, k
+
+def respuesta_ruta(origen, destino, criterio, metodo, k):
+    """
+    Calcula la respuesta de una consulta de ruta, o la toma de la caché de
+    rutas. Retorna (datos, estado HTTP, 'HIT' o 'MISS').
+    
+    Si origen o destino son coordenadas (lat, lon) la ruta parte de (o
+    llega a) la ciudad más cercana, y la respuesta agrega "ajustes" con esa
+    ciudad y su distancia al punto.
+    """
+    ajustes = {}
+    for extremo, punto in (('origen', origen), ('destino', destino)):
+        if isinstance(punto, tuple):
+            cercanas = mapa.ciudades_cercanas(*punto)
+            if not cercanas:
+                return {"error": "No hay ciudades con coordenadas"}, 404, 'MISS'
+            ciudad, distancia = cercanas[0]
+            ajustes[extremo] = {"ciudad": ciudad, "distancia_km": round(distancia, 3)}
+    if ajustes:
+        origen = ajustes['origen']['ciudad'] if 'origen' in ajustes else origen
+        destino = ajustes['destino']['ciudad'] if 'destino' in ajustes else destino
+        datos, estado, estado_cache = respuesta_ruta(origen, destino, criterio, metodo, k)
+        return dict(datos, ajustes=ajustes), estado, estado_cache
+    
+    clave = ('json', origen, destino, criterio, metodo, k)
+    version = mapa.version
+    respuesta = cache_rutas.obtener(clave, version)
+    if respuesta is not None:
+        return respuesta + ('HIT',)
+    
+    if not mapa.existe_ciudad(origen) or not mapa.existe_ciudad(destino):
+        respuesta = ({"error": "Ciudad no encontrada"}, 404)
+    else:
+        alternativas = None
+        if k > 1:
+            alternativas = mapa.rutas_alternativas(origen, destino, k, criterio)
+            camino, costo = (alternativas[0]["camino"], alternativas[0]["costo"]) if alternativas else ([], 0)
+        else:
+            camino, costo = mapa.dijkstra(origen, destino, criterio, metodo)
+        if not camino:
+            respuesta = ({"error": f"No existe ruta entre {origen} y {destino}"}, 404)
+        else:
+            datos = {
+                "origen": origen,
+                "destino": destino,
+                "criterio": criterio,
+                "camino": camino,
+                "costo": costo
+            }
+            if alternativas is not None:
+                datos["alternativas"] = alternativas
+            respuesta = (datos, 200)
+    cache_rutas.guardar(clave, version, respuesta)
+    return respuesta + ('MISS',)
+
+@app.route('/api/ruta')
+def api_ruta():
+    """
+    Ruta óptima en JSON; las respuestas se sirven de la caché de rutas.
+    Con `k` > 1 agrega "alternativas": hasta k rutas sin ciudades repetidas,
+    de la mejor a la peor, con sus costos en los tres criterios. Origen y
+    destino se pueden dar como coordenadas (origen_lat, origen_lon...).
+    """
+    try:
+        try:
+            consulta = leer_consulta_ruta(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        datos, estado, estado_cache = respuesta_ruta(*consulta)
+        return jsonify(datos), estado, {'X-Cache': estado_cache}
+    except Exception as e:
+        return jsonify({"error": f"Error al calcular la ruta: {str(e)}"}), 500
+
+@app.route('/api/cache-rutas')
+def estadisticas_cache_rutas():
+    """Aciertos, fallos y ocupación de la caché de rutas"""
+    return jsonify(cache_rutas.estadisticas())
+
+@app.route('/metrics')
+def exponer_metricas():
+    """Métricas de este worker en el formato de texto de Prometheus"""
+    return Response(metricas.REGISTRO.exponer(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/api/perfilador', methods=['GET', 'POST'])
+def perfilador():
+    """
+    GET: funciones y pilas más frecuentes del perfilador por muestreo.
+    POST: lo activa o lo detiene ({"activo": true, "intervalo": 0.01}); con
+    "limpiar": true descarta las muestras anteriores.
+    """
+    if request.method == 'GET':
+        try:
+            limite = int(request.args.get('limite', 20))
+        except ValueError:
+            return jsonify({"error": "limite debe ser un entero"}), 400
+        return jsonify(metricas.perfilador.resumen(limite))
+
+    data = request.json or {}
+    if not isinstance(data.get('activo'), bool):
+        return jsonify({"error": "activo debe ser true o false"}), 400
+    try:
+        intervalo = float(data.get('intervalo', 0.01))
+    except (ValueError, TypeError):
+        return jsonify({"error": "intervalo debe ser un número"}), 400
+    if not 0.001 <= intervalo <= 1:
+        return jsonify({"error": "intervalo debe estar entre 0.001 y 1 segundo"}), 400
+
+    if data.get('limpiar'):
+        metricas.perfilador.limpiar()
+    if data['activo']:
+        metricas.perfilador.iniciar(intervalo)
+    else:
+        metricas.perfilador.detener()
+    return jsonify(metricas.perfilador.resumen(0))
+
 @app.route('/api/data')
+@con_etag
 def api_data():
     """Retorna las aristas del grafo para visualización"""
+    try:
+        aristas, siguiente = aristas_consultadas()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    # Para el mapa (bbox o sin_coordenadas) cada arista trae las coordenadas de sus extremos
+    con_coordenadas = 'bbox' in request.args or 'sin_coordenadas' in request.args
     edges = []
-    edges_agregados = set()
     
-    for ciudad1, conexiones in mapa.adyacencia.items():
-        for conexion in conexiones:
-            ciudad2, distancia, tiempo, peaje = conexion
-            distancia = int(distancia)
-            tiempo = int(tiempo)
-            peaje = int(peaje)
-            
-            edge_id = tuple(sorted([ciudad1, ciudad2]))
-            
-            if edge_id not in edges_agregados:
-                edges_agregados.add(edge_id)
-                edges.append({
-                    "from": ciudad1, 
-                    "to": ciudad2, 
-                    "label": f"{distancia}km",
-                    "distancia": distancia,
-                    "tiempo": tiempo,
-                    "peaje": peaje,
-                    "id": f"{ciudad1}-{ciudad2}"
-                })
-    return jsonify(edges)
+    for _, ciudad1, ciudad2, distancia, tiempo, peaje in aristas:
+        distancia = int(distancia)
+        tiempo = int(tiempo)
+        peaje = int(peaje)
+        
+        edge = {
+            "from": ciudad1, 
+            "to": ciudad2, 
+            "label": f"{distancia}km",
+            "distancia": distancia,
+            "tiempo": tiempo,
+            "peaje": peaje,
+            "id": f"{ciudad1}-{ciudad2}"
+        }
+        if con_coordenadas:
+            edge["coordenadas"] = [mapa.coordenadas_ciudad(ciudad1), mapa.coordenadas_ciudad(ciudad2)]
+        edges.append(edge)
+    return enlazar_siguiente(jsonify(edges), siguiente)
 
 @app.route('/api/ciudades', methods=['GET', 'POST', 'DELETE'])
+@con_etag
 def gestionar_ciudades():
     """CRUD de ciudades"""
     if request.method == 'POST':
@@ -123,15 +535,20 @@ def gestionar_ciudades():
             if not nombre:
                 return jsonify({"error": "El nombre de la ciudad es requerido"}), 400
             
-            if nombre in mapa.obtener_ciudades():
+            if mapa.existe_ciudad(nombre):
                 return jsonify({"error": "La ciudad ya existe"}), 400
             
+            try:
+                punto = leer_punto(data)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            
             tipo = data.get('tipo', 'normal')
-            mapa.agregar_ciudad(nombre, tipo)
+            mapa.agregar_ciudad(nombre, tipo, *(punto or ()))
             return jsonify({
                 "mensaje": "Ciudad agregada correctamente",
                 "ciudad": nombre,
-                "total_ciudades": len(mapa.obtener_ciudades())
+                "total_ciudades": mapa.total_ciudades()
             })
         except Exception as e:
             return jsonify({"error": str(e)}), 500
@@ -144,63 +561,134 @@ def gestionar_ciudades():
             if not nombre:
                 return jsonify({"error": "El nombre de la ciudad es requerido"}), 400
             
-            if nombre not in mapa.obtener_ciudades():
+            if not mapa.existe_ciudad(nombre):
                 return jsonify({"error": "La ciudad no existe"}), 404
             
             # Contar conexiones antes de eliminar
-            conexiones_eliminadas = len(mapa.adyacencia.get(nombre, []))
+            conexiones_eliminadas = mapa.grado(nombre)
             
             mapa.eliminar_ciudad(nombre)
             return jsonify({
                 "mensaje": f"Ciudad {nombre} eliminada correctamente",
                 "conexiones_eliminadas": conexiones_eliminadas,
-                "ciudades_restantes": len(mapa.obtener_ciudades())
+                "ciudades_restantes": mapa.total_ciudades()
             })
         except Exception as e:
             return jsonify({"error": str(e)}), 500
     
-    # GET - Retornar lista de ciudades con detalles
+    # GET - Retornar lista de ciudades con detalles (filtros opcionales: tipo, buscar, bbox, sin_coordenadas)
     try:
+        try:
+            limite, cursor = leer_pagina()
+            despues, = leer_cursor(cursor, 1)
+            caja = leer_caja()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        ciudades = mapa.filtrar_ciudades(request.args.get('tipo'), request.args.get('buscar'),
+                                         despues, caja, leer_sin_coordenadas())
+        siguiente = None
+        if limite is not None:
+            ciudades, siguiente = cortar_pagina(
+                (((u,), nombre, tipo) for u, nombre, tipo in ciudades), limite)
+        
         ciudades_detalle = []
-        for ciudad in mapa.obtener_ciudades():
-            ciudades_detalle.append({
+        for _, ciudad, tipo in ciudades:
+            detalle = {
                 "nombre": ciudad,
-                "tipo": mapa.tipos_ciudad.get(ciudad, "normal"),
-                "conexiones": len(mapa.adyacencia.get(ciudad, []))
-            })
+                "tipo": tipo,
+                "conexiones": mapa.grado(ciudad)
+            }
+            agregar_coordenadas(detalle, ciudad)
+            ciudades_detalle.append(detalle)
         
-        return jsonify(ciudades_detalle)
+        return enlazar_siguiente(jsonify(ciudades_detalle), siguiente)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def agregar_coordenadas(detalle, ciudad):
+    """Agrega lat y lon al detalle de la ciudad, si tiene coordenadas"""
+    punto = mapa.coordenadas_ciudad(ciudad)
+    if punto is not None:
+        detalle["lat"], detalle["lon"] = punto
+    return detalle
+
+@app.route('/api/ciudades/cercanas')
+@con_etag
+def ciudades_cercanas():
+    """
+    Las `k` ciudades más cercanas a un punto (`lat`, `lon`), opcionalmente a
+    no más de `radio_km`, con su distancia en km. Sirve para ubicar en el
+    grafo un punto elegido en el mapa.
+    """
+    try:
+        punto = leer_punto(request.args)
+        if punto is None:
+            raise ValueError("Se requieren lat y lon")
+        try:
+            k = int(request.args.get('k', 1))
+        except ValueError:
+            k = 0
+        if not 1 <= k <= MAX_CIUDADES_CERCANAS:
+            raise ValueError(f"k debe ser un entero entre 1 y {MAX_CIUDADES_CERCANAS}")
+        radio_km = request.args.get('radio_km')
+        try:
+            radio_km = float(radio_km) if radio_km is not None else None
+        except ValueError:
+            radio_km = -1
+        if radio_km is not None and not radio_km >= 0:
+            raise ValueError("radio_km debe ser un número positivo")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return jsonify([
+        agregar_coordenadas({
+            "nombre": ciudad,
+            "tipo": mapa.tipo_ciudad(ciudad),
+            "distancia_km": round(distancia, 3)
+        }, ciudad)
+        for ciudad, distancia in mapa.ciudades_cercanas(*punto, k, radio_km)
+    ])
+
+@app.route('/api/ciudades/extension')
+@con_etag
+def extension_ciudades():
+    """Caja que contiene a las ciudades con coordenadas (null si no hay ninguna)"""
+    caja = mapa.extension()
+    if caja is None:
+        return jsonify(None)
+    return jsonify(dict(zip(('lat_min', 'lon_min', 'lat_max', 'lon_max'), caja)))
+
 @app.route('/api/rutas', methods=['GET', 'POST', 'DELETE'])
+@con_etag
 def gestionar_rutas():
     """CRUD de rutas/carreteras"""
     if request.method == 'GET':
         try:
+            try:
+                aristas, siguiente = aristas_consultadas()
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            
             rutas = []
-            rutas_agregadas = set()
             
-            for ciudad1, conexiones in mapa.adyacencia.items():
-                for conexion in conexiones:
-                    ciudad2, distancia, tiempo, peaje = conexion
-                    ruta_id = tuple(sorted([ciudad1, ciudad2]))
-                    
-                    if ruta_id not in rutas_agregadas:
-                        rutas_agregadas.add(ruta_id)
-                        rutas.append({
-                            "origen": ciudad1,
-                            "destino": ciudad2,
-                            "distancia": int(distancia),
-                            "tiempo": int(tiempo),
-                            "peaje": int(peaje),
-                            "costo_total": int(distancia) + int(tiempo) + int(peaje)
-                        })
+            for _, ciudad1, ciudad2, distancia, tiempo, peaje in aristas:
+                rutas.append({
+                    "origen": ciudad1,
+                    "destino": ciudad2,
+                    "distancia": int(distancia),
+                    "tiempo": int(tiempo),
+                    "peaje": int(peaje),
+                    "costo_total": int(distancia) + int(tiempo) + int(peaje)
+                })
             
-            return jsonify({
+            if 'limite' not in request.args and 'cursor' not in request.args:
+                rutas.sort(key=lambda x: x['origen'])
+            
+            return enlazar_siguiente(jsonify({
                 "total_rutas": len(rutas),
-                "rutas": sorted(rutas, key=lambda x: x['origen'])
-            })
+                "rutas": rutas
+            }), siguiente)
         except Exception as e:
             return jsonify({"error": str(e)}), 500
     
@@ -213,10 +701,10 @@ def gestionar_rutas():
             if not origen or not destino:
                 return jsonify({"error": "Se requiere origen y destino"}), 400
             
-            if origen not in mapa.obtener_ciudades():
+            if not mapa.existe_ciudad(origen):
                 return jsonify({"error": f"La ciudad {origen} no existe"}), 400
             
-            if destino not in mapa.obtener_ciudades():
+            if not mapa.existe_ciudad(destino):
                 return jsonify({"error": f"La ciudad {destino} no existe"}), 400
             
             if origen == destino:
@@ -231,13 +719,7 @@ def gestionar_rutas():
                 return jsonify({"error": "Los valores deben ser números válidos"}), 400
             
             # Verificar si la ruta ya existe
-            ruta_existente = False
-            for conexion in mapa.adyacencia.get(origen, []):
-                if conexion[0] == destino:
-                    ruta_existente = True
-                    break
-            
-            if ruta_existente:
+            if mapa.existe_arista(origen, destino):
                 return jsonify({"error": "Esta ruta ya existe"}), 400
             
             mapa.agregar_arista(origen, destino, distancia, tiempo, peaje)
@@ -255,13 +737,7 @@ def gestionar_rutas():
                 return jsonify({"error": "Se requiere origen y destino"}), 400
             
             # Verificar que la ruta existe
-            ruta_existe = False
-            for conexion in mapa.adyacencia.get(origen, []):
-                if conexion[0] == destino:
-                    ruta_existe = True
-                    break
-            
-            if not ruta_existe:
+            if not mapa.existe_arista(origen, destino):
                 return jsonify({"error": "La ruta no existe"}), 400
             
             mapa.eliminar_arista(origen, destino)
@@ -269,12 +745,164 @@ def gestionar_rutas():
         except Exception as e:
             return jsonify({"error": str(e)}), 500
 
+@app.route('/api/rutas/lote', methods=['POST'])
+def rutas_lote():
+    """Calcula muchas rutas origen/destino en una sola solicitud"""
+    try:
+        data = request.json or {}
+        pares = data.get('pares')
+        criterio_defecto = data.get('criterio', 'distancia')
+        
+        if not isinstance(pares, list) or not pares:
+            return jsonify({"error": "Se requiere una lista de pares origen/destino"}), 400
+        
+        if len(pares) > MAX_PARES_LOTE:
+            return jsonify({"error": f"Se permiten como máximo {MAX_PARES_LOTE} pares por solicitud"}), 400
+        
+        consultas = []
+        for par in pares:
+            if not isinstance(par, dict):
+                return jsonify({"error": "Cada par debe tener origen y destino"}), 400
+            origen = str(par.get('origen', '')).strip()
+            destino = str(par.get('destino', '')).strip()
+            criterio = par.get('criterio', criterio_defecto)
+            if not origen or not destino:
+                return jsonify({"error": "Cada par debe tener origen y destino"}), 400
+            if criterio not in CRITERIOS:
+                return jsonify({"error": f"Criterio no válido: {criterio}"}), 400
+            consultas.append((origen, destino, criterio))
+        
+        rutas = []
+        for (origen, destino, criterio), (camino, costo) in zip(consultas, mapa.rutas_lote(consultas)):
+            ruta = {
+                "origen": origen,
+                "destino": destino,
+                "criterio": criterio,
+                "camino": camino,
+                "costo": costo if camino else None
+            }
+            if not camino:
+                ruta["error"] = f"No existe ruta entre {origen} y {destino}"
+            rutas.append(ruta)
+        
+        return jsonify({
+            "total_rutas": len(rutas),
+            "rutas": rutas
+        })
+    except Exception as e:
+        return jsonify({"error": f"Error al calcular rutas: {str(e)}"}), 500
+
+@app.route('/api/rutas/pareto', methods=['POST'])
+def rutas_pareto():
+    """Rutas no dominadas entre dos ciudades considerando distancia, tiempo y peaje"""
+    try:
+        data = request.json or {}
+        origen = str(data.get('origen', '')).strip()
+        destino = str(data.get('destino', '')).strip()
+        max_rutas = data.get('max_rutas')
+        
+        if not origen or not destino:
+            return jsonify({"error": "Se requiere origen y destino"}), 400
+        
+        if not mapa.existe_ciudad(origen) or not mapa.existe_ciudad(destino):
+            return jsonify({"error": "Ciudad no encontrada"}), 404
+        
+        if max_rutas is not None and (not isinstance(max_rutas, int) or isinstance(max_rutas, bool) or max_rutas < 1):
+            return jsonify({"error": "max_rutas debe ser un entero positivo"}), 400
+        
+        rutas = mapa.rutas_pareto(origen, destino, max_rutas)
+        if not rutas:
+            return jsonify({"error": f"No existe ruta entre {origen} y {destino}"}), 404
+        
+        return jsonify({
+            "origen": origen,
+            "destino": destino,
+            "total_rutas": len(rutas),
+            "rutas": rutas
+        })
+    except Exception as e:
+        return jsonify({"error": f"Error al calcular rutas: {str(e)}"}), 500
+
+@app.route('/api/rutas/ponderada', methods=['POST'])
+def ruta_ponderada():
+    """Ruta que minimiza una combinación de distancia, tiempo y peaje"""
+    try:
+        data = request.json or {}
+        origen = str(data.get('origen', '')).strip()
+        destino = str(data.get('destino', '')).strip()
+        pesos = data.get('pesos')
+        
+        if not origen or not destino:
+            return jsonify({"error": "Se requiere origen y destino"}), 400
+        
+        if not mapa.existe_ciudad(origen) or not mapa.existe_ciudad(destino):
+            return jsonify({"error": "Ciudad no encontrada"}), 404
+        
+        if not isinstance(pesos, dict) or not pesos:
+            return jsonify({"error": "Se requieren pesos por criterio"}), 400
+        
+        for criterio, peso in pesos.items():
+            if criterio not in CRITERIOS:
+                return jsonify({"error": f"Criterio no válido: {criterio}"}), 400
+            if not isinstance(peso, (int, float)) or isinstance(peso, bool) or peso < 0:
+                return jsonify({"error": "Los pesos deben ser números no negativos"}), 400
+        
+        camino, costo = mapa.ruta_ponderada(origen, destino, pesos)
+        if not camino:
+            return jsonify({"error": f"No existe ruta entre {origen} y {destino}"}), 404
+        
+        return jsonify({
+            "origen": origen,
+            "destino": destino,
+            "pesos": pesos,
+            "camino": camino,
+            "costo": costo,
+            "totales": mapa.costos_camino(camino)
+        })
+    except Exception as e:
+        return jsonify({"error": f"Error al calcular ruta: {str(e)}"}), 500
+
+@app.route('/api/matriz', methods=['POST'])
+def matriz_costos():
+    """Matriz de costos origenes × destinos por distancia, tiempo y/o peaje"""
+    try:
+        data = request.json or {}
+        origenes = data.get('origenes')
+        destinos = data.get('destinos', origenes)
+        criterios = data.get('criterios', list(CRITERIOS))
+        
+        if not isinstance(origenes, list) or not origenes or not isinstance(destinos, list) or not destinos:
+            return jsonify({"error": "Se requieren listas de origenes y destinos"}), 400
+        
+        if len(origenes) * len(destinos) > MAX_CELDAS_MATRIZ:
+            return jsonify({"error": f"La matriz no puede superar {MAX_CELDAS_MATRIZ} celdas"}), 400
+        
+        if isinstance(criterios, str):
+            criterios = [criterios]
+        for criterio in criterios:
+            if criterio not in CRITERIOS:
+                return jsonify({"error": f"Criterio no válido: {criterio}"}), 400
+        
+        matrices = {}
+        for criterio in criterios:
+            matrices[criterio] = [
+                [costo if costo != float('inf') else None for costo in fila]
+                for fila in mapa.matriz(origenes, destinos, criterio)
+            ]
+        
+        return jsonify({
+            "origenes": origenes,
+            "destinos": destinos,
+            "matrices": matrices
+        })
+    except Exception as e:
+        return jsonify({"error": f"Error al calcular la matriz: {str(e)}"}), 500
+
 @app.route('/api/ciudad/<nombre>')
 def obtener_ciudad(nombre):
-    if nombre in mapa.adyacencia:
+    if mapa.existe_ciudad(nombre):
         conexiones = []
-        for conexion in mapa.adyacencia[nombre]:
-            ciudad_destino, distancia, tiempo, peaje = conexion
+        for ciudad_destino, distancia, tiempo, peaje in mapa.conexiones(nombre):
             conexiones.append({
                 'destino': ciudad_destino,
                 'distancia': int(distancia),
@@ -282,12 +910,12 @@ def obtener_ciudad(nombre):
                 'peaje': int(peaje)
             })
         
-        return jsonify({
+        return jsonify(agregar_coordenadas({
             "nombre": nombre,
-            "tipo": mapa.tipos_ciudad.get(nombre, "normal"),
-            "conexiones": len(mapa.adyacencia[nombre]),
+            "tipo": mapa.tipo_ciudad(nombre),
+            "conexiones": len(conexiones),
             "rutas": conexiones
-        })
+        }, nombre))
     return jsonify({"error": "Ciudad no encontrada"}), 404
 
 @app.route('/api/todas-rutas-posibles')
@@ -295,37 +923,56 @@ def todas_rutas_posibles():
     """Calcula todas las rutas posibles entre todos los pares de ciudades"""
     try:
         ciudades = mapa.obtener_ciudades()
-        todas_las_rutas = []
-        
-        for origen in ciudades:
-            for destino in ciudades:
-                if origen != destino:
-                    for criterio in ['distancia', 'tiempo', 'peaje']:
-                        camino, costo = mapa.dijkstra(origen, destino, criterio)
-                        
-                        if camino:
-                            todas_las_rutas.append({
-                                "origen": origen,
-                                "destino": destino,
-                                "criterio": criterio,
-                                "camino": camino,
-                                "costo": costo,
-                                "paradas": len(camino) - 2
-                            })
+        todas_las_rutas = mapa.todas_las_rutas(PROCESOS_RUTAS)
+        
+        rutas_por_criterio = {criterio: 0 for criterio in CRITERIOS}
+        for ruta in todas_las_rutas:
+            rutas_por_criterio[ruta['criterio']] += 1
         
         return jsonify({
             "total_rutas_calculadas": len(todas_las_rutas),
             "ciudades_totales": len(ciudades),
-            "rutas_por_criterio": {
-                "distancia": len([r for r in todas_las_rutas if r['criterio'] == 'distancia']),
-                "tiempo": len([r for r in todas_las_rutas if r['criterio'] == 'tiempo']),
-                "peaje": len([r for r in todas_las_rutas if r['criterio'] == 'peaje'])
-            },
+            "rutas_por_criterio": rutas_por_criterio,
             "rutas": todas_las_rutas
         })
     except Exception as e:
         return jsonify({"error": f"Error al calcular rutas: {str(e)}"}), 500
 
+@app.route('/api/todas-rutas-posibles/stream')
+def todas_rutas_posibles_stream():
+    """
+    Variante en streaming de /api/todas-rutas-posibles: una ruta por línea
+    (NDJSON) y, al final, una línea con el resumen de conteos
+    """
+    ciudades_totales = mapa.total_ciudades()
+    # Con varios procesos, cada uno entrega sus rutas ya serializadas
+    bloques = mapa.iterar_rutas_ndjson(PROCESOS_RUTAS)
+    rutas = mapa.iterar_todas_las_rutas() if bloques is None else None
+
+    def generar():
+        rutas_por_criterio = {criterio: 0 for criterio in CRITERIOS}
+        try:
+            if bloques is not None:
+                for texto, conteos in bloques:
+                    for criterio, cantidad in conteos.items():
+                        rutas_por_criterio[criterio] += cantidad
+                    yield texto
+            for ruta in rutas or ():
+                rutas_por_criterio[ruta['criterio']] += 1
+                yield app.json.dumps(ruta) + "\n"
+        except Exception as e:
+            yield app.json.dumps({"error": f"Error al calcular rutas: {str(e)}"}) + "\n"
+            return
+        yield app.json.dumps({
+            "resumen": {
+                "total_rutas_calculadas": sum(rutas_por_criterio.values()),
+                "ciudades_totales": ciudades_totales,
+                "rutas_por_criterio": rutas_por_criterio
+            }
+        }) + "\n"
+
+    return Response(generar(), mimetype='application/x-ndjson')
+
 @app.route('/api/eliminar-ciudad', methods=['POST'])
 def eliminar_ciudad():
     """Elimina una ciudad y todas sus rutas conectadas"""
@@ -336,16 +983,16 @@ def eliminar_ciudad():
         if not ciudad:
             return jsonify({"error": "Se requiere el nombre de la ciudad"}), 400
         
-        if ciudad not in mapa.obtener_ciudades():
+        if not mapa.existe_ciudad(ciudad):
             return jsonify({"error": f"La ciudad {ciudad} no existe"}), 400
         
-        conexiones_eliminadas = len(mapa.adyacencia.get(ciudad, []))
+        conexiones_eliminadas = mapa.grado(ciudad)
         mapa.eliminar_ciudad(ciudad)
         
         return jsonify({
             "mensaje": f"Ciudad {ciudad} eliminada correctamente",
             "conexiones_eliminadas": conexiones_eliminadas,
-            "ciudades_restantes": len(mapa.obtener_ciudades())
+            "ciudades_restantes": mapa.total_ciudades()
         })
     except Exception as e:
         return jsonify({"error": f"Error al eliminar ciudad: {str(e)}"}), 500
@@ -361,27 +1008,19 @@ def eliminar_carretera():
         if not origen or not destino:
             return jsonify({"error": "Se requieren origen y destino"}), 400
         
-        ruta_existe = False
-        info_carretera = None
-        for conexion in mapa.adyacencia.get(origen, []):
-            if conexion[0] == destino:
-                ruta_existe = True
-                info_carretera = {
-                    "distancia": int(conexion[1]),
-                    "tiempo": int(conexion[2]),
-                    "peaje": int(conexion[3])
-                }
-                break
-        
-        if not ruta_existe:
+        info_carretera = mapa.obtener_info_arista(origen, destino)
+        
+        if info_carretera is None:
             return jsonify({"error": f"No existe carretera entre {origen} y {destino}"}), 400
         
+        info_carretera = {clave: int(valor) for clave, valor in info_carretera.items()}
+        
         mapa.eliminar_arista(origen, destino)
         
         return jsonify({
             "mensaje": f"Carretera entre {origen} y {destino} eliminada correctamente",
             "carretera_eliminada": info_carretera,
-            "total_rutas_restantes": sum(len(conexiones) for conexiones in mapa.adyacencia.values()) // 2
+            "total_rutas_restantes": mapa.total_aristas()
         })
     except Exception as e:
         return jsonify({"error": f"Error al eliminar carretera: {str(e)}"}), 500
@@ -390,51 +1029,128 @@ def eliminar_carretera():
 def obtener_estadisticas():
     """Retorna estadísticas del grafo"""
     try:
-        total_ciudades = len(mapa.adyacencia)
-        total_rutas = sum(len(conexiones) for conexiones in mapa.adyacencia.values()) // 2
+        resumen = mapa.estadisticas()
         
-        distancias = []
-        tiempos = []
-        peajes = []
-        
-        for conexiones in mapa.adyacencia.values():
-            for conexion in conexiones:
-                _, dist, tiempo, peaje = conexion
-                distancias.append(int(dist))
-                tiempos.append(int(tiempo))
-                peajes.append(int(peaje))
+        def promedio(criterio):
+            agregado = resumen["criterios"][criterio]
+            return int(agregado["suma"] // agregado["cantidad"]) if agregado["cantidad"] else 0
         
         return jsonify({
-            "total_ciudades": total_ciudades,
-            "total_rutas": total_rutas,
-            "distancia_promedio": sum(distancias) // len(distancias) if distancias else 0,
-            "tiempo_promedio": sum(tiempos) // len(tiempos) if tiempos else 0,
-            "peaje_promedio": sum(peajes) // len(peajes) if peajes else 0,
+            "total_ciudades": resumen["total_ciudades"],
+            "total_rutas": resumen["total_rutas"],
+            "distancia_promedio": promedio('distancia'),
+            "tiempo_promedio": promedio('tiempo'),
+            "peaje_promedio": promedio('peaje'),
+            "criterios": resumen["criterios"],
+            "grado": resumen["grado"],
             "ciudades": mapa.obtener_ciudades()
         })
     except Exception as e:
         return jsonify({"error": f"Error al calcular estadísticas: {str(e)}"}), 500
 
+def leer_operacion(operacion):
+    """
+    Convierte una operación del lote recibido en JSON a la operación del
+    Grafo. Lanza ValueError si le faltan datos.
+    """
+    if not isinstance(operacion, dict):
+        raise ValueError("Cada operación debe ser un objeto")
+    tipo = operacion.get('operacion')
+    
+    if tipo in ('agregar_ciudad', 'eliminar_ciudad'):
+        nombre = str(operacion.get('nombre', '')).strip()
+        if not nombre:
+            raise ValueError("El nombre de la ciudad es requerido")
+        if tipo == 'agregar_ciudad':
+            return ('agregar_ciudad', nombre, operacion.get('tipo', 'normal'), *(leer_punto(operacion) or ()))
+        return ('eliminar_ciudad', nombre)
+    
+    if tipo == 'ubicar_ciudad':
+        nombre = str(operacion.get('nombre', '')).strip()
+        if not nombre:
+            raise ValueError("El nombre de la ciudad es requerido")
+        # Sin lat ni lon se le quitan las coordenadas
+        return ('ubicar_ciudad', nombre, *(leer_punto(operacion) or (None, None)))
+    
+    if tipo in ('agregar_ruta', 'eliminar_ruta'):
+        origen = str(operacion.get('origen', '')).strip()
+        destino = str(operacion.get('destino', '')).strip()
+        if not origen or not destino:
+            raise ValueError("Se requiere origen y destino")
+        if origen == destino:
+            raise ValueError("No se puede crear una ruta entre la misma ciudad")
+        if tipo == 'eliminar_ruta':
+            return ('eliminar_arista', origen, destino)
+        try:
+            distancia = int(operacion.get('distancia', 0))
+            tiempo = int(operacion.get('tiempo', 0))
+            peaje = int(operacion.get('peaje', 0))
+        except (ValueError, TypeError):
+            raise ValueError("Los valores deben ser números válidos")
+        return ('agregar_arista', origen, destino, distancia, tiempo, peaje)
+    
+    raise ValueError(f"Operación no válida: {tipo}")
+
+@app.route('/api/lote', methods=['POST'])
+def aplicar_lote():
+    """
+    Aplica muchas altas y bajas de ciudades y rutas como un solo cambio del
+    grafo. Las rutas nuevas crean las ciudades que falten, agregar una ruta
+    existente actualiza sus costos y eliminar algo que no existe no hace nada.
+    """
+    try:
+        data = request.json or {}
+        operaciones = data.get('operaciones')
+        
+        if not isinstance(operaciones, list) or not operaciones:
+            return jsonify({"error": "Se requiere una lista de operaciones"}), 400
+        
+        if len(operaciones) > MAX_OPERACIONES_LOTE:
+            return jsonify({"error": f"Se permiten como máximo {MAX_OPERACIONES_LOTE} operaciones por solicitud"}), 400
+        
+        lote = []
+        for i, operacion in enumerate(operaciones):
+            try:
+                lote.append(leer_operacion(operacion))
+            except ValueError as e:
+                return jsonify({"error": f"Operación {i}: {str(e)}"}), 400
+        
+        mapa.aplicar_lote(lote)
+        return jsonify({
+            "mensaje": "Lote aplicado correctamente",
+            "operaciones": len(lote),
+            "version": mapa.version,
+            "total_ciudades": mapa.total_ciudades(),
+            "total_rutas": mapa.total_aristas()
+        })
+    except Exception as e:
+        return jsonify({"error": f"Error al aplicar el lote: {str(e)}"}), 500
+
 @app.route('/api/reset', methods=['POST'])
 def reset_grafo():
     """Reinicia el grafo a su estado inicial"""
     try:
-        mapa.adyacencia.clear()
-        mapa.tipos_ciudad.clear()
-        
-        ciudades_iniciales = [
-            "Santa Cruz", "Montero", "Cotoca", "Warnes", "Buena Vista", "San José"
-        ]
-
-        for ciudad in ciudades_iniciales:
-            mapa.agregar_ciudad(ciudad)
+        ciudades_iniciales = {
+            "Santa Cruz": (-17.7833, -63.1821),
+            "Montero": (-17.3387, -63.2505),
+            "Cotoca": (-17.7539, -62.9969),
+            "Warnes": (-17.5103, -63.1647),
+            "Buena Vista": (-17.4583, -63.6578),
+            "San José": (-17.8456, -60.7428)
+        }
 
-        mapa.agregar_arista("Santa Cruz", "Montero", 50, 45, 5)
-        mapa.agregar_arista("Santa Cruz", "Cotoca", 25, 30, 0)
-        mapa.agregar_arista("Montero", "Warnes", 20, 25, 3)
-        mapa.agregar_arista("Warnes", "Cotoca", 40, 50, 8)
-        mapa.agregar_arista("Montero", "Buena Vista", 35, 40, 6)
-        mapa.agregar_arista("Cotoca", "San José", 80, 90, 15)
+        # Todo el reinicio es un solo cambio del grafo
+        mapa.aplicar_lote([('limpiar',)] + [
+            ('agregar_ciudad', ciudad, 'normal', lat, lon)
+            for ciudad, (lat, lon) in ciudades_iniciales.items()
+        ] + [
+            ('agregar_arista', "Santa Cruz", "Montero", 50, 45, 5),
+            ('agregar_arista', "Santa Cruz", "Cotoca", 25, 30, 0),
+            ('agregar_arista', "Montero", "Warnes", 20, 25, 3),
+            ('agregar_arista', "Warnes", "Cotoca", 40, 50, 8),
+            ('agregar_arista', "Montero", "Buena Vista", 35, 40, 6),
+            ('agregar_arista', "Cotoca", "San José", 80, 90, 15)
+        ])
         
         return jsonify({
             "mensaje": "Grafo reiniciado correctamente",
@@ -453,6 +1169,5 @@ def internal_error(error):
     return jsonify({"error": "Error interno del servidor"}), 500
 
 if __name__ == '__main__':
-    import os
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
@@ -0,0 +1,73 @@
+"""Backend opcional con SciPy para matrices de costos y rutas en lote (GRAFO_BACKEND=python lo desactiva)"""
+import os
+
+try:
+    import numpy as np
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import dijkstra as dijkstra_csgraph
+except ImportError:
+    np = None
+
+disponible = np is not None and os.environ.get('GRAFO_BACKEND', 'numpy') != 'python'
+
+# Con menos orígenes, los árboles en Python (que además quedan en caché) alcanzan
+MIN_ORIGENES = 4
+
+# Celdas (orígenes × ciudades) de cada bloque de distancias, para acotar la memoria
+MAX_CELDAS_BLOQUE = 1 << 24
+
+
+def usar(origenes):
+    """Indica si conviene calcular con este backend para esa cantidad de orígenes"""
+    return disponible and origenes >= MIN_ORIGENES
+
+
+def matriz_dispersa(compilado, idx):
+    """Matriz dispersa del criterio `idx`, guardada en caché en la forma compilada"""
+    matriz = compilado.dispersas.get(idx)
+    if matriz is None:
+        n = len(compilado.nombres)
+        offsets = np.frombuffer(compilado.offsets, dtype=np.int64)
+        destinos = np.frombuffer(compilado.destinos, dtype=np.int32)
+        costos = np.frombuffer(compilado.costos[idx], dtype=np.float64)
+        validos = np.isfinite(costos)
+        if validos.all():
+            matriz = csr_matrix((costos, destinos, offsets), shape=(n, n))
+        else:
+            # Las conexiones con costos no numéricos (inf) no se pueden recorrer
+            filas = np.repeat(np.arange(n, dtype=np.int32), np.diff(offsets))
+            matriz = csr_matrix((costos[validos], (filas[validos], destinos[validos])), shape=(n, n))
+        compilado.dispersas[idx] = matriz
+    return matriz
+
+
+def _bloques(compilado, origenes, idx, predecesores):
+    """Genera (orígenes, distancias[, predecesores]) por bloques de orígenes"""
+    matriz = matriz_dispersa(compilado, idx)
+    tamano = max(1, MAX_CELDAS_BLOQUE // max(1, matriz.shape[0]))
+    for i in range(0, len(origenes), tamano):
+        parte = origenes[i:i + tamano]
+        # Las conexiones ya están en los dos sentidos: se recorre como dirigido
+        yield parte, dijkstra_csgraph(matriz, directed=True, indices=parte,
+                                      return_predecessors=predecesores)
+
+
+def matriz_costos(compilado, origenes, destinos, idx):
+    """Filas de costos mínimos de cada id de `origenes` a los ids de `destinos` (inf sin ruta)"""
+    columnas = np.asarray(destinos, dtype=np.intp)
+    filas = []
+    for _, dist in _bloques(compilado, origenes, idx, False):
+        filas.extend(dist[:, columnas].tolist())
+    return filas
+
+
+def arboles(compilado, origenes, idx):
+    """
+    Genera (origen, dist, prev) por cada id de `origenes`: el árbol completo
+    de caminos mínimos en el mismo formato que GrafoCompilado.dijkstra
+    (listas indexadas por id, inf y -1 donde no hay ruta).
+    """
+    for parte, (dist, prev) in _bloques(compilado, origenes, idx, True):
+        prev[prev < 0] = -1  # SciPy marca con -9999 las ciudades sin predecesor
+        for origen, dist_origen, prev_origen in zip(parte, dist, prev):
+            yield origen, dist_origen.tolist(), prev_origen.tolist()
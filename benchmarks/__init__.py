@@ -0,0 +1 @@
+"""Benchmarks de Grafo y de la API (python -m benchmarks --help)"""
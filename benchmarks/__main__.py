@@ -0,0 +1,131 @@
+"""Ejecuta los benchmarks, guarda los resultados en JSON y con --base detecta regresiones"""
+import argparse
+import datetime
+import fnmatch
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+# Los módulos de la aplicación están en la raíz del repositorio
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import backend_numpy  # noqa: E402
+
+from . import api, micro  # noqa: E402
+from .generadores import GENERADORES, construir  # noqa: E402
+from .medicion import resultado  # noqa: E402
+
+RUTA_UMBRALES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'umbrales.json')
+
+# Por debajo de este tiempo las diferencias son ruido y no cuentan como regresión
+MINIMO_COMPARABLE_S = 0.001
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(resultados, base, umbrales):
+    """Retorna las regresiones de `resultados` respecto de `base`"""
+    anteriores = {(r["nombre"], r["generador"], r["nodos"]): r for r in base["resultados"]}
+    regresiones = []
+    for r in resultados:
+        anterior = anteriores.get((r["nombre"], r["generador"], r["nodos"]))
+        if anterior is None or anterior["minimo_s"] < MINIMO_COMPARABLE_S:
+            continue
+        umbral = umbrales["defecto"]
+        for patron, valor in umbrales.get("pruebas", {}).items():
+            if fnmatch.fnmatch(r["nombre"], patron):
+                umbral = valor
+        # El mínimo es la medición menos afectada por el resto de la máquina
+        proporcion = r["minimo_s"] / anterior["minimo_s"]
+        if proporcion > umbral:
+            regresiones.append({
+                "nombre": r["nombre"],
+                "generador": r["generador"],
+                "nodos": r["nodos"],
+                "antes_s": anterior["minimo_s"],
+                "ahora_s": r["minimo_s"],
+                "proporcion": round(proporcion, 2),
+                "umbral": umbral
+            })
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--generadores', default='grilla,geometrico,libre_escala',
+                        help='generadores separados por coma: ' + ', '.join(GENERADORES))
+    parser.add_argument('--tamanos', default='10,100,1000',
+                        help='cantidades de ciudades separadas por coma (hasta 1000000)')
+    parser.add_argument('--solo', choices=('micro', 'api'), help='correr sólo una parte')
+    parser.add_argument('--repeticiones', type=int, default=20)
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--salida', default='resultados_benchmarks.json')
+    parser.add_argument('--base', help='resultados anteriores con los que comparar')
+    parser.add_argument('--umbrales', default=RUTA_UMBRALES)
+    args = parser.parse_args()
+
+    resultados = []
+    for nombre in args.generadores.split(','):
+        generador = GENERADORES[nombre.strip()]
+        for nodos in (int(tamano) for tamano in args.tamanos.split(',')):
+            inicio = time.perf_counter()
+            aristas = generador(nodos, semilla=args.semilla)
+            generado = time.perf_counter() - inicio
+            print(f"{nombre} {nodos}: {len(aristas)} carreteras ({generado:.2f} s)", flush=True)
+
+            if args.solo != 'api':
+                inicio = time.perf_counter()
+                grafo = construir(aristas)
+                resultados.append(resultado('construir', nombre, nodos,
+                                            [time.perf_counter() - inicio]))
+                resultados += micro.ejecutar(grafo, nombre, nodos, args.repeticiones, args.semilla)
+            if args.solo != 'micro':
+                resultados += api.ejecutar(aristas, nombre, nodos, args.repeticiones, args.semilla)
+
+    for r in resultados:
+        print(f"  {r['generador']:>12} {r['nodos']:>8} {r['nombre']:<40} "
+              f"mediana {r['mediana_s'] * 1000:10.3f} ms  p95 {r['p95_s'] * 1000:10.3f} ms")
+
+    informe = {
+        "meta": {
+            "fecha": datetime.datetime.now().isoformat(timespec='seconds'),
+            "commit": _commit(),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "backend_numpy": backend_numpy.disponible,
+            "argumentos": vars(args)
+        },
+        "resultados": resultados
+    }
+
+    codigo = 0
+    if args.base:
+        with open(args.base, encoding='utf-8') as archivo:
+            base = json.load(archivo)
+        with open(args.umbrales, encoding='utf-8') as archivo:
+            umbrales = json.load(archivo)
+        informe["regresiones"] = comparar(resultados, base, umbrales)
+        for regresion in informe["regresiones"]:
+            print(f"REGRESIÓN {regresion['generador']} {regresion['nodos']} {regresion['nombre']}: "
+                  f"x{regresion['proporcion']} (umbral x{regresion['umbral']})")
+        codigo = 1 if informe["regresiones"] else 0
+
+    with open(args.salida, 'w', encoding='utf-8') as archivo:
+        json.dump(informe, archivo, indent=2, ensure_ascii=False)
+    print(f"Resultados guardados en {args.salida}")
+    return codigo
+
+
+if __name__ == '__main__':
+    sys.exit(main())
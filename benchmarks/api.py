@@ -0,0 +1,110 @@
+"""Pruebas de carga de los endpoints con el cliente de pruebas de Flask, sobre bases temporales"""
+from contextlib import contextmanager
+import os
+import random
+import sys
+import tempfile
+
+from almacen import AlmacenGrafo
+from grafo import Grafo
+
+from .medicion import medir, resultado
+
+MAX_NODOS_TODAS_RUTAS = 300
+MAX_NODOS_LISTADOS = 50000
+
+
+# Directorio de la base con que se importó app.py (se borra al salir del proceso)
+_temporal_app = None
+
+
+def _importar_app():
+    """Importa app.py, la primera vez con una base y jerarquías temporales"""
+    global _temporal_app
+    if 'app' not in sys.modules:
+        _temporal_app = tempfile.TemporaryDirectory(prefix='bench_grafo_')
+        os.environ['GRAFO_DB'] = os.path.join(_temporal_app.name, 'grafo.db')
+        os.environ['GRAFO_JERARQUIAS'] = os.path.join(_temporal_app.name, 'jerarquias.json')
+    import app
+    return app
+
+
+@contextmanager
+def _aplicacion(aristas):
+    """app.py atendiendo con un Grafo de las carreteras dadas, en un almacén temporal propio"""
+    modulo = _importar_app()
+    anterior = modulo.mapa
+    with tempfile.TemporaryDirectory(prefix='bench_grafo_') as directorio:
+        grafo = Grafo(AlmacenGrafo(os.path.join(directorio, 'grafo.db')))
+        grafo.aplicar_lote([('agregar_arista',) + arista for arista in aristas])
+        grafo.guardar_snapshot()
+        modulo.mapa = grafo
+        modulo.cache_rutas.limpiar()
+        try:
+            yield modulo
+        finally:
+            modulo.mapa = anterior
+
+
+def ejecutar(aristas, generador, nodos, repeticiones=50, semilla=0):
+    """Carga las carreteras en la aplicación y mide sus endpoints"""
+    with _aplicacion(aristas) as modulo:
+        return _medir(modulo, generador, nodos, repeticiones, semilla)
+
+
+def _medir(modulo, generador, nodos, repeticiones, semilla):
+    cliente = modulo.app.test_client()
+
+    azar = random.Random(semilla)
+    ciudades = modulo.mapa.obtener_ciudades()
+    pares = [tuple(azar.sample(ciudades, 2)) for _ in range(repeticiones)]
+    resultados = []
+
+    def registrar(nombre, tiempos):
+        total = sum(tiempos)
+        resultados.append(resultado(nombre, generador, nodos, tiempos,
+                                    solicitudes_por_s=round(len(tiempos) / total, 1) if total else None))
+
+    def pedir(metodo, url, **kwargs):
+        respuesta = getattr(cliente, metodo)(url, **kwargs)
+        if respuesta.status_code >= 500:
+            raise RuntimeError(f"{metodo.upper()} {url}: {respuesta.status_code}")
+        return respuesta
+
+    # Primera pasada sin caché, segunda con las mismas rutas ya guardadas
+    for nombre in ('POST /ruta (sin caché)', 'POST /ruta (con caché)'):
+        registrar(nombre, medir(lambda o, d: pedir('post', '/ruta', data={
+            'origen': o, 'destino': d, 'criterio': 'distancia'}), pares))
+    modulo.cache_rutas.limpiar()
+    registrar('GET /api/ruta (sin caché)', medir(lambda o, d: pedir(
+        'get', '/api/ruta', query_string={'origen': o, 'destino': d, 'criterio': 'tiempo'}), pares))
+
+    lote = {"pares": [{"origen": o, "destino": d} for o, d in pares]}
+    registrar('POST /api/rutas/lote', medir(lambda: pedir('post', '/api/rutas/lote', json=lote), [()] * 5))
+
+    registrar('GET /api/estadisticas', medir(lambda: pedir('get', '/api/estadisticas'), [()] * 10))
+    registrar('GET /api/data?limite=100', medir(lambda: pedir('get', '/api/data?limite=100'), [()] * 10))
+
+    if nodos <= MAX_NODOS_LISTADOS:
+        for url in ('/api/data', '/api/rutas', '/api/ciudades'):
+            registrar(f'GET {url}', medir(lambda: pedir('get', url), [()] * 5))
+        etag = pedir('get', '/api/data').headers['ETag']
+        registrar('GET /api/data (304)', medir(lambda: pedir(
+            'get', '/api/data', headers={'If-None-Match': etag}), [()] * 10))
+
+    if nodos <= MAX_NODOS_TODAS_RUTAS:
+        def todas_rutas(url):
+            modulo.mapa.compilado().todas_rutas = None
+            modulo.mapa.compilado().arboles.clear()
+            pedir('get', url).get_data()
+        for url in ('/api/todas-rutas-posibles', '/api/todas-rutas-posibles/stream'):
+            registrar(f'GET {url}', medir(todas_rutas, [(url,)] * 3))
+
+    # Modificaciones: alta y baja de carreteras seguidas de una consulta de ruta
+    def modificar(o, d):
+        pedir('post', '/api/rutas', json={'origen': o, 'destino': d, 'distancia': 10, 'tiempo': 10, 'peaje': 0})
+        pedir('get', '/api/ruta', query_string={'origen': o, 'destino': d})
+        pedir('delete', '/api/rutas', json={'origen': o, 'destino': d})
+    registrar('POST+GET+DELETE /api/rutas', medir(modificar, pares[:max(1, repeticiones // 5)]))
+
+    return resultados
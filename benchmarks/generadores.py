@@ -0,0 +1,96 @@
+"""Generadores reproducibles de grafos sintéticos parecidos a redes de carreteras"""
+import math
+import random
+
+from grafo import Grafo
+
+
+def _costos(azar, distancia):
+    """Tiempo (a 40-110 km/h) y peaje (un tramo de cada cinco) de una carretera"""
+    distancia = max(1, round(distancia))
+    tiempo = max(1, round(distancia * 60 / azar.uniform(40, 110)))
+    peaje = azar.randint(1, 30) if azar.random() < 0.2 else 0
+    return distancia, tiempo, peaje
+
+
+def grilla(n, semilla=0):
+    """Grilla cuadrada de unas `n` ciudades con carreteras a sus 4 vecinas"""
+    azar = random.Random(semilla)
+    lado = max(2, math.isqrt(n))
+    aristas = []
+    for fila in range(lado):
+        for columna in range(lado):
+            ciudad = f"g{fila}_{columna}"
+            if columna + 1 < lado:
+                aristas.append((ciudad, f"g{fila}_{columna + 1}",
+                                *_costos(azar, azar.uniform(20, 80))))
+            if fila + 1 < lado:
+                aristas.append((ciudad, f"g{fila + 1}_{columna}",
+                                *_costos(azar, azar.uniform(20, 80))))
+    return aristas
+
+
+def geometrico(n, grado=6, semilla=0):
+    """
+    Grafo geométrico aleatorio: `n` ciudades en un cuadrado de 1000 km
+    unidas con las que están a menos de un radio elegido para un grado
+    promedio cercano a `grado`. Usa celdas del tamaño del radio, así que
+    se genera en tiempo lineal.
+    """
+    azar = random.Random(semilla)
+    lado_km = 1000.0
+    radio = lado_km * math.sqrt(grado / (math.pi * n))
+    puntos = [(azar.uniform(0, lado_km), azar.uniform(0, lado_km)) for _ in range(n)]
+    celdas = {}
+    for i, (x, y) in enumerate(puntos):
+        celdas.setdefault((int(x // radio), int(y // radio)), []).append(i)
+
+    aristas = []
+    for i, (x, y) in enumerate(puntos):
+        cx, cy = int(x // radio), int(y // radio)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for j in celdas.get((cx + dx, cy + dy), ()):
+                    if j <= i:
+                        continue
+                    distancia = math.hypot(x - puntos[j][0], y - puntos[j][1])
+                    if distancia <= radio:
+                        aristas.append((f"p{i}", f"p{j}", *_costos(azar, distancia * 1.3)))
+    return aristas
+
+
+def libre_escala(n, m=2, semilla=0):
+    """
+    Red libre de escala (Barabási–Albert): cada ciudad nueva se une a `m`
+    existentes elegidas con probabilidad proporcional a su grado, como
+    pueblos que se conectan a los centros regionales.
+    """
+    azar = random.Random(semilla)
+    aristas = []
+    extremos = []  # Cada ciudad aparece una vez por cada conexión que tiene
+    for nueva in range(m + 1):
+        for anterior in range(nueva):
+            aristas.append((f"s{anterior}", f"s{nueva}", *_costos(azar, azar.uniform(30, 300))))
+            extremos += [anterior, nueva]
+    for nueva in range(m + 1, n):
+        elegidas = set()
+        while len(elegidas) < m:
+            elegidas.add(azar.choice(extremos))
+        for anterior in elegidas:
+            aristas.append((f"s{anterior}", f"s{nueva}", *_costos(azar, azar.uniform(30, 300))))
+            extremos += [anterior, nueva]
+    return aristas
+
+
+GENERADORES = {
+    'grilla': grilla,
+    'geometrico': geometrico,
+    'libre_escala': libre_escala
+}
+
+
+def construir(aristas, almacen=None):
+    """Arma un Grafo con las carreteras generadas, en un solo lote"""
+    grafo = Grafo(almacen)
+    grafo.aplicar_lote(('agregar_arista',) + arista for arista in aristas)
+    return grafo
@@ -0,0 +1,28 @@
+"""Medición de tiempos y formato de los resultados"""
+import statistics
+import time
+
+
+def medir(funcion, argumentos):
+    """Ejecuta `funcion` una vez por cada elemento de `argumentos` y retorna los tiempos"""
+    tiempos = []
+    for args in argumentos:
+        inicio = time.perf_counter()
+        funcion(*args)
+        tiempos.append(time.perf_counter() - inicio)
+    return tiempos
+
+
+def resultado(nombre, generador, nodos, tiempos, **extra):
+    """Resumen de una serie de tiempos (en segundos)"""
+    ordenados = sorted(tiempos)
+    return {
+        "nombre": nombre,
+        "generador": generador,
+        "nodos": nodos,
+        "repeticiones": len(tiempos),
+        "mediana_s": statistics.median(ordenados),
+        "p95_s": ordenados[min(len(ordenados) - 1, int(0.95 * len(ordenados)))],
+        "minimo_s": ordenados[0],
+        **extra
+    }
@@ -0,0 +1,137 @@
+"""Microbenchmarks de los métodos de Grafo, por criterio y método de búsqueda"""
+import random
+import time
+
+from grafo import CRITERIOS, METODOS
+import paralelo
+
+from .medicion import medir, resultado
+
+# Tamaños a partir de los cuales se omiten los benchmarks más costosos
+MAX_NODOS_JERARQUIA = 5000
+MAX_NODOS_TODAS_RUTAS = 300
+MAX_NODOS_PARETO = 5000
+MAX_NODOS_ALTERNATIVAS = 100000
+
+# Caja de Bolivia (latitudes y longitudes) donde se ubican al azar las ciudades
+LATITUDES = (-22.9, -9.7)
+LONGITUDES = (-69.6, -57.5)
+
+
+def ejecutar(grafo, generador, nodos, repeticiones=20, semilla=0):
+    """Corre los microbenchmarks sobre `grafo` y retorna la lista de resultados"""
+    azar = random.Random(semilla)
+    ciudades = grafo.obtener_ciudades()
+    resultados = []
+
+    def pares(cantidad):
+        return [tuple(azar.sample(ciudades, 2)) for _ in range(cantidad)]
+
+    inicio = time.perf_counter()
+    grafo.compilado()
+    resultados.append(resultado('compilar', generador, nodos, [time.perf_counter() - inicio]))
+
+    if nodos <= MAX_NODOS_JERARQUIA:
+        inicio = time.perf_counter()
+        grafo.construir_jerarquias()
+        resultados.append(resultado('construir_jerarquias', generador, nodos,
+                                    [time.perf_counter() - inicio]))
+
+    for criterio in CRITERIOS:
+        for metodo in METODOS:
+            if metodo == 'ch' and grafo.jerarquia(criterio) is None:
+                continue
+            # Sin árboles en caché, para medir la búsqueda y no la consulta al árbol guardado
+            grafo.compilado().arboles.clear()
+            tiempos = medir(lambda o, d: grafo.dijkstra(o, d, criterio, metodo), pares(repeticiones))
+            resultados.append(resultado(f'dijkstra/{criterio}/{metodo}', generador, nodos, tiempos))
+
+        grafo.compilado().arboles.clear()
+        tiempos = medir(lambda o: grafo.dijkstra_desde(o, criterio),
+                        [(ciudad,) for ciudad in azar.sample(ciudades, min(repeticiones, len(ciudades)))])
+        resultados.append(resultado(f'dijkstra_desde/{criterio}', generador, nodos, tiempos))
+
+        lote = [(o, d, criterio) for o, d in pares(100)]
+        grafo.compilado().arboles.clear()
+        tiempos = medir(grafo.rutas_lote, [(lote,)] * 3)
+        resultados.append(resultado(f'rutas_lote_100/{criterio}', generador, nodos, tiempos))
+
+        origenes = azar.sample(ciudades, min(10, len(ciudades)))
+        destinos = azar.sample(ciudades, min(10, len(ciudades)))
+        grafo.compilado().arboles.clear()
+        tiempos = medir(grafo.matriz, [(origenes, destinos, criterio)] * 3)
+        resultados.append(resultado(f'matriz_10x10/{criterio}', generador, nodos, tiempos))
+
+    if nodos <= MAX_NODOS_PARETO:
+        tiempos = medir(lambda o, d: grafo.rutas_pareto(o, d, 20), pares(max(1, repeticiones // 4)))
+        resultados.append(resultado('rutas_pareto', generador, nodos, tiempos))
+
+    if nodos <= MAX_NODOS_ALTERNATIVAS:
+        tiempos = medir(lambda o, d: grafo.rutas_alternativas(o, d, 5), pares(max(1, repeticiones // 4)))
+        resultados.append(resultado('rutas_alternativas_5', generador, nodos, tiempos))
+
+    if nodos <= MAX_NODOS_TODAS_RUTAS:
+        def todas_las_rutas():
+            grafo.compilado().todas_rutas = None
+            grafo.compilado().arboles.clear()
+            grafo.todas_las_rutas()
+        tiempos = medir(todas_las_rutas, [()] * 3)
+        resultados.append(resultado('todas_las_rutas', generador, nodos, tiempos))
+
+    procesos = paralelo.procesos_disponibles()
+    if procesos > 1 and paralelo.MIN_CIUDADES <= nodos <= MAX_NODOS_TODAS_RUTAS:
+        def todas_las_rutas_ndjson():
+            grafo.compilado().todas_rutas = None
+            for _ in grafo.iterar_rutas_ndjson(procesos):
+                pass
+        tiempos = medir(todas_las_rutas_ndjson, [()] * 3)
+        resultados.append(resultado('todas_las_rutas_ndjson', generador, nodos, tiempos,
+                                    procesos=procesos))
+
+    tiempos = medir(grafo.estadisticas, [()] * repeticiones)
+    resultados.append(resultado('estadisticas', generador, nodos, tiempos))
+
+    # Modificaciones (al final, porque cambian el grafo)
+    nuevas = pares(repeticiones)
+    tiempos = medir(lambda o, d: grafo.agregar_arista(o, d, 50, 45, 5), nuevas)
+    resultados.append(resultado('agregar_arista', generador, nodos, tiempos))
+
+    tiempos = medir(grafo.eliminar_arista, nuevas)
+    resultados.append(resultado('eliminar_arista', generador, nodos, tiempos))
+
+    # Cada modificación seguida de una consulta obliga a recompilar
+    tiempos = medir(lambda o, d: (grafo.agregar_arista(o, d, 50, 45, 5), grafo.dijkstra(o, d)),
+                    pares(max(1, repeticiones // 4)))
+    resultados.append(resultado('agregar_arista+dijkstra', generador, nodos, tiempos))
+
+    # Flujo de cambios de costo con consultas desde un origen fijo: se recompilan
+    # sólo las filas cambiadas y el árbol del origen se repara (comparar con 'compilar')
+    origen = ciudades[0]
+    grafo.dijkstra_desde(origen)
+    existentes = [(ciudad, next(iter(grafo.adyacencia[ciudad])))
+                  for ciudad in azar.sample(ciudades, min(repeticiones, len(ciudades)))
+                  if grafo.adyacencia[ciudad]]
+    tiempos = medir(lambda o, d: (grafo.agregar_arista(o, d, azar.randint(1, 100), 45, 5),
+                                  grafo.dijkstra(origen, d)), existentes)
+    resultados.append(resultado('cambiar_costo+dijkstra', generador, nodos, tiempos))
+
+    eliminadas = [(ciudad,) for ciudad in azar.sample(ciudades, min(repeticiones, len(ciudades) // 2))]
+    tiempos = medir(grafo.eliminar_ciudad, eliminadas)
+    resultados.append(resultado('eliminar_ciudad', generador, nodos, tiempos))
+
+    # Consultas espaciales: los grafos sintéticos no traen coordenadas, se ubican al azar
+    inicio = time.perf_counter()
+    grafo.aplicar_lote(('ubicar_ciudad', ciudad, azar.uniform(*LATITUDES), azar.uniform(*LONGITUDES))
+                       for ciudad in grafo.obtener_ciudades())
+    grafo.compilado()
+    resultados.append(resultado('ubicar_ciudades', generador, nodos, [time.perf_counter() - inicio]))
+
+    puntos = [(azar.uniform(*LATITUDES), azar.uniform(*LONGITUDES)) for _ in range(repeticiones)]
+    tiempos = medir(lambda lat, lon: grafo.ciudades_cercanas(lat, lon, 10), puntos)
+    resultados.append(resultado('ciudades_cercanas_10', generador, nodos, tiempos))
+
+    tiempos = medir(lambda lat, lon: list(grafo.filtrar_aristas(caja=(lat, lon, lat + 0.5, lon + 0.5))),
+                    puntos)
+    resultados.append(resultado('aristas_en_caja', generador, nodos, tiempos))
+
+    return resultados
@@ -0,0 +1,85 @@
+"""Caché LRU de respuestas de rutas, con vencimiento y descartada al cambiar la versión del grafo"""
+from collections import OrderedDict
+import threading
+import time
+
+
+class CacheRutas:
+    def __init__(self, capacidad=1024, ttl=300, reloj=time.monotonic):
+        self.capacidad = capacidad  # Máximo de entradas (0 desactiva la caché)
+        self.ttl = ttl  # Segundos de vida de cada entrada (None: sin vencimiento)
+        self._reloj = reloj
+        self._entradas = OrderedDict()  # clave -> (vence, valor), de la menos a la más usada
+        self._version = None  # Versión del grafo de las entradas guardadas
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+        self.vencidas = 0
+
+    def _validar_version(self, version):
+        """
+        Descarta las entradas si el grafo pasó a una versión más nueva.
+        Retorna False si `version` es anterior a la de las entradas guardadas
+        (una solicitud que empezó antes de un cambio).
+        """
+        if self._version is not None and version < self._version:
+            return False
+        if version != self._version:
+            self._entradas.clear()
+            self._version = version
+        return True
+
+    def obtener(self, clave, version):
+        """Retorna el valor guardado para `clave` en la versión indicada, o None"""
+        with self._lock:
+            entrada = self._entradas.get(clave) if self._validar_version(version) else None
+            if entrada is not None and entrada[0] is not None and entrada[0] <= self._reloj():
+                del self._entradas[clave]
+                self.vencidas += 1
+                entrada = None
+            if entrada is None:
+                self.fallos += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+            return entrada[1]
+
+    def guardar(self, clave, version, valor):
+        """Guarda un valor calculado sobre la versión indicada del grafo"""
+        if self.capacidad <= 0:
+            return
+        with self._lock:
+            if not self._validar_version(version):
+                return
+            vence = self._reloj() + self.ttl if self.ttl is not None else None
+            self._entradas[clave] = (vence, valor)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.capacidad:
+                self._entradas.popitem(last=False)
+                self.desalojos += 1
+
+    def limpiar(self):
+        """
+        Elimina todas las entradas y olvida la versión del grafo, para poder
+        usarla con otro grafo (los contadores se mantienen)
+        """
+        with self._lock:
+            self._entradas.clear()
+            self._version = None
+
+    def estadisticas(self):
+        """Contadores de uso de la caché"""
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                "capacidad": self.capacidad,
+                "ttl": self.ttl,
+                "entradas": len(self._entradas),
+                "version_grafo": self._version,
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "tasa_aciertos": round(self.aciertos / consultas, 4) if consultas else 0,
+                "desalojos": self.desalojos,
+                "vencidas": self.vencidas
+            }
@@ -0,0 +1,179 @@
+"""Carga masiva de redes de carreteras desde archivos CSV, GeoJSON o de OpenStreetMap"""
+import csv
+import json
+import math
+import os
+
+from espacial import distancia_km, leer_coordenadas
+
+TAMANO_BLOQUE = 50000
+
+
+def cargar(grafo, ruta, formato=None, tamano_bloque=TAMANO_BLOQUE):
+    """
+    Carga las carreteras del archivo en `grafo`. Si no se indica el formato
+    se deduce de la extensión. Retorna un resumen con las carreteras leídas,
+    las repetidas en todo el archivo (leídas - repetidas son las distintas),
+    las omitidas por datos inválidos y los lotes aplicados.
+    """
+    formato = formato or _deducir_formato(ruta)
+    lectores = {'csv': leer_csv, 'geojson': leer_geojson, 'osm': leer_osm}
+    if formato not in lectores:
+        raise ValueError(f"Formato no soportado: {formato}")
+
+    resumen = {"leidas": 0, "repetidas": 0, "omitidas": 0, "lotes": 0}
+    inicial = grafo.total_ciudades() == 0
+    bloque = {}
+    aplicadas = set()  # Claves de las carreteras de los bloques ya aplicados
+    ubicaciones = {}  # ciudad -> (lat, lon) de las carreteras del bloque
+
+    def aplicar():
+        grafo.aplicar_lote([('agregar_arista',) + arista for arista in bloque.values()] +
+                           [('ubicar_ciudad', ciudad, *punto) for ciudad, punto in ubicaciones.items()])
+        resumen["lotes"] += 1
+        aplicadas.update(bloque)
+        bloque.clear()
+        ubicaciones.clear()
+
+    with open(ruta, encoding='utf-8', newline='') as archivo:
+        for arista in lectores[formato](archivo):
+            if arista is None:
+                resumen["omitidas"] += 1
+                continue
+            resumen["leidas"] += 1
+            if len(arista) > 5:
+                # Los lectores pueden agregar el (lat, lon) de origen y destino
+                for ciudad, punto in zip(arista[:2], arista[5:]):
+                    if punto is not None:
+                        ubicaciones[ciudad] = punto
+                arista = arista[:5]
+            origen, destino = arista[0], arista[1]
+            clave = (origen, destino) if origen < destino else (destino, origen)
+            if clave in bloque or clave in aplicadas:
+                resumen["repetidas"] += 1
+            bloque[clave] = arista
+            if len(bloque) >= tamano_bloque and not inicial:
+                aplicar()
+    if inicial and bloque:
+        grafo.cargar_aristas(bloque.values(), ubicaciones)
+        resumen["lotes"] += 1
+    elif bloque:
+        aplicar()
+    return resumen
+
+
+def _deducir_formato(ruta):
+    extension = os.path.splitext(ruta)[1].lower()
+    if extension in ('.geojson', '.geojsonl', '.geojsons', '.json'):
+        return 'geojson'
+    return 'csv'
+
+
+def _arista(origen, destino, distancia, tiempo=0, peaje=0):
+    """Normaliza una carretera leída; None si le faltan datos o no son números"""
+    origen = str(origen or '').strip()
+    destino = str(destino or '').strip()
+    if not origen or not destino or origen == destino:
+        return None
+    try:
+        costos = [float(valor) if valor not in (None, '') else 0
+                  for valor in (distancia, tiempo, peaje)]
+    except (ValueError, TypeError):
+        return None
+    if any(costo < 0 or math.isnan(costo) or math.isinf(costo) for costo in costos):
+        return None
+    # Los costos enteros se guardan como enteros, igual que los de la API
+    costos = [int(costo) if float(costo).is_integer() else costo for costo in costos]
+    return (origen, destino, *costos)
+
+
+def leer_csv(archivo):
+    """Genera las carreteras de un CSV con columnas origen, destino, distancia, tiempo y peaje"""
+    for fila in csv.DictReader(archivo):
+        yield _arista(fila.get('origen') or fila.get('ciudad1'),
+                      fila.get('destino') or fila.get('ciudad2'),
+                      fila.get('distancia'), fila.get('tiempo'), fila.get('peaje'))
+
+
+def leer_geojson(archivo):
+    """Genera las carreteras de un FeatureCollection o de GeoJSON por líneas"""
+    inicio = archivo.read(4096)
+    archivo.seek(0)
+    if '"FeatureCollection"' in inicio:
+        # Un FeatureCollection es un único objeto JSON: se lee entero
+        features = json.load(archivo).get('features', [])
+    else:
+        features = (json.loads(linea.strip().lstrip('\x1e'))
+                    for linea in archivo if linea.strip())
+    for feature in features:
+        yield _arista_geojson(feature)
+
+
+def _arista_geojson(feature):
+    """Carretera de una Feature, seguida del (lat, lon) de sus extremos si la geometría los trae"""
+    propiedades = feature.get('properties') or {}
+    geometria = feature.get('geometry') or {}
+    coordenadas = (geometria.get('coordinates') or []) if geometria.get('type') == 'LineString' else []
+    distancia = propiedades.get('distancia')
+    if distancia is None:
+        if geometria.get('type') != 'LineString':
+            return None
+        distancia = round(longitud_km(coordenadas), 3)
+    arista = _arista(propiedades.get('origen') or propiedades.get('from'),
+                     propiedades.get('destino') or propiedades.get('to'),
+                     distancia, propiedades.get('tiempo'), propiedades.get('peaje'))
+    if arista is None or len(coordenadas) < 2:
+        return arista
+    return arista + (_punto(coordenadas[0]), _punto(coordenadas[-1]))
+
+
+def _punto(posicion):
+    """(lat, lon) de una posición GeoJSON [lon, lat], o None si no es válida"""
+    try:
+        return leer_coordenadas(posicion[1], posicion[0])
+    except (ValueError, TypeError, IndexError):
+        return None
+
+
+def leer_osm(archivo):
+    """
+    Genera las carreteras de aristas de OpenStreetMap (u, v, length en
+    metros, travel_time en segundos, toll). El peaje se cuenta como 1 si la
+    vía lo tiene, porque OSM no trae montos.
+    """
+    for fila in csv.DictReader(archivo):
+        try:
+            distancia = float(fila['length']) / 1000
+            tiempo = float(fila['travel_time']) / 60 if fila.get('travel_time') else 0
+        except (KeyError, ValueError, TypeError):
+            yield None
+            continue
+        peaje = 1 if (fila.get('toll') or '').lower() in ('yes', 'true', '1') else 0
+        yield _arista(fila.get('u'), fila.get('v'), round(distancia, 3), round(tiempo, 1), peaje)
+
+
+def longitud_km(coordenadas):
+    """Largo en km de una línea de coordenadas [lon, lat] (fórmula del haversine)"""
+    total = 0.0
+    for (lon1, lat1, *_), (lon2, lat2, *_) in zip(coordenadas, coordenadas[1:]):
+        total += distancia_km(lat1, lon1, lat2, lon2)
+    return total
+
+
+if __name__ == '__main__':
+    import sys
+
+    from app import mapa
+
+    argumentos = [argumento for argumento in sys.argv[1:] if argumento != '--reemplazar']
+    if not argumentos:
+        print("Uso: python cargador.py archivo [csv|geojson|osm] [--reemplazar]")
+        sys.exit(1)
+    if '--reemplazar' in sys.argv:
+        # Se descarta el grafo guardado (y los datos de ejemplo): es una carga inicial
+        mapa.limpiar()
+    resumen = cargar(mapa, argumentos[0], argumentos[1] if len(argumentos) > 1 else None)
+    mapa.guardar_snapshot()
+    print(f"Carreteras cargadas: {resumen['leidas'] - resumen['repetidas']} "
+          f"(repetidas: {resumen['repetidas']}, omitidas: {resumen['omitidas']}, "
+          f"lotes: {resumen['lotes']})")
@@ -0,0 +1,609 @@
+from array import array
+from collections import OrderedDict
+import hashlib
+import heapq
+import threading
+
+INF = float('inf')
+
+# Límite de la caché de árboles de caminos mínimos: a lo sumo MAX_CELDAS_ARBOLES
+# posiciones entre todos los árboles, y entre MIN_ARBOLES y MAX_ARBOLES árboles
+MAX_CELDAS_ARBOLES = 4_000_000
+MIN_ARBOLES = 8
+MAX_ARBOLES = 1024
+
+
+def sumar_contadores(contadores, extraidos, obsoletos, pendientes):
+    """
+    Suma a `contadores` ({'asentados', 'empujes', 'obsoletos'}) el trabajo de
+    una búsqueda: cada elemento que entró a la cola salió de ella (asentado
+    u obsoleto) o quedó pendiente, así que los empujes no se cuentan aparte.
+    """
+    contadores['asentados'] = contadores.get('asentados', 0) + extraidos - obsoletos
+    contadores['obsoletos'] = contadores.get('obsoletos', 0) + obsoletos
+    contadores['empujes'] = contadores.get('empujes', 0) + extraidos + pendientes
+
+
+class CacheArboles:
+    """
+    Árboles de caminos mínimos por (origen, criterio) con desalojo LRU: al
+    superar la capacidad se descarta el árbol usado hace más tiempo. items()
+    los recorre del menos al más usado.
+    """
+
+    def __init__(self, capacidad):
+        self.capacidad = capacidad
+        self._arboles = OrderedDict()
+        self._lock = threading.Lock()
+        self.desalojos = 0
+
+    def __len__(self):
+        return len(self._arboles)
+
+    def get(self, clave):
+        with self._lock:
+            arbol = self._arboles.get(clave)
+            if arbol is not None:
+                self._arboles.move_to_end(clave)
+            return arbol
+
+    def guardar(self, clave, arbol):
+        with self._lock:
+            self._arboles[clave] = arbol
+            self._arboles.move_to_end(clave)
+            while len(self._arboles) > self.capacidad:
+                self._arboles.popitem(last=False)
+                self.desalojos += 1
+
+    def items(self):
+        with self._lock:
+            return list(self._arboles.items())
+
+    def clear(self):
+        with self._lock:
+            self._arboles.clear()
+
+
+class GrafoCompilado:
+    """
+    Representación compacta y de sólo lectura de un Grafo.
+
+    Las ciudades se identifican con enteros y las conexiones se guardan en
+    formato CSR (compressed sparse row): las conexiones de la ciudad `u` son
+    las posiciones `offsets[u]` a `offsets[u + 1] - 1` de `destinos`, y sus
+    costos están en las columnas paralelas de `costos` (distancia, tiempo,
+    peaje). Las posiciones de `nombres` con None corresponden a ciudades
+    eliminadas. `coordenadas` tiene el (lat, lon) de las ciudades ubicadas.
+    """
+
+    def __init__(self, nombres, tipos, offsets, destinos, distancias, tiempos, peajes,
+                 coordenadas=None, ids=None):
+        self.nombres = nombres
+        self.tipos = tipos
+        self.coordenadas = coordenadas if coordenadas is not None else {}
+        if ids is None:
+            ids = {nombre: i for i, nombre in enumerate(nombres) if nombre is not None}
+        self.ids = ids
+        self.offsets = offsets
+        self.destinos = destinos
+        # Columnas de costos indexadas igual que INDICES_CRITERIO (1, 2, 3)
+        self.costos = (None, distancias, tiempos, peajes)
+        self.version = None  # Versión del Grafo que representa
+        # Caché de árboles de caminos mínimos por (origen, criterio)
+        self.arboles = CacheArboles(max(MIN_ARBOLES, min(MAX_ARBOLES,
+                                                         MAX_CELDAS_ARBOLES // max(1, len(nombres)))))
+        self.todas_rutas = None  # Caché de la tabla completa de rutas
+        self.landmarks = {}  # Distancias desde los landmarks ALT por criterio
+        self.ponderadas = {}  # Columnas de costos combinados por pesos
+        self.dispersas = {}  # Matrices dispersas de SciPy por criterio (backend_numpy)
+        self._extension = None  # Caja que contiene a las ciudades ubicadas
+
+    def extension(self):
+        """(lat_min, lon_min, lat_max, lon_max) de las ciudades con coordenadas, o None si no hay"""
+        if self._extension is None and self.coordenadas:
+            latitudes = [lat for lat, _ in self.coordenadas.values()]
+            longitudes = [lon for _, lon in self.coordenadas.values()]
+            self._extension = (min(latitudes), min(longitudes), max(latitudes), max(longitudes))
+        return self._extension
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def total_aristas(self):
+        return len(self.destinos) // 2
+
+    def aristas_desde(self, despues=(-1, -1)):
+        """
+        Genera las aristas (u < v) en orden de (u, v), empezando por las
+        posteriores a `despues`. Como los ids son estables, sirve de cursor
+        para recorrer el grafo por partes aunque cambie entre medio.
+        """
+        offsets, destinos = self.offsets, self.destinos
+        _, distancias, tiempos, peajes = self.costos
+        u0, v0 = despues
+        for u in range(max(u0, 0), len(self.nombres)):
+            minimo = v0 if u == u0 else u
+            fila = sorted((destinos[k], k) for k in range(offsets[u], offsets[u + 1])
+                          if destinos[k] > minimo)
+            for v, k in fila:
+                yield u, v, distancias[k], tiempos[k], peajes[k]
+
+    def huella(self):
+        """Hash del contenido del grafo (ids, conexiones y costos)"""
+        h = hashlib.sha1()
+        h.update('\0'.join(nombre or '' for nombre in self.nombres).encode('utf-8'))
+        h.update(self.offsets.tobytes())
+        h.update(self.destinos.tobytes())
+        for columna in self.costos[1:]:
+            h.update(columna.tobytes())
+        return h.hexdigest()
+
+    def grado(self, u):
+        """Cantidad de conexiones de la ciudad con id `u`"""
+        return self.offsets[u + 1] - self.offsets[u]
+
+    def vecinos(self, u):
+        """Genera (id_vecino, distancia, tiempo, peaje) para la ciudad `u`"""
+        _, distancias, tiempos, peajes = self.costos
+        for k in range(self.offsets[u], self.offsets[u + 1]):
+            yield self.destinos[k], distancias[k], tiempos[k], peajes[k]
+
+    def aristas(self):
+        """Genera cada arista una sola vez como (id1, id2, distancia, tiempo, peaje)"""
+        offsets, destinos = self.offsets, self.destinos
+        _, distancias, tiempos, peajes = self.costos
+        for u in range(len(self.nombres)):
+            for k in range(offsets[u], offsets[u + 1]):
+                v = destinos[k]
+                if u < v:
+                    yield u, v, distancias[k], tiempos[k], peajes[k]
+
+    def dijkstra(self, origen, idx, destino=-1, costos=None, contadores=None):
+        """
+        Dijkstra sobre los arreglos CSR. Si `destino` es -1 calcula el árbol
+        completo desde `origen`; retorna las listas (dist, prev) indexadas por id.
+        `costos` permite usar otra columna de costos en lugar de la del criterio.
+        Si se pasa `contadores` (ver sumar_contadores) se le suma el trabajo hecho.
+        """
+        n = len(self.nombres)
+        offsets, destinos = self.offsets, self.destinos
+        if costos is None:
+            costos = self.costos[idx]
+        dist = [INF] * n
+        prev = [-1] * n
+        dist[origen] = 0
+        pq = [(0, origen)]
+        extraidos = obsoletos = 0
+
+        while pq:
+            costo_actual, u = heapq.heappop(pq)
+            extraidos += 1
+            if costo_actual > dist[u]:
+                obsoletos += 1
+                continue
+            if u == destino:
+                break
+            for k in range(offsets[u], offsets[u + 1]):
+                v = destinos[k]
+                nuevo_costo = costo_actual + costos[k]
+                if nuevo_costo < dist[v]:
+                    dist[v] = nuevo_costo
+                    prev[v] = u
+                    heapq.heappush(pq, (nuevo_costo, v))
+
+        if contadores is not None:
+            sumar_contadores(contadores, extraidos, obsoletos, len(pq))
+        return dist, prev
+
+    def arbol(self, origen, idx, guardar=True):
+        """
+        Árbol completo de caminos mínimos desde `origen`. Se toma de la caché
+        si está, y con `guardar` se agrega a ella si no estaba.
+        """
+        clave = (origen, idx)
+        arbol = self.arboles.get(clave)
+        if arbol is None:
+            arbol = self.dijkstra(origen, idx)
+            if guardar:
+                self.arboles.guardar(clave, arbol)
+        return arbol
+
+    def dijkstra_bidireccional(self, origen, destino, idx, contadores=None):
+        """
+        Dijkstra bidireccional: avanza a la vez desde el origen y desde el
+        destino (las carreteras son no dirigidas, así que la búsqueda hacia
+        atrás usa los mismos arreglos) y se detiene cuando los frentes ya no
+        pueden mejorar el mejor encuentro. Retorna (costo, camino en ids).
+        """
+        if origen == destino:
+            return 0, [origen]
+
+        offsets, destinos, costos = self.offsets, self.destinos, self.costos[idx]
+        dist = ({origen: 0}, {destino: 0})
+        prev = ({origen: -1}, {destino: -1})
+        asentados = (set(), set())
+        colas = ([(0, origen)], [(0, destino)])
+        mejor = INF
+        encuentro = -1
+        extraidos = obsoletos = 0
+
+        while colas[0] and colas[1]:
+            if colas[0][0][0] + colas[1][0][0] >= mejor:
+                break
+            lado = 0 if colas[0][0][0] <= colas[1][0][0] else 1
+            dist_lado, prev_lado, dist_otro = dist[lado], prev[lado], dist[1 - lado]
+
+            costo_actual, u = heapq.heappop(colas[lado])
+            extraidos += 1
+            if u in asentados[lado]:
+                obsoletos += 1
+                continue
+            asentados[lado].add(u)
+
+            for k in range(offsets[u], offsets[u + 1]):
+                v = destinos[k]
+                nuevo_costo = costo_actual + costos[k]
+                if nuevo_costo < dist_lado.get(v, INF):
+                    dist_lado[v] = nuevo_costo
+                    prev_lado[v] = u
+                    heapq.heappush(colas[lado], (nuevo_costo, v))
+                if v in dist_otro:
+                    total = dist_lado[v] + dist_otro[v]
+                    if total < mejor:
+                        mejor = total
+                        encuentro = v
+
+        if contadores is not None:
+            sumar_contadores(contadores, extraidos, obsoletos, len(colas[0]) + len(colas[1]))
+        if encuentro == -1:
+            return INF, []
+
+        camino = []
+        nodo = encuentro
+        while nodo != -1:
+            camino.append(nodo)
+            nodo = prev[0][nodo]
+        camino.reverse()
+        nodo = prev[1][encuentro]
+        while nodo != -1:
+            camino.append(nodo)
+            nodo = prev[1][nodo]
+        return mejor, camino
+
+    def preparar_landmarks(self, idx, cantidad=8):
+        """
+        Elige landmarks para la heurística ALT con selección "más lejano":
+        cada nuevo landmark es la ciudad más alejada de los ya elegidos.
+        Guarda la distancia de cada landmark a todas las ciudades.
+        """
+        distancias = self.landmarks.get(idx)
+        if distancias is not None:
+            return distancias
+
+        distancias = []
+        if self.ids:
+            cercania = [INF] * len(self.nombres)
+            candidato = next(iter(self.ids.values()))
+            for _ in range(min(cantidad, len(self.ids))):
+                dist, _ = self.arbol(candidato, idx)
+                distancias.append(dist)
+                siguiente, mayor = -1, -1
+                for u in self.ids.values():
+                    if dist[u] < cercania[u]:
+                        cercania[u] = dist[u]
+                    # Las ciudades no alcanzadas por ningún landmark tienen prioridad
+                    if cercania[u] > mayor:
+                        siguiente, mayor = u, cercania[u]
+                if mayor <= 0:
+                    break
+                candidato = siguiente
+
+        self.landmarks[idx] = distancias
+        return distancias
+
+    def heuristica_alt(self, destino, idx):
+        """
+        Cota inferior ALT hacia `destino`: por desigualdad triangular,
+        |d(L, destino) - d(L, v)| <= d(v, destino) para cada landmark L.
+        """
+        landmarks = [(dist, dist[destino]) for dist in self.preparar_landmarks(idx)]
+
+        def h(v):
+            cota = 0
+            for dist, hasta_destino in landmarks:
+                desde_v = dist[v]
+                if desde_v == INF or hasta_destino == INF:
+                    if desde_v != hasta_destino:
+                        return INF  # v y destino están en componentes distintas
+                    continue
+                diferencia = abs(hasta_destino - desde_v)
+                if diferencia > cota:
+                    cota = diferencia
+            return cota
+
+        return h
+
+    def a_estrella(self, origen, destino, idx, heuristica=None, contadores=None):
+        """
+        A* desde `origen` hasta `destino` guiado por una heurística admisible
+        (por defecto la cota ALT). Retorna (costo, camino en ids).
+        """
+        if heuristica is None:
+            heuristica = self.heuristica_alt(destino, idx)
+
+        offsets, destinos, costos = self.offsets, self.destinos, self.costos[idx]
+        dist = {origen: 0}
+        prev = {origen: -1}
+        asentados = set()
+        pq = [(heuristica(origen), 0, origen)]
+        extraidos = obsoletos = 0
+
+        while pq:
+            _, costo_actual, u = heapq.heappop(pq)
+            extraidos += 1
+            if u in asentados:
+                obsoletos += 1
+                continue
+            if u == destino:
+                if contadores is not None:
+                    sumar_contadores(contadores, extraidos, obsoletos, len(pq))
+                camino = []
+                nodo = destino
+                while nodo != -1:
+                    camino.append(nodo)
+                    nodo = prev[nodo]
+                camino.reverse()
+                return costo_actual, camino
+            asentados.add(u)
+
+            for k in range(offsets[u], offsets[u + 1]):
+                v = destinos[k]
+                nuevo_costo = costo_actual + costos[k]
+                if nuevo_costo < dist.get(v, INF):
+                    estimado = nuevo_costo + heuristica(v)
+                    if estimado == INF:
+                        continue
+                    dist[v] = nuevo_costo
+                    prev[v] = u
+                    heapq.heappush(pq, (estimado, nuevo_costo, v))
+
+        if contadores is not None:
+            sumar_contadores(contadores, extraidos, obsoletos, 0)
+        return INF, []
+
+    def columna_ponderada(self, pesos):
+        """Columna de costos combinados w_d·distancia + w_t·tiempo + w_p·peaje"""
+        columnas = self.ponderadas.get(pesos)
+        if columnas is None:
+            w_d, w_t, w_p = pesos
+            _, distancias, tiempos, peajes = self.costos
+            columnas = array('d', (w_d * d + w_t * t + w_p * p
+                                   for d, t, p in zip(distancias, tiempos, peajes)))
+            self.ponderadas[pesos] = columnas
+        return columnas
+
+    def rutas_pareto(self, origen, destino, max_rutas=None):
+        """
+        Búsqueda multiobjetivo por etiquetas (label-setting): retorna el frente
+        de Pareto de rutas origen -> destino según (distancia, tiempo, peaje)
+        como lista de ((distancia, tiempo, peaje), camino en ids), ordenada
+        por distancia. Las etiquetas dominadas por otra ya asentada en la misma
+        ciudad, o por una ruta ya encontrada, se descartan. Con `max_rutas`
+        la búsqueda termina al encontrar esa cantidad de rutas.
+        """
+        offsets, destinos = self.offsets, self.destinos
+        _, distancias, tiempos, peajes = self.costos
+        asentadas = {}  # ciudad -> lista de costos no dominados ya asentados
+        etiquetas = []  # (ciudad, índice de la etiqueta anterior)
+        frente = []
+        pq = [(0, 0, 0, origen, -1)]
+
+        def dominada(costos, lista):
+            d, t, p = costos
+            for d2, t2, p2 in lista:
+                if d2 <= d and t2 <= t and p2 <= p:
+                    return True
+            return False
+
+        while pq:
+            d, t, p, u, anterior = heapq.heappop(pq)
+            costos_u = (d, t, p)
+            lista = asentadas.setdefault(u, [])
+            if dominada(costos_u, lista):
+                continue
+            lista.append(costos_u)
+            etiquetas.append((u, anterior))
+            actual = len(etiquetas) - 1
+
+            if u == destino:
+                frente.append((costos_u, actual))
+                if max_rutas is not None and len(frente) >= max_rutas:
+                    break
+                continue
+
+            soluciones = asentadas.get(destino, ())
+            for k in range(offsets[u], offsets[u + 1]):
+                v = destinos[k]
+                nueva = (d + distancias[k], t + tiempos[k], p + peajes[k])
+                if INF in nueva:
+                    continue
+                if dominada(nueva, soluciones) or dominada(nueva, asentadas.get(v, ())):
+                    continue
+                heapq.heappush(pq, nueva + (v, actual))
+
+        rutas = []
+        for costos, indice in frente:
+            camino = []
+            while indice != -1:
+                nodo, indice = etiquetas[indice]
+                camino.append(nodo)
+            camino.reverse()
+            rutas.append((costos, camino))
+        return rutas
+
+    def costos_camino(self, camino):
+        """Suma (distancia, tiempo, peaje) a lo largo de un camino en ids"""
+        offsets, destinos = self.offsets, self.destinos
+        _, distancias, tiempos, peajes = self.costos
+        total = [0, 0, 0]
+        for u, v in zip(camino, camino[1:]):
+            for k in range(offsets[u], offsets[u + 1]):
+                if destinos[k] == v:
+                    total[0] += distancias[k]
+                    total[1] += tiempos[k]
+                    total[2] += peajes[k]
+                    break
+        return tuple(total)
+
+    def k_rutas(self, origen, destino, idx, k):
+        """
+        Los `k` caminos simples más cortos de origen a destino (algoritmo de
+        Yen), como lista de (costo, camino en ids) ordenada por costo.
+
+        Todas las búsquedas reutilizan el árbol de caminos mínimos desde el
+        destino (en caché): sus distancias son una heurística exacta para los
+        desvíos con A*, que sigue siendo válida al quitar ciudades y
+        carreteras porque eso sólo alarga los caminos. Si el camino del árbol
+        no toca nada de lo quitado, es el desvío óptimo: no hace falta buscar,
+        y el camino sólo se arma si el candidato llega a ser elegido. Como
+        propone Lawler, cada camino sólo se desvía desde la ciudad en que se
+        separó del camino que lo generó: los desvíos anteriores ya los generó
+        ese camino.
+        """
+        hacia, siguiente = self.arbol(destino, idx)
+        if hacia[origen] == INF:
+            return []
+        costos = self.costos[idx]
+        camino, acumulados = self._camino_arbol(origen, 0, siguiente, costos)
+        encontrados = [(camino, acumulados, 0)]
+        vistos = {tuple(camino)}
+        # Candidatos: (costo, orden, raíz hasta el desvío, acumulados de la raíz, tramo o None)
+        candidatos = []
+        orden = 0
+
+        while len(encontrados) < k:
+            anterior, acumulados_anterior, primero = encontrados[-1]
+            for i in range(primero, len(anterior) - 1):
+                raiz = anterior[:i + 1]
+                # Sin volver a la raíz, ni repetir las salidas de los caminos que ya la comparten
+                bloqueadas = set(raiz[:-1])
+                prohibidas = {camino[i + 1] for camino, _, _ in encontrados if camino[:i + 1] == raiz}
+                costo, tramo = self._desvio(anterior[i], destino, costos, hacia, siguiente,
+                                            bloqueadas, prohibidas, acumulados_anterior[i])
+                if costo == INF:
+                    continue
+                orden += 1
+                heapq.heappush(candidatos, (costo, orden, raiz, acumulados_anterior[:i + 1], tramo))
+
+            while candidatos:
+                _, _, raiz, acumulados_raiz, tramo = heapq.heappop(candidatos)
+                if tramo is None:
+                    tramo = self._camino_arbol(raiz[-1], acumulados_raiz[-1], siguiente, costos)
+                camino = raiz[:-1] + tramo[0]
+                if tuple(camino) not in vistos:
+                    vistos.add(tuple(camino))
+                    encontrados.append((camino, acumulados_raiz[:-1] + tramo[1], len(raiz) - 1))
+                    break
+            else:
+                break
+
+        return [(acumulados[-1], camino) for camino, acumulados, _ in encontrados]
+
+    def _camino_arbol(self, u, base, siguiente, costos):
+        """Camino desde `u` hasta la raíz de un árbol y sus costos acumulados desde `base`"""
+        offsets, destinos = self.offsets, self.destinos
+        camino = [u]
+        acumulados = [base]
+        while siguiente[u] != -1:
+            v = siguiente[u]
+            base += min(costos[j] for j in range(offsets[u], offsets[u + 1]) if destinos[j] == v)
+            camino.append(v)
+            acumulados.append(base)
+            u = v
+        return camino, acumulados
+
+    def _desvio(self, desvio, destino, costos, hacia, siguiente, bloqueadas, prohibidas, base):
+        """
+        Camino más corto de `desvio` a `destino` sin pasar por `bloqueadas` ni
+        salir de `desvio` hacia `prohibidas`. Retorna (costo total desde
+        `base`, (camino, acumulados)); el tramo es None si es el camino del
+        árbol y el costo es inf si no hay camino.
+        """
+        if hacia[desvio] == INF:
+            return INF, None
+        u = siguiente[desvio]
+        if u not in prohibidas:
+            while u != -1 and u not in bloqueadas:
+                u = siguiente[u]
+            if u == -1:
+                return base + hacia[desvio], None
+
+        offsets, destinos = self.offsets, self.destinos
+        dist = {desvio: base}
+        prev = {desvio: -1}
+        # A igual estimación se extiende primero el camino más largo: con una
+        # heurística exacta eso va directo al destino entre rutas empatadas
+        pq = [(base + hacia[desvio], -base, desvio)]
+        while pq:
+            _, costo_actual, u = heapq.heappop(pq)
+            costo_actual = -costo_actual
+            if costo_actual > dist[u]:
+                continue
+            if u == destino:
+                camino = []
+                while u != -1:
+                    camino.append(u)
+                    u = prev[u]
+                camino.reverse()
+                return costo_actual, (camino, [dist[v] for v in camino])
+            for j in range(offsets[u], offsets[u + 1]):
+                v = destinos[j]
+                if v in bloqueadas or (u == desvio and v in prohibidas):
+                    continue
+                nuevo_costo = costo_actual + costos[j]
+                if nuevo_costo < dist.get(v, INF) and hacia[v] != INF:
+                    dist[v] = nuevo_costo
+                    prev[v] = u
+                    heapq.heappush(pq, (nuevo_costo + hacia[v], -nuevo_costo, v))
+        return INF, None
+
+    def rutas(self, origenes, criterios):
+        """
+        Genera las rutas óptimas desde cada id de `origenes` (en ese orden)
+        hacia todas las demás ciudades, para cada criterio de `criterios`
+        ({nombre: índice de la columna de costos}). Usa los árboles en caché
+        si los hay.
+        """
+        ids = list(self.ids.values())
+        nombres = self.nombres
+        for origen in origenes:
+            arboles = []
+            for criterio, idx in criterios.items():
+                arbol = self.arboles.get((origen, idx)) or self.dijkstra(origen, idx)
+                arboles.append((criterio, arbol))
+            for destino in ids:
+                if origen == destino:
+                    continue
+                for criterio, (dist, prev) in arboles:
+                    if dist[destino] == INF:
+                        continue
+                    camino = self.camino(prev, destino)
+                    yield {
+                        "origen": nombres[origen],
+                        "destino": nombres[destino],
+                        "criterio": criterio,
+                        "camino": camino,
+                        "costo": dist[destino],
+                        "paradas": len(camino) - 2
+                    }
+
+    def camino(self, prev, destino):
+        """Reconstruye la lista de nombres hasta `destino` siguiendo `prev`"""
+        camino = []
+        nodo = destino
+        while nodo != -1:
+            camino.append(self.nombres[nodo])
+            nodo = prev[nodo]
+        camino.reverse()
+        return camino
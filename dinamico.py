@@ -0,0 +1,73 @@
+"""Reparación de árboles de caminos mínimos cuando cambian algunas carreteras (Ramalingam–Reps)"""
+import heapq
+
+INF = float('inf')
+
+
+def reparar_arbol(dist, prev, cambios, vecinos):
+    """
+    Repara en el lugar el árbol (dist, prev) de un criterio.
+    `cambios` es una lista de (u, v, costo_anterior, costo_nuevo) de
+    carreteras no dirigidas (INF si no existía o ya no existe) y
+    `vecinos(u)` retorna los pares (vecino, costo) del grafo ya modificado.
+    """
+    # Encarecimientos: subárboles que colgaban de una carretera del árbol
+    raices = []
+    for u, v, anterior, nuevo in cambios:
+        if nuevo > anterior:
+            if prev[v] == u:
+                raices.append(v)
+            elif prev[u] == v:
+                raices.append(u)
+
+    if raices:
+        afectados = set()
+        pila = raices
+        while pila:
+            u = pila.pop()
+            if u in afectados:
+                continue
+            afectados.add(u)
+            for v, _ in vecinos(u):
+                if prev[v] == u:
+                    pila.append(v)
+
+        for u in afectados:
+            dist[u] = INF
+            prev[u] = -1
+        pq = []
+        for u in afectados:
+            for v, costo in vecinos(u):
+                if v not in afectados and dist[v] + costo < dist[u]:
+                    dist[u] = dist[v] + costo
+                    prev[u] = v
+            if dist[u] < INF:
+                pq.append((dist[u], u))
+        heapq.heapify(pq)
+        _propagar(dist, prev, pq, vecinos)
+
+    # Abaratamientos: la mejora entra por los extremos de la carretera
+    pq = []
+    for u, v, anterior, nuevo in cambios:
+        if nuevo < anterior:
+            for a, b in ((u, v), (v, u)):
+                if dist[a] + nuevo < dist[b]:
+                    dist[b] = dist[a] + nuevo
+                    prev[b] = a
+                    heapq.heappush(pq, (dist[b], b))
+    if pq:
+        _propagar(dist, prev, pq, vecinos)
+
+
+def _propagar(dist, prev, pq, vecinos):
+    """Dijkstra a partir de las ciudades de `pq`, sólo mientras mejoren distancias"""
+    while pq:
+        costo_actual, u = heapq.heappop(pq)
+        if costo_actual > dist[u]:
+            continue
+        for v, costo in vecinos(u):
+            nuevo_costo = costo_actual + costo
+            if nuevo_costo < dist[v]:
+                dist[v] = nuevo_costo
+                prev[v] = u
+                heapq.heappush(pq, (nuevo_costo, v))
@@ -0,0 +1,177 @@
+"""Índice espacial de las ciudades con coordenadas: una grilla de celdas de TAMANO_CELDA grados"""
+import heapq
+import math
+
+RADIO_TIERRA_KM = 6371.0
+
+# Lado de las celdas en grados (unos 11 km de latitud)
+TAMANO_CELDA = 0.1
+
+
+def distancia_km(lat1, lon1, lat2, lon2):
+    """Distancia en km entre dos puntos sobre la esfera (fórmula del haversine)"""
+    fi1, fi2 = math.radians(lat1), math.radians(lat2)
+    dfi = fi2 - fi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dfi / 2) ** 2 + math.cos(fi1) * math.cos(fi2) * math.sin(dlambda / 2) ** 2
+    return 2 * RADIO_TIERRA_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def leer_coordenadas(lat, lon):
+    """Convierte lat y lon a float; lanza ValueError si no son coordenadas válidas"""
+    try:
+        lat, lon = float(lat), float(lon)
+    except (ValueError, TypeError):
+        raise ValueError("lat y lon deben ser números")
+    if not -90 <= lat <= 90:
+        raise ValueError("lat debe estar entre -90 y 90")
+    if not -180 <= lon <= 180:
+        raise ValueError("lon debe estar entre -180 y 180")
+    return lat, lon
+
+
+def leer_caja(texto):
+    """
+    Lee una caja "lon_min,lat_min,lon_max,lat_max" (el orden de GeoJSON) y la
+    retorna como (lat_min, lon_min, lat_max, lon_max). Con lon_min > lon_max
+    la caja cruza el antimeridiano. Lanza ValueError si no es válida.
+    """
+    partes = texto.split(',')
+    if len(partes) != 4:
+        raise ValueError("bbox debe tener la forma lon_min,lat_min,lon_max,lat_max")
+    lat_min, lon_min = leer_coordenadas(partes[1], partes[0])
+    lat_max, lon_max = leer_coordenadas(partes[3], partes[2])
+    if lat_min > lat_max:
+        raise ValueError("En bbox lat_min no puede ser mayor que lat_max")
+    return lat_min, lon_min, lat_max, lon_max
+
+
+def caja_circulo(lat, lon, radio_km):
+    """Caja (lat_min, lon_min, lat_max, lon_max) que contiene el círculo de `radio_km` alrededor del punto"""
+    angulo = radio_km / RADIO_TIERRA_KM
+    lat_min = lat - math.degrees(angulo)
+    lat_max = lat + math.degrees(angulo)
+    if lat_min <= -90 or lat_max >= 90:
+        # El círculo contiene un polo: abarca todas las longitudes
+        return max(lat_min, -90), -180, min(lat_max, 90), 180
+    ancho = math.degrees(math.asin(math.sin(angulo) / math.cos(math.radians(lat))))
+    if ancho >= 180:
+        return lat_min, -180, lat_max, 180
+    lon_min, lon_max = lon - ancho, lon + ancho
+    if lon_min < -180:
+        lon_min += 360
+    if lon_max > 180:
+        lon_max -= 360
+    return lat_min, lon_min, lat_max, lon_max
+
+
+class IndiceEspacial:
+    def __init__(self, tamano_celda=TAMANO_CELDA):
+        self.tamano = tamano_celda
+        self.filas = math.ceil(180 / tamano_celda)
+        self.columnas = math.ceil(360 / tamano_celda)
+        self.puntos = {}  # clave -> (lat, lon)
+        self.celdas = {}  # (fila, columna) -> conjunto de claves
+
+    @classmethod
+    def desde_puntos(cls, puntos):
+        """Arma el índice a partir de un dict {clave: (lat, lon)}"""
+        indice = cls()
+        for clave, (lat, lon) in puntos.items():
+            indice.ubicar(clave, lat, lon)
+        return indice
+
+    def __len__(self):
+        return len(self.puntos)
+
+    def _fila(self, lat):
+        return min(int((lat + 90) // self.tamano), self.filas - 1)
+
+    def _columna(self, lon):
+        return int((lon + 180) // self.tamano) % self.columnas
+
+    def ubicar(self, clave, lat, lon):
+        """Agrega la clave en (lat, lon), o la mueve si ya estaba"""
+        self.quitar(clave)
+        self.puntos[clave] = (lat, lon)
+        self.celdas.setdefault((self._fila(lat), self._columna(lon)), set()).add(clave)
+
+    def quitar(self, clave):
+        punto = self.puntos.pop(clave, None)
+        if punto is None:
+            return
+        celda = (self._fila(punto[0]), self._columna(punto[1]))
+        claves = self.celdas[celda]
+        claves.discard(clave)
+        if not claves:
+            del self.celdas[celda]
+
+    def en_caja(self, lat_min, lon_min, lat_max, lon_max):
+        """Genera las claves cuyos puntos están dentro de la caja (bordes incluidos)"""
+        cruza = lon_min > lon_max
+
+        def adentro(lat, lon):
+            if not lat_min <= lat <= lat_max:
+                return False
+            return lon >= lon_min or lon <= lon_max if cruza else lon_min <= lon <= lon_max
+
+        fila_min, fila_max = self._fila(lat_min), self._fila(lat_max)
+        columna_min = int((lon_min + 180) // self.tamano)
+        columna_max = int((lon_max + (540 if cruza else 180)) // self.tamano)
+        columnas = min(columna_max - columna_min + 1, self.columnas)
+        if (fila_max - fila_min + 1) * columnas > len(self.celdas):
+            # Hay menos celdas ocupadas que celdas en la caja: se recorren esas
+            celdas = self.celdas.values()
+        else:
+            celdas = (self.celdas.get((fila, columna % self.columnas), ())
+                      for fila in range(fila_min, fila_max + 1)
+                      for columna in range(columna_min, columna_min + columnas))
+        for claves in celdas:
+            for clave in claves:
+                if adentro(*self.puntos[clave]):
+                    yield clave
+
+    def _anillo(self, fila, columna, radio):
+        """Claves de las celdas a distancia `radio` (en celdas) de la celda dada"""
+        for f in range(fila - radio, fila + radio + 1):
+            if not 0 <= f < self.filas:
+                continue
+            paso = 1 if f in (fila - radio, fila + radio) else 2 * radio
+            for c in range(columna - radio, columna + radio + 1, paso or 1):
+                yield from self.celdas.get((f, c % self.columnas), ())
+
+    def cercanas(self, lat, lon, k=1, radio_km=None):
+        """
+        Las `k` claves más cercanas a (lat, lon), como lista de
+        (distancia en km, clave) de la más cercana a la más lejana. Con
+        `radio_km` sólo se consideran las que están a esa distancia o menos.
+        """
+        if not self.puntos or k < 1:
+            return []
+        # Se recorren anillos de celdas hasta juntar k candidatas y después todas las
+        # celdas de la caja del círculo con radio igual a la k-ésima distancia: el
+        # resultado es exacto también cerca de los polos, donde las celdas se angostan
+        if radio_km is None:
+            fila, columna = self._fila(lat), self._columna(lon)
+            candidatas = []
+            radio = 0
+            while len(candidatas) < k:
+                if (2 * radio + 1) ** 2 > len(self.celdas):
+                    candidatas = None  # Conviene revisar todas las ciudades
+                    break
+                candidatas.extend(self._anillo(fila, columna, radio))
+                radio += 1
+            if candidatas is not None:
+                distancias = heapq.nsmallest(k, (distancia_km(lat, lon, *self.puntos[clave])
+                                                 for clave in candidatas))
+                radio_km = distancias[-1]
+
+        if radio_km is None:
+            claves = self.puntos
+        else:
+            # Un margen mínimo para que el redondeo no deje afuera a la k-ésima
+            claves = self.en_caja(*caja_circulo(lat, lon, radio_km * (1 + 1e-9) + 1e-9))
+        resultado = ((distancia_km(lat, lon, *self.puntos[clave]), clave) for clave in claves)
+        if radio_km is not None:
+            resultado = ((distancia, clave) for distancia, clave in resultado if distancia <= radio_km)
+        return heapq.nsmallest(k, resultado, key=lambda par: par[0])
@@ -0,0 +1,224 @@
+"""Estadísticas del grafo mantenidas de forma incremental"""
+from collections import Counter
+import heapq
+import math
+
+
+class SketchCuantiles:
+    """
+    Histograma logarítmico (al estilo DDSketch): cada valor cae en el balde
+    ceil(log_gamma(valor)), así que cualquier percentil se estima con error
+    relativo menor a `precision`. Admite quitar valores, y la cantidad de
+    baldes sólo depende del rango de los costos, no de cuántos haya.
+    """
+
+    def __init__(self, precision=0.01):
+        self.gamma = (1 + precision) / (1 - precision)
+        self._log_gamma = math.log(self.gamma)
+        self._baldes = Counter()
+        self.ceros = 0  # Valores <= 0 (peajes nulos, por ejemplo)
+        self.cantidad = 0
+
+    def _balde(self, valor):
+        return math.ceil(math.log(valor) / self._log_gamma)
+
+    def agregar(self, valor):
+        if valor <= 0:
+            self.ceros += 1
+        else:
+            self._baldes[self._balde(valor)] += 1
+        self.cantidad += 1
+
+    def quitar(self, valor):
+        if valor <= 0:
+            self.ceros -= 1
+        else:
+            balde = self._balde(valor)
+            self._baldes[balde] -= 1
+            if not self._baldes[balde]:
+                del self._baldes[balde]
+        self.cantidad -= 1
+
+    def cuantil(self, q):
+        """Valor aproximado del cuantil `q` (entre 0 y 1), None si está vacío"""
+        return self.cuantiles([q])[0]
+
+    def cuantiles(self, qs):
+        """Valores aproximados de los cuantiles `qs` (en orden creciente), en una pasada"""
+        if not self.cantidad:
+            return [None] * len(qs)
+        resultado = []
+        pendientes = iter(qs)
+        q = next(pendientes, None)
+        acumulado = self.ceros
+        while q is not None and q * (self.cantidad - 1) < acumulado:
+            resultado.append(0)
+            q = next(pendientes, None)
+        balde = None
+        for balde in sorted(self._baldes):
+            if q is None:
+                break
+            acumulado += self._baldes[balde]
+            while q is not None and q * (self.cantidad - 1) < acumulado:
+                resultado.append(2 * self.gamma ** balde / (self.gamma + 1))
+                q = next(pendientes, None)
+        # Por redondeo, un cuantil cercano a 1 puede quedar fuera: es el último balde
+        while len(resultado) < len(qs):
+            resultado.append(2 * self.gamma ** balde / (self.gamma + 1))
+        return resultado
+
+
+class AgregadoCriterio:
+    """Cantidad, suma, mínimo, máximo y percentiles de un criterio"""
+
+    def __init__(self):
+        self.cantidad = 0
+        self.suma = 0
+        self._valores = Counter()  # Para mantener mínimo y máximo exactos al quitar
+        # Montículos de los valores distintos (el de máximos, negados). Al
+        # quitar un valor su entrada queda hasta que llega a la cima.
+        self._minimos = []
+        self._maximos = []
+        self.sketch = SketchCuantiles()
+
+    def agregar(self, valor):
+        self.cantidad += 1
+        self.suma += valor
+        self._valores[valor] += 1
+        if self._valores[valor] == 1:
+            heapq.heappush(self._minimos, valor)
+            heapq.heappush(self._maximos, -valor)
+        self.sketch.agregar(valor)
+
+    def quitar(self, valor):
+        self.cantidad -= 1
+        self.suma -= valor
+        self._valores[valor] -= 1
+        if not self._valores[valor]:
+            del self._valores[valor]
+            self._limpiar_extremos()
+        self.sketch.quitar(valor)
+
+    def _limpiar_extremos(self):
+        """Saca de la cima de los montículos los valores que ya no están"""
+        valores = self._valores
+        if len(self._minimos) > 2 * len(valores) + 16:
+            # Demasiadas entradas viejas (valores quitados lejos de la cima)
+            self._minimos = list(valores)
+            heapq.heapify(self._minimos)
+            self._maximos = [-valor for valor in valores]
+            heapq.heapify(self._maximos)
+        while self._minimos and self._minimos[0] not in valores:
+            heapq.heappop(self._minimos)
+        while self._maximos and -self._maximos[0] not in valores:
+            heapq.heappop(self._maximos)
+
+    @property
+    def _minimo(self):
+        return self._minimos[0] if self._minimos else None
+
+    @property
+    def _maximo(self):
+        return -self._maximos[0] if self._maximos else None
+
+    def resumen(self):
+        def redondear(valor):
+            if valor is None:
+                return None
+            # La estimación del sketch nunca sale del rango real
+            return round(min(max(valor, self._minimo), self._maximo), 2)
+
+        p50, p90, p99 = self.sketch.cuantiles([0.5, 0.9, 0.99])
+        return {
+            "cantidad": self.cantidad,
+            "suma": self.suma,
+            "minimo": self._minimo,
+            "maximo": self._maximo,
+            "promedio": round(self.suma / self.cantidad, 2) if self.cantidad else 0,
+            "p50": redondear(p50),
+            "p90": redondear(p90),
+            "p99": redondear(p99)
+        }
+
+
+class EstadisticasGrafo:
+    def __init__(self, criterios):
+        self.grados = {}  # ciudad -> cantidad de conexiones
+        self._ciudades_por_grado = Counter()
+        self._grado_maximo = 0
+        self.total_aristas = 0
+        self.criterios = {criterio: AgregadoCriterio() for criterio in criterios}
+
+    @classmethod
+    def desde_aristas(cls, criterios, ciudades, aristas):
+        """Arma las estadísticas de un grafo completo (al cargarlo)"""
+        estadisticas = cls(criterios)
+        for ciudad in ciudades:
+            estadisticas.agregar_ciudad(ciudad)
+        for ciudad1, ciudad2, *costos in aristas:
+            estadisticas.agregar_arista(ciudad1, ciudad2, costos)
+        return estadisticas
+
+    @property
+    def total_ciudades(self):
+        return len(self.grados)
+
+    def _cambiar_grado(self, ciudad, cambio):
+        grado = self.grados.get(ciudad, 0)
+        # Primero se cuenta el grado nuevo, así al quitar el anterior el máximo baja a lo sumo uno
+        self._ciudades_por_grado[grado + cambio] += 1
+        if grado + cambio > self._grado_maximo:
+            self._grado_maximo = grado + cambio
+        if ciudad in self.grados:
+            self._quitar_grado(grado)
+        self.grados[ciudad] = grado + cambio
+
+    def _quitar_grado(self, grado):
+        self._ciudades_por_grado[grado] -= 1
+        if not self._ciudades_por_grado[grado]:
+            del self._ciudades_por_grado[grado]
+            if grado == self._grado_maximo:
+                while self._grado_maximo and self._grado_maximo not in self._ciudades_por_grado:
+                    self._grado_maximo -= 1
+
+    def agregar_ciudad(self, ciudad):
+        if ciudad not in self.grados:
+            self._cambiar_grado(ciudad, 0)
+
+    def eliminar_ciudad(self, ciudad):
+        """Quita una ciudad cuyas conexiones ya se quitaron"""
+        grado = self.grados.pop(ciudad, None)
+        if grado is not None:
+            self._quitar_grado(grado)
+
+    def agregar_arista(self, ciudad1, ciudad2, costos):
+        """Suma una carretera; `costos` sigue el orden de los criterios (inf si no es válido)"""
+        self.total_aristas += 1
+        self._cambiar_grado(ciudad1, 1)
+        self._cambiar_grado(ciudad2, 1)
+        for agregado, costo in zip(self.criterios.values(), costos):
+            if costo != math.inf:
+                agregado.agregar(costo)
+
+    def quitar_arista(self, ciudad1, ciudad2, costos):
+        self.total_aristas -= 1
+        self._cambiar_grado(ciudad1, -1)
+        self._cambiar_grado(ciudad2, -1)
+        for agregado, costo in zip(self.criterios.values(), costos):
+            if costo != math.inf:
+                agregado.quitar(costo)
+
+    def resumen(self):
+        """Agregados del grafo completo, sin recorrer ciudades ni carreteras"""
+        total_ciudades = self.total_ciudades
+        return {
+            "total_ciudades": total_ciudades,
+            "total_rutas": self.total_aristas,
+            "criterios": {criterio: agregado.resumen()
+                          for criterio, agregado in self.criterios.items()},
+            "grado": {
+                "promedio": round(2 * self.total_aristas / total_ciudades, 2) if total_ciudades else 0,
+                "maximo": self._grado_maximo,
+                "ciudades_aisladas": self._ciudades_por_grado.get(0, 0)
+            }
+        }
@@ -1,133 +1,1175 @@
+from array import array
 from collections import defaultdict
-import heapq
+import threading
+
+import backend_numpy
+from compilado import GrafoCompilado
+import dinamico
+from espacial import IndiceEspacial
+from estadisticas import EstadisticasGrafo
+import jerarquia
+import metricas
+import paralelo
+
+# Índices de cada costo dentro de una conexión (ciudad, distancia, tiempo, peaje)
+INDICES_CRITERIO = {'distancia': 1, 'tiempo': 2, 'peaje': 3}
+CRITERIOS = ('distancia', 'tiempo', 'peaje')
+# Estrategias de búsqueda punto a punto de Grafo.dijkstra
+METODOS = ('dijkstra', 'bidireccional', 'astar', 'ch')
+
+# Modificaciones que acepta Grafo.aplicar_lote
+OPERACIONES = ('agregar_ciudad', 'ubicar_ciudad', 'agregar_arista', 'eliminar_ciudad',
+               'eliminar_arista', 'limpiar')
+
+# Más cambios que estos en un lote descartan los árboles de caminos en vez de repararlos
+MAX_CAMBIOS_REPARACION = 64
+
+# Árboles de caminos mínimos que se copian y reparan con cada cambio (los demás se descartan)
+MAX_ARBOLES_REPARADOS = 32
+
+
+def costo_conexion(conexion, idx):
+    """Convierte el costo de una conexión a número (inf si no es válido)"""
+    try:
+        return float(conexion[idx])
+    except (ValueError, TypeError, IndexError):
+        return float('inf')
+
+
+def _numero(valor):
+    """Devuelve los costos enteros leídos como float a su forma entera"""
+    return int(valor) if isinstance(valor, float) and valor.is_integer() else valor
+
+
+def _costos(conexion):
+    """Costos numéricos (distancia, tiempo, peaje) de una conexión"""
+    costos = conexion[1:4]
+    if all(type(costo) is int for costo in costos):
+        return costos
+    return tuple(_numero(costo_conexion(conexion, idx)) for idx in (1, 2, 3))
+
 
 class Grafo:
-    def __init__(self):
-        self.adyacencia = defaultdict(list)
-        self.tipos_ciudad = {}  # Almacena el tipo de cada ciudad
+    def __init__(self, almacen=None, preparar_escrituras=False):
+        # ciudad -> {vecino: (vecino, distancia, tiempo, peaje)}: índice por vecino
+        # para consultar, actualizar y eliminar conexiones en tiempo constante.
+        # Si el grafo se cargó de un snapshot, se construye al primer acceso.
+        self._adyacencia = defaultdict(dict)
+        self._tipos_ciudad = {}  # Almacena el tipo de cada ciudad
+        self.version = 0  # Se incrementa con cada modificación del grafo
+        self.almacen = almacen  # AlmacenGrafo donde se guardan las modificaciones
+        self._recarga_pendiente = False  # Hay cambios de otros procesos sin cargar
+        # Al adoptar un snapshot, armar en un hilo aparte lo que necesitan las escrituras
+        self.preparar_escrituras = preparar_escrituras
+        self._ids = {}  # Id entero de cada ciudad en la forma compilada
+        self._nombres = []  # Nombre de cada id (None si la ciudad fue eliminada)
+        # Forma compilada (CSR), se reconstruye al pedirla. Es inmutable: los
+        # lectores trabajan sobre la que obtuvieron sin tomar ningún lock,
+        # mientras los escritores modifican la adyacencia bajo `_lock` y
+        # publican la siguiente versión reemplazando esta referencia.
+        self._compilado = None
+        # Última forma compilada y los ids de las filas CSR que cambiaron desde
+        # entonces: la próxima compilación copia el resto de las filas en bloque
+        self._base = None
+        self._filas = None
+        # Árboles de caminos mínimos que se van reparando con cada cambio
+        # (copias del escritor) hasta publicarse en la próxima forma compilada
+        self._arboles = None
+        self._jerarquias = {}  # Jerarquías de contracción por criterio
+        # Agregados (conteos, sumas, extremos, grados) que se actualizan con
+        # cada modificación; None si hay que armarlos desde la forma compilada
+        self._estadisticas = EstadisticasGrafo(CRITERIOS)
+        # Grilla con las coordenadas de las ciudades ubicadas; se actualiza
+        # con cada modificación y, como los agregados, es None si hay que
+        # armarla desde la forma compilada
+        self._espacial = IndiceEspacial()
+        self._lock = threading.RLock()
+
+    @classmethod
+    def desde_almacen(cls, almacen, preparar_escrituras=False):
+        """
+        Carga el grafo guardado en un AlmacenGrafo. Si el snapshot binario
+        está al día se usa directamente (mmap); si no, se lee la base y se
+        vuelve a escribir el snapshot.
+
+        Con el snapshot, la lista de adyacencia, los agregados y la grilla
+        espacial se arman recién al necesitarlos: la primera escritura los
+        construye bajo el lock (unos 2 s con 50.000 ciudades). Con
+        `preparar_escrituras` se arman en un hilo aparte apenas se carga.
+        """
+        grafo = cls(almacen, preparar_escrituras)
+        grafo._recargar(almacen.version())
+        return grafo
+
+    def sincronizar(self):
+        """
+        Recarga el grafo si otro proceso lo modificó en el almacén. Es una
+        consulta barata (sólo lee la versión) y se llama en cada solicitud.
+        Retorna True si hubo que recargar.
+        """
+        version = self.almacen.version()
+        if version == self.version and not self._recarga_pendiente:
+            return False
+        with self._lock:
+            if version == self.version and not self._recarga_pendiente:
+                return False
+            self._recargar(version)
+        return True
+
+    def _recargar(self, version):
+        """Carga la versión indicada del almacén, del snapshot si está al día"""
+        with self._lock:
+            snapshot = self.almacen.cargar_snapshot()
+            if snapshot is not None and snapshot[0] == version:
+                self._usar_compilado(snapshot[1], version)
+                return
+
+            version, total_ids, ciudades, aristas = self.almacen.leer()
+            adyacencia = defaultdict(dict)
+            tipos = {}
+            espacial = IndiceEspacial()
+            # Los ids son los del almacén, con los huecos de las ciudades
+            # eliminadas: todos los procesos numeran igual (y así los cursores)
+            nombres = [None] * total_ids
+            for id_ciudad, nombre, tipo, lat, lon in ciudades:
+                nombres[id_ciudad] = nombre
+                tipos[nombre] = tipo
+                adyacencia[nombre] = {}
+                if lat is not None and lon is not None:
+                    espacial.ubicar(nombre, lat, lon)
+            for ciudad1, ciudad2, distancia, tiempo, peaje in aristas:
+                adyacencia[ciudad1][ciudad2] = (ciudad2, distancia, tiempo, peaje)
+                adyacencia[ciudad2][ciudad1] = (ciudad1, distancia, tiempo, peaje)
+            self._estadisticas = EstadisticasGrafo.desde_aristas(
+                CRITERIOS, tipos,
+                ((ciudad1, ciudad2) + _costos(adyacencia[ciudad1][ciudad2])
+                 for ciudad1, ciudad2 in {(c1, c2) if c1 <= c2 else (c2, c1)
+                                          for c1, c2, *_ in aristas}))
+            self._compilado = None
+            self._base = self._filas = None
+            self._arboles = None
+            self._nombres = nombres
+            self._ids = {nombre: i for i, nombre in enumerate(nombres) if nombre is not None}
+            self._adyacencia = adyacencia
+            self._tipos_ciudad = tipos
+            self._espacial = espacial
+            self._recarga_pendiente = False
+            self.version = version
+            self.guardar_snapshot()
+
+    def guardar_snapshot(self):
+        """Escribe el snapshot binario de la versión actual en el almacén"""
+        if self._recarga_pendiente:
+            # La copia en memoria no tiene todos los cambios: se recarga (y eso escribe el snapshot)
+            self._recargar(self.almacen.version())
+            return
+        self.almacen.guardar_snapshot(self.compilado(), self.version)
+
+    def _usar_compilado(self, compilado, version):
+        """Adopta una forma compilada; la lista de adyacencia se arma recién al necesitarla"""
+        compilado.version = version
+        self._compilado = compilado
+        self._base = self._filas = None
+        self._arboles = None
+        self._estadisticas = None
+        self._espacial = None
+        self._nombres = list(compilado.nombres)
+        self._ids = dict(compilado.ids)
+        self._adyacencia = None
+        self._tipos_ciudad = None
+        self._recarga_pendiente = False
+        self.version = version
+        if self.preparar_escrituras:
+            threading.Thread(target=self._preparar_escrituras, args=(compilado,),
+                             name='preparar-escrituras', daemon=True).start()
+
+    def _preparar_escrituras(self, compilado):
+        """
+        Arma fuera del lock la adyacencia, los agregados y la grilla de
+        `compilado`, y los instala si sigue siendo la forma vigente
+        """
+        adyacencia = self._adyacencia_compilado(compilado)
+        estadisticas = self._estadisticas_compilado(compilado)
+        espacial = IndiceEspacial.desde_puntos(compilado.coordenadas)
+        with self._lock:
+            # Si entre medio hubo una escritura, ella ya los armó
+            if self._compilado is not compilado:
+                return
+            if self._adyacencia is None:
+                self._tipos_ciudad = dict(compilado.tipos)
+                self._adyacencia = adyacencia
+            if self._estadisticas is None:
+                self._estadisticas = estadisticas
+            if self._espacial is None:
+                self._espacial = espacial
+
+    def _materializar(self):
+        """Construye la lista de adyacencia y los tipos a partir de la forma compilada"""
+        with self._lock:
+            if self._adyacencia is not None:
+                return
+            compilado = self._compilado
+            self._tipos_ciudad = dict(compilado.tipos)
+            self._adyacencia = self._adyacencia_compilado(compilado)
+
+    def _adyacencia_compilado(self, compilado):
+        """Lista de adyacencia (dict de dicts) de una forma compilada"""
+        nombres = compilado.nombres
+        adyacencia = defaultdict(dict)
+        for u, nombre in enumerate(nombres):
+            if nombre is None:
+                continue
+            conexiones = adyacencia[nombre]
+            for v, distancia, tiempo, peaje in compilado.vecinos(u):
+                conexiones[nombres[v]] = (nombres[v], _numero(distancia),
+                                          _numero(tiempo), _numero(peaje))
+        return adyacencia
+
+    @property
+    def adyacencia(self):
+        if self._adyacencia is None:
+            self._materializar()
+        return self._adyacencia
+
+    @property
+    def tipos_ciudad(self):
+        if self._tipos_ciudad is None:
+            self._materializar()
+        return self._tipos_ciudad
+
+    def _marcar_cambio(self, *operacion):
+        """Registra una modificación, como ('agregar_ciudad', 'Uyuni', 'turistica')"""
+        self._marcar_cambios([operacion])
+
+    def _marcar_cambios(self, operaciones):
+        """
+        Registra modificaciones antes de aplicarlas: las guarda en el almacén
+        (si hay uno) en una sola transacción e invalida los resultados precalculados
+        """
+        if self.almacen is not None:
+            version = self.almacen.aplicar(operaciones)
+            # Si otro proceso escribió entre medio, esta copia quedó incompleta
+            if version != self.version + 1:
+                self._recarga_pendiente = True
+        else:
+            version = self.version + 1
+        if self._adyacencia is None:
+            self._materializar()
+        if self._estadisticas is None:
+            self._estadisticas = self._estadisticas_compilado(self._compilado)
+        if self._espacial is None:
+            self._espacial = IndiceEspacial.desde_puntos(self._compilado.coordenadas)
+        if self._recarga_pendiente:
+            self._arboles = None
+        elif self._arboles is None and self._compilado is not None:
+            # Sólo se mantienen los árboles usados más recientemente (los
+            # últimos en el orden LRU de la caché)
+            arboles = self._compilado.arboles.items()[-MAX_ARBOLES_REPARADOS:]
+            self._arboles = {clave: (list(dist), list(prev)) for clave, (dist, prev) in arboles}
+        if self._compilado is not None:
+            self._base, self._filas = self._compilado, set()
+        # Primero se retira la forma compilada y recién después se publica la
+        # versión: un lector que ya ve la versión nueva no puede obtener la
+        # anterior (compilado() espera el lock y compila la nueva)
+        self._compilado = None
+        self.version = version
+
+    def _reparar_arboles(self, cambios):
+        """
+        Repara los árboles de caminos mínimos guardados después de cambiar
+        carreteras. `cambios` es una lista de (id1, id2, conexión anterior,
+        conexión nueva), con None si la conexión no existía o se eliminó.
+        """
+        if not self._arboles:
+            return
+        ids, nombres, adyacencia = self._ids, self._nombres, self._adyacencia
+        self._extender_arboles()
+        for (_, idx), (dist, prev) in self._arboles.items():
+            def vecinos(u):
+                nombre = nombres[u]
+                if nombre is None:
+                    return ()
+                return [(ids[vecino], costo_conexion(conexion, idx))
+                        for vecino, conexion in adyacencia.get(nombre, {}).items()]
+
+            dinamico.reparar_arbol(dist, prev, [
+                (u, v,
+                 costo_conexion(anterior, idx) if anterior else float('inf'),
+                 costo_conexion(nueva, idx) if nueva else float('inf'))
+                for u, v, anterior, nueva in cambios
+            ], vecinos)
+
+    def _extender_arboles(self):
+        """Agrega a los árboles guardados las ciudades nuevas (inalcanzables)"""
+        n = len(self._nombres)
+        for dist, prev in self._arboles.values():
+            faltan = n - len(dist)
+            if faltan > 0:
+                dist.extend([float('inf')] * faltan)
+                prev.extend([-1] * faltan)
+
+    def _estadisticas_compilado(self, compilado):
+        """Arma los agregados recorriendo una vez la forma compilada"""
+        nombres = compilado.nombres
+        return EstadisticasGrafo.desde_aristas(
+            CRITERIOS, compilado.ids,
+            ((nombres[u], nombres[v], _numero(distancia), _numero(tiempo), _numero(peaje))
+             for u, v, distancia, tiempo, peaje in compilado.aristas()))
+
+    def estadisticas(self):
+        """
+        Resumen del grafo: cantidades, suma, mínimo, máximo, promedio y
+        percentiles de cada criterio, y grados de las ciudades
+        """
+        with self._lock:
+            if self._estadisticas is None:
+                self._estadisticas = self._estadisticas_compilado(self._compilado)
+            return self._estadisticas.resumen()
+
+    def _indice_espacial(self):
+        """Grilla de coordenadas vigente (se llama con `_lock` tomado)"""
+        if self._espacial is None:
+            self._espacial = IndiceEspacial.desde_puntos(self.compilado().coordenadas)
+        return self._espacial
+
+    def _registrar(self, ciudad):
+        """Asigna un id entero a la ciudad si todavía no lo tiene"""
+        if ciudad not in self._ids:
+            self._ids[ciudad] = len(self._nombres)
+            self._nombres.append(ciudad)
+
+    def _cambiar_filas(self, *ciudades):
+        """Anota las filas CSR que la próxima compilación tiene que rearmar"""
+        if self._filas is not None:
+            self._filas.update(self._ids[ciudad] for ciudad in ciudades)
 
     def agregar_arista(self, ciudad1, ciudad2, distancia, tiempo=0, peaje=0):
         """
-        Agrega una arista entre dos ciudades con múltiples costos
+        Agrega una arista entre dos ciudades con múltiples costos.
+        Si la arista ya existe, actualiza sus costos.
         """
-        self.adyacencia[ciudad1].append((ciudad2, distancia, tiempo, peaje))
-        self.adyacencia[ciudad2].append((ciudad1, distancia, tiempo, peaje))
-        
-        # Asegurar que las ciudades existan en tipos_ciudad
-        if ciudad1 not in self.tipos_ciudad:
-            self.tipos_ciudad[ciudad1] = "normal"
-        if ciudad2 not in self.tipos_ciudad:
-            self.tipos_ciudad[ciudad2] = "normal"
+        with self._lock:
+            self._marcar_cambio('agregar_arista', ciudad1, ciudad2, distancia, tiempo, peaje)
+            self._agregar_arista(ciudad1, ciudad2, distancia, tiempo, peaje)
 
-    def agregar_ciudad(self, nombre, tipo="normal"):
-        """Agrega una nueva ciudad al grafo"""
-        self.tipos_ciudad[nombre] = tipo
-        if nombre not in self.adyacencia:
-            self.adyacencia[nombre] = []
+    def agregar_ciudad(self, nombre, tipo="normal", lat=None, lon=None):
+        """Agrega una nueva ciudad al grafo, opcionalmente con sus coordenadas"""
+        with self._lock:
+            self._marcar_cambio('agregar_ciudad', nombre, tipo, lat, lon)
+            self._agregar_ciudad(nombre, tipo, lat, lon)
+
+    def ubicar_ciudad(self, nombre, lat, lon):
+        """
+        Asigna coordenadas a una ciudad (la crea si no existe); con lat y lon
+        None le quita las que tenía
+        """
+        with self._lock:
+            self._marcar_cambio('ubicar_ciudad', nombre, lat, lon)
+            self._ubicar_ciudad(nombre, lat, lon)
 
     def eliminar_ciudad(self, ciudad):
         """Elimina una ciudad y todas sus conexiones"""
-        if ciudad in self.adyacencia:
-            # Eliminar todas las conexiones de esta ciudad
-            for conexion in self.adyacencia[ciudad]:
-                ciudad_conectada = conexion[0]
-                self.adyacencia[ciudad_conectada] = [
-                    c for c in self.adyacencia[ciudad_conectada] 
-                    if c[0] != ciudad
-                ]
-            del self.adyacencia[ciudad]
-            if ciudad in self.tipos_ciudad:
-                del self.tipos_ciudad[ciudad]
+        with self._lock:
+            if ciudad in self._ids:
+                self._marcar_cambio('eliminar_ciudad', ciudad)
+                self._eliminar_ciudad(ciudad)
 
     def eliminar_arista(self, ciudad1, ciudad2):
         """Elimina la conexión entre dos ciudades"""
+        with self._lock:
+            if self.existe_arista(ciudad1, ciudad2):
+                self._marcar_cambio('eliminar_arista', ciudad1, ciudad2)
+                self._eliminar_arista(ciudad1, ciudad2)
+
+    def existe_arista(self, ciudad1, ciudad2):
+        """Indica si hay una carretera directa entre dos ciudades"""
+        return ciudad2 in self.adyacencia.get(ciudad1, ())
+
+    def limpiar(self):
+        """Elimina todas las ciudades y rutas del grafo"""
+        with self._lock:
+            self._marcar_cambio('limpiar')
+            self._limpiar()
+
+    def aplicar_lote(self, operaciones):
+        """
+        Aplica muchas modificaciones como un solo cambio: una transacción en
+        el almacén y un único incremento de versión. Cada operación es una
+        tupla con el nombre del método y sus argumentos, por ejemplo
+        ('agregar_arista', 'La Paz', 'Oruro', 230, 180, 10) o ('eliminar_ciudad', 'Beni').
+        """
+        operaciones = [tuple(operacion) for operacion in operaciones]
+        for operacion in operaciones:
+            if operacion[0] not in OPERACIONES:
+                raise ValueError(f"Operación no válida: {operacion[0]}")
+        with self._lock:
+            operaciones = self._quitar_eliminaciones_vacias(operaciones)
+            if not operaciones:
+                return
+            self._marcar_cambios(operaciones)
+            if len(operaciones) > MAX_CAMBIOS_REPARACION:
+                # Con tantos cambios conviene recalcular los árboles al pedirlos
+                self._arboles = None
+            for operacion in operaciones:
+                getattr(self, '_' + operacion[0])(*operacion[1:])
+
+    def cargar_aristas(self, aristas, ubicaciones=None):
+        """
+        Carga de una vez un grafo vacío: `aristas` son carreteras distintas
+        (ciudad1, ciudad2, distancia, tiempo, peaje) y `ubicaciones` un dict
+        {ciudad: (lat, lon)}. Arma la forma compilada directamente, sin la
+        lista de adyacencia, y la guarda en el almacén en una transacción.
+        El resultado es el mismo que con aplicar_lote.
+        """
+        ubicaciones = ubicaciones or {}
+        with self._lock:
+            if self._ids:
+                raise ValueError("El grafo no está vacío")
+            ids = {}
+            nombres = []
+            grados = []
+            aristas = list(aristas)
+            for ciudad1, ciudad2, *_ in aristas:
+                for ciudad in (ciudad1, ciudad2):
+                    if ciudad not in ids:
+                        ids[ciudad] = len(nombres)
+                        nombres.append(ciudad)
+                        grados.append(0)
+                grados[ids[ciudad1]] += 1
+                grados[ids[ciudad2]] += 1
+
+            # Cada fila queda con los vecinos en el orden de las carreteras, como en la adyacencia
+            offsets = array('q', [0])
+            for grado in grados:
+                offsets.append(offsets[-1] + grado)
+            posiciones = list(offsets[:-1])
+            destinos = array('i', [0]) * offsets[-1]
+            columnas = [array('d', [0.0]) * offsets[-1] for _ in range(3)]
+            for arista in aristas:
+                u, v = ids[arista[0]], ids[arista[1]]
+                for origen, destino in ((u, v), (v, u)):
+                    k = posiciones[origen]
+                    posiciones[origen] = k + 1
+                    destinos[k] = destino
+                    for idx, columna in enumerate(columnas, 1):
+                        columna[k] = costo_conexion(arista, idx + 1)
+
+            coordenadas = {ciudad: punto for ciudad, punto in ubicaciones.items() if ciudad in ids}
+            compilado = GrafoCompilado(nombres, dict.fromkeys(nombres, "normal"), offsets,
+                                       destinos, *columnas, coordenadas, ids=ids)
+            if self.almacen is not None:
+                ciudades = [(i, nombre, "normal") + coordenadas.get(nombre, (None, None))
+                            for i, nombre in enumerate(nombres)]
+                version = self.almacen.cargar(ciudades, aristas)
+                self._usar_compilado(compilado, version)
+                self.almacen.guardar_snapshot(compilado, version)
+            else:
+                self._usar_compilado(compilado, self.version + 1)
+
+    def _quitar_eliminaciones_vacias(self, operaciones):
+        """
+        Descarta las eliminaciones de ciudades y carreteras que no existen en
+        ese punto del lote (teniendo en cuenta las operaciones anteriores),
+        para no registrar cambios ni cambiar la versión por ellas
+        """
+        ciudades = {}  # ciudad -> si existe después de las operaciones ya vistas
+        carreteras = {}  # (ciudad1, ciudad2) ordenadas -> ídem
+        eliminadas = set()  # Ciudades eliminadas en el lote: ya no tienen sus carreteras anteriores
+        limpio = False
+
+        def existe_ciudad(ciudad):
+            if ciudad in ciudades:
+                return ciudades[ciudad]
+            return not limpio and ciudad in self._ids
+
+        def existe_carretera(clave):
+            if clave in carreteras:
+                return carreteras[clave]
+            return not limpio and eliminadas.isdisjoint(clave) and self.existe_arista(*clave)
+
+        resultado = []
+        for operacion in operaciones:
+            tipo = operacion[0]
+            if tipo in ('agregar_ciudad', 'ubicar_ciudad'):
+                ciudades[operacion[1]] = True
+            elif tipo == 'agregar_arista':
+                ciudades[operacion[1]] = ciudades[operacion[2]] = True
+                carreteras[tuple(sorted(operacion[1:3]))] = True
+            elif tipo == 'eliminar_ciudad':
+                if not existe_ciudad(operacion[1]):
+                    continue
+                ciudades[operacion[1]] = False
+                eliminadas.add(operacion[1])
+                for clave in carreteras:
+                    if operacion[1] in clave:
+                        carreteras[clave] = False
+            elif tipo == 'eliminar_arista':
+                clave = tuple(sorted(operacion[1:3]))
+                if not existe_carretera(clave):
+                    continue
+                carreteras[clave] = False
+            elif tipo == 'limpiar':
+                ciudades.clear()
+                carreteras.clear()
+                limpio = True
+            resultado.append(operacion)
+        return resultado
+
+    # Modificaciones en memoria; los métodos públicos las registran antes con _marcar_cambio
+
+    def _agregar_arista(self, ciudad1, ciudad2, distancia, tiempo=0, peaje=0):
+        self._registrar(ciudad1)
+        self._registrar(ciudad2)
+        self._cambiar_filas(ciudad1, ciudad2)
+        adyacencia = self.adyacencia
+        nueva = (ciudad2, distancia, tiempo, peaje)
+        anterior = adyacencia[ciudad1].get(ciudad2)
+        adyacencia[ciudad1][ciudad2] = nueva
+        adyacencia[ciudad2][ciudad1] = (ciudad1, distancia, tiempo, peaje)
+        if anterior is not None:
+            self._estadisticas.quitar_arista(ciudad1, ciudad2, _costos(anterior))
+        self._estadisticas.agregar_arista(ciudad1, ciudad2, _costos(nueva))
+        if self._arboles:
+            self._reparar_arboles([(self._ids[ciudad1], self._ids[ciudad2], anterior, nueva)])
+    
+        # Asegurar que las ciudades existan en tipos_ciudad
+        tipos = self.tipos_ciudad
+        if ciudad1 not in tipos:
+            tipos[ciudad1] = "normal"
+        if ciudad2 not in tipos:
+            tipos[ciudad2] = "normal"
+
+    def _agregar_ciudad(self, nombre, tipo="normal", lat=None, lon=None):
+        self._registrar(nombre)
+        self._estadisticas.agregar_ciudad(nombre)
+        self.tipos_ciudad[nombre] = tipo
+        if nombre not in self.adyacencia:
+            self.adyacencia[nombre] = {}
+        if lat is not None and lon is not None:
+            self._espacial.ubicar(nombre, lat, lon)
+
+    def _ubicar_ciudad(self, nombre, lat, lon):
+        if nombre not in self._ids:
+            self._agregar_ciudad(nombre)
+        if lat is None or lon is None:
+            self._espacial.quitar(nombre)
+        else:
+            self._espacial.ubicar(nombre, lat, lon)
+
+    def _eliminar_ciudad(self, ciudad):
+        if ciudad not in self._ids:
+            return
+        # Eliminar todas las conexiones de esta ciudad
+        conexiones = self.adyacencia.pop(ciudad)
+        self._cambiar_filas(ciudad, *conexiones)
+        for ciudad_conectada, conexion in conexiones.items():
+            self.adyacencia.get(ciudad_conectada, {}).pop(ciudad, None)
+            self._estadisticas.quitar_arista(ciudad, ciudad_conectada, _costos(conexion))
+        self._estadisticas.eliminar_ciudad(ciudad)
+        self._espacial.quitar(ciudad)
+        if ciudad in self.tipos_ciudad:
+            del self.tipos_ciudad[ciudad]
+        id_ciudad = self._ids.pop(ciudad)
+        self._nombres[id_ciudad] = None
+        if self._arboles:
+            # Los árboles con raíz en la ciudad dejan de tener sentido
+            for clave in [clave for clave in self._arboles if clave[0] == id_ciudad]:
+                del self._arboles[clave]
+            self._reparar_arboles([(id_ciudad, self._ids[vecino], conexion, None)
+                                   for vecino, conexion in conexiones.items()
+                                   if vecino != ciudad])
+
+    def _eliminar_arista(self, ciudad1, ciudad2):
+        anterior = None
         if ciudad1 in self.adyacencia:
-            self.adyacencia[ciudad1] = [
-                c for c in self.adyacencia[ciudad1] if c[0] != ciudad2
-            ]
+            anterior = self.adyacencia[ciudad1].pop(ciudad2, None)
         if ciudad2 in self.adyacencia:
-            self.adyacencia[ciudad2] = [
-                c for c in self.adyacencia[ciudad2] if c[0] != ciudad1
-            ]
+            self.adyacencia[ciudad2].pop(ciudad1, None)
+        if anterior is not None:
+            self._cambiar_filas(ciudad1, ciudad2)
+            self._estadisticas.quitar_arista(ciudad1, ciudad2, _costos(anterior))
+            self._reparar_arboles([(self._ids[ciudad1], self._ids[ciudad2], anterior, None)])
+
+    def _limpiar(self):
+        self._arboles = None
+        self._base = self._filas = None
+        self._estadisticas = EstadisticasGrafo(CRITERIOS)
+        self._espacial = IndiceEspacial()
+        self.adyacencia.clear()
+        self.tipos_ciudad.clear()
+        self._ids.clear()
+        self._nombres.clear()
+
+    def compilado(self):
+        """
+        Retorna la forma compilada del grafo (ids enteros, arreglos CSR y
+        columnas de costos). Se reconstruye sólo si el grafo cambió desde la
+        última vez que se pidió.
+        """
+        compilado = self._compilado
+        if compilado is not None:
+            return compilado
+        with self._lock:
+            if self._compilado is None:
+                self._compilado = self._compilar()
+            return self._compilado
+
+    def _compilar(self):
+        """
+        Arma la forma compilada a partir de la lista de adyacencia. Si hay una
+        forma anterior, sólo se rearman las filas que cambiaron desde entonces.
+        """
+        base, filas = self._base, self._filas
+        self._base = self._filas = None
+        if base is None or len(filas) > len(self._nombres) // 2:
+            offsets = array('q', [0])
+            columnas = (array('i'), array('d'), array('d'), array('d'))
+            for nombre in self._nombres:
+                self._agregar_fila(nombre, columnas)
+                offsets.append(len(columnas[0]))
+            tipos = {nombre: self.tipos_ciudad.get(nombre, "normal") for nombre in self._ids}
+        else:
+            offsets, columnas = self._filas_compiladas(base, filas)
+            tipos = dict(self.tipos_ciudad)
+
+        compilado = GrafoCompilado(list(self._nombres), tipos, offsets, *columnas,
+                                   dict(self._espacial.puntos), ids=dict(self._ids))
+        compilado.version = self.version
+        if self._arboles:
+            # Los árboles reparados pasan a la nueva versión y dejan de ser del escritor
+            self._extender_arboles()
+            for clave, arbol in self._arboles.items():
+                compilado.arboles.guardar(clave, arbol)
+        self._arboles = None
+        return compilado
+
+    def _agregar_fila(self, nombre, columnas):
+        """Agrega a las columnas CSR las conexiones de la ciudad (ninguna si se eliminó)"""
+        if nombre is None:
+            return
+        ids = self._ids
+        destinos, distancias, tiempos, peajes = columnas
+        for conexion in self.adyacencia.get(nombre, {}).values():
+            destinos.append(ids[conexion[0]])
+            distancias.append(costo_conexion(conexion, 1))
+            tiempos.append(costo_conexion(conexion, 2))
+            peajes.append(costo_conexion(conexion, 3))
+
+    def _filas_compiladas(self, base, filas):
+        """
+        Columnas CSR armadas sobre la forma compilada `base`: los tramos de
+        filas sin cambios se copian en bloque y sólo se rearman las filas
+        de `filas` y las de ciudades nuevas
+        """
+        offsets = array('q', [0])
+        columnas = (array('i'), array('d'), array('d'), array('d'))
+        columnas_base = (base.destinos,) + base.costos[1:]
+        offsets_base = base.offsets
+        total_base = len(base.nombres)
+        inicio = 0
+        for u in sorted(fila for fila in filas if fila < total_base) + [total_base]:
+            if u > inicio:
+                a, b = offsets_base[inicio], offsets_base[u]
+                corrimiento = len(columnas[0]) - a
+                for columna, columna_base in zip(columnas, columnas_base):
+                    columna.frombytes(memoryview(columna_base)[a:b].cast('B'))
+                if corrimiento:
+                    offsets.extend(o + corrimiento for o in offsets_base[inicio + 1:u + 1])
+                else:
+                    offsets.frombytes(memoryview(offsets_base)[inicio + 1:u + 1].cast('B'))
+            inicio = u + 1
+            if u < total_base:
+                self._agregar_fila(self._nombres[u], columnas)
+                offsets.append(len(columnas[0]))
+        for nombre in self._nombres[total_base:]:
+            self._agregar_fila(nombre, columnas)
+            offsets.append(len(columnas[0]))
+        return offsets, columnas
 
     def obtener_ciudades(self):
         """Retorna lista de todas las ciudades"""
-        return list(self.adyacencia.keys())
+        return [nombre for nombre in self._nombres if nombre is not None]
+
+    def existe_ciudad(self, ciudad):
+        """Indica si la ciudad está en el grafo"""
+        return ciudad in self._ids
+
+    def total_ciudades(self):
+        """Cantidad de ciudades del grafo"""
+        return len(self._ids)
+
+    def tipo_ciudad(self, ciudad):
+        """Tipo de la ciudad ("normal" si no tiene uno asignado)"""
+        tipos = self._tipos_ciudad
+        if tipos is None:
+            tipos = self.compilado().tipos
+        return tipos.get(ciudad, "normal")
 
     def obtener_ciudades_detalladas(self):
         """Retorna información detallada de las ciudades"""
-        return [
-            {"nombre": ciudad, "tipo": self.tipos_ciudad.get(ciudad, "normal")}
-            for ciudad in self.obtener_ciudades()
-        ]
+        coordenadas = self.compilado().coordenadas
+        ciudades = []
+        for ciudad in self.obtener_ciudades():
+            detalle = {"nombre": ciudad, "tipo": self.tipo_ciudad(ciudad)}
+            if ciudad in coordenadas:
+                detalle["lat"], detalle["lon"] = coordenadas[ciudad]
+            ciudades.append(detalle)
+        return ciudades
+
+    def coordenadas_ciudad(self, ciudad):
+        """(lat, lon) de la ciudad, o None si no tiene coordenadas"""
+        return self.compilado().coordenadas.get(ciudad)
+
+    def extension(self):
+        """Caja (lat_min, lon_min, lat_max, lon_max) de las ciudades con coordenadas, o None"""
+        return self.compilado().extension()
+
+    def ciudades_cercanas(self, lat, lon, k=1, radio_km=None):
+        """
+        Las `k` ciudades con coordenadas más cercanas al punto (lat, lon),
+        opcionalmente a no más de `radio_km`. Retorna una lista de
+        (ciudad, distancia en km) de la más cercana a la más lejana.
+        """
+        with self._lock:
+            cercanas = self._indice_espacial().cercanas(lat, lon, k, radio_km)
+        return [(ciudad, distancia) for distancia, ciudad in cercanas]
+
+    def _ids_en_caja(self, caja):
+        """Forma compilada y conjunto de ids de las ciudades dentro de `caja`"""
+        with self._lock:
+            # Bajo el lock la grilla y la forma compilada corresponden a la misma versión
+            compilado = self.compilado()
+            ids = compilado.ids
+            return compilado, {ids[nombre] for nombre in self._indice_espacial().en_caja(*caja)}
+
+    def _ids_sin_coordenadas(self, compilado):
+        """Conjunto de ids de las ciudades de `compilado` que no tienen coordenadas"""
+        coordenadas = compilado.coordenadas
+        return {u for u, nombre in enumerate(compilado.nombres)
+                if nombre is not None and nombre not in coordenadas}
+
+    def filtrar_ciudades(self, tipo=None, buscar=None, despues=-1, caja=None, sin_coordenadas=False):
+        """
+        Genera (id, nombre, tipo) de las ciudades en orden de id, a partir de
+        la posterior al id `despues`, filtrando por tipo, por texto en el
+        nombre, por `caja` (lat_min, lon_min, lat_max, lon_max) y, con
+        `sin_coordenadas`, sólo las que no tienen coordenadas
+        """
+        dentro = None
+        if caja is not None:
+            compilado, dentro = self._ids_en_caja(caja)
+        else:
+            compilado = self.compilado()
+        if sin_coordenadas:
+            sin = self._ids_sin_coordenadas(compilado)
+            dentro = sin if dentro is None else dentro & sin
+        if dentro is not None:
+            candidatos = sorted(u for u in dentro if u > despues)
+        else:
+            candidatos = range(max(despues + 1, 0), len(compilado.nombres))
+        nombres, tipos = compilado.nombres, compilado.tipos
+        buscar = buscar.lower() if buscar else None
+        for u in candidatos:
+            nombre = nombres[u]
+            if nombre is None:
+                continue
+            tipo_u = tipos.get(nombre, "normal")
+            if tipo is not None and tipo_u != tipo:
+                continue
+            if buscar is not None and buscar not in nombre.lower():
+                continue
+            yield u, nombre, tipo_u
 
-    def dijkstra(self, inicio, destino, criterio='distancia'):
+    def filtrar_aristas(self, ciudad=None, tipo=None, rangos=None, caja=None, sin_coordenadas=False,
+                        despues=(-1, -1)):
         """
-        Algoritmo de Dijkstra para encontrar la ruta más corta
+        Genera ((id1, id2), ciudad1, ciudad2, distancia, tiempo, peaje) en
+        orden de ids a partir de la arista posterior a `despues`. Filtra por
+        una ciudad de los extremos, por tipo de alguno de los extremos, por
+        `rangos` {criterio: (mínimo, máximo)} (None deja un lado abierto),
+        por `caja` (lat_min, lon_min, lat_max, lon_max): las carreteras con
+        algún extremo dentro de la caja, y con `sin_coordenadas` las que
+        tienen algún extremo sin coordenadas.
         """
-        if inicio not in self.adyacencia or destino not in self.adyacencia:
+        dentro = None
+        if caja is not None:
+            compilado, dentro = self._ids_en_caja(caja)
+        else:
+            compilado = self.compilado()
+        if sin_coordenadas:
+            sin = self._ids_sin_coordenadas(compilado)
+            dentro = sin if dentro is None else dentro & sin
+        nombres, tipos = compilado.nombres, compilado.tipos
+        if ciudad is not None or dentro is not None:
+            if ciudad is not None:
+                u = compilado.ids.get(ciudad)
+                if u is None:
+                    return
+                origenes = [u]
+            else:
+                origenes = dentro
+            despues = tuple(despues)
+            # Cada carretera una vez, aunque sus dos extremos estén en el conjunto
+            aristas = sorted({(min(u, v), max(u, v)): (min(u, v), max(u, v), distancia, tiempo, peaje)
+                              for u in origenes
+                              for v, distancia, tiempo, peaje in compilado.vecinos(u)
+                              if (min(u, v), max(u, v)) > despues}.values())
+            if ciudad is not None and dentro is not None:
+                aristas = [arista for arista in aristas if arista[0] in dentro or arista[1] in dentro]
+        else:
+            aristas = compilado.aristas_desde(despues)
+
+        limites = [(INDICES_CRITERIO[criterio] - 1, minimo, maximo)
+                   for criterio, (minimo, maximo) in (rangos or {}).items()]
+        for u, v, distancia, tiempo, peaje in aristas:
+            costos = (distancia, tiempo, peaje)
+            if any((minimo is not None and costos[i] < minimo) or
+                   (maximo is not None and costos[i] > maximo)
+                   for i, minimo, maximo in limites):
+                continue
+            if tipo is not None and tipo not in (tipos.get(nombres[u], "normal"),
+                                                 tipos.get(nombres[v], "normal")):
+                continue
+            yield (u, v), nombres[u], nombres[v], distancia, tiempo, peaje
+
+    def dijkstra(self, inicio, destino, criterio='distancia', metodo='dijkstra'):
+        """
+        Algoritmo de Dijkstra para encontrar la ruta más corta.
+
+        `metodo` elige la estrategia de búsqueda punto a punto:
+        'dijkstra' (clásico), 'bidireccional', 'astar' (A* con cotas ALT) o
+        'ch' (jerarquía de contracción, si está vigente). Todas retornan el
+        mismo (camino, costo).
+        """
+        compilado = self.compilado()
+        if inicio not in compilado.ids or destino not in compilado.ids:
             return [], float('inf')
             
         if inicio == destino:
             return [inicio], 0
             
         # Índices según el criterio (1: distancia, 2: tiempo, 3: peaje)
-        indices = {'distancia': 1, 'tiempo': 2, 'peaje': 3}
-        idx = indices.get(criterio, 1)
-        
-        # Inicializar distancias
-        dist = {nodo: float('inf') for nodo in self.adyacencia}
-        dist[inicio] = 0
-        prev = {inicio: None}
-        pq = [(0, inicio)]  # Cola de prioridad
-
-        while pq:
-            costo_actual, nodo_actual = heapq.heappop(pq)
-            
-            # Si encontramos una distancia mayor, saltar
-            if costo_actual > dist[nodo_actual]:
-                continue
-                
-            if nodo_actual == destino:
-                break
-                
-            # Explorar vecinos
-            for conexion in self.adyacencia[nodo_actual]:
-                vecino = conexion[0]
-                costos = conexion[1:]  # (distancia, tiempo, peaje)
-                
-                # Asegurar que los costos son números
-                try:
-                    costo_arista = float(costos[idx-1])
-                except (ValueError, TypeError, IndexError):
-                    costo_arista = float('inf')
-                    
-                nuevo_costo = costo_actual + costo_arista
-                
-                if nuevo_costo < dist[vecino]:
-                    dist[vecino] = nuevo_costo
-                    prev[vecino] = nodo_actual
-                    heapq.heappush(pq, (nuevo_costo, vecino))
+        idx = INDICES_CRITERIO.get(criterio, 1)
+        origen_id = compilado.ids[inicio]
+        destino_id = compilado.ids[destino]
+
+        contadores = metricas.nuevos_contadores()
+        camino, costo, metodo_usado = self._buscar(compilado, origen_id, destino_id, idx, criterio,
+                                                   metodo, contadores)
+        metricas.registrar_busqueda(metodo_usado, criterio, contadores)
+        return camino, costo
+
+    def _buscar(self, compilado, origen_id, destino_id, idx, criterio, metodo, contadores):
+        """Búsqueda punto a punto entre ids; retorna (camino, costo, método usado)"""
+        # Si ya existe el árbol completo desde el origen, se reutiliza
+        arbol = compilado.arboles.get((origen_id, idx))
+        if arbol is not None:
+            dist, prev = arbol
+            metodo = 'arbol'
+        else:
+            # Sin jerarquía vigente, 'ch' vuelve a la búsqueda clásica
+            jerarquia_ch = self._jerarquias.get(criterio) if metodo == 'ch' else None
+            if jerarquia_ch is not None and jerarquia_ch.version != compilado.version:
+                jerarquia_ch = None
+            if jerarquia_ch is not None:
+                costo, camino = jerarquia_ch.consultar(origen_id, destino_id, contadores)
+            elif metodo == 'bidireccional':
+                costo, camino = compilado.dijkstra_bidireccional(origen_id, destino_id, idx,
+                                                                 contadores=contadores)
+            elif metodo == 'astar':
+                costo, camino = compilado.a_estrella(origen_id, destino_id, idx, contadores=contadores)
+            else:
+                camino = None
+            if camino is not None:
+                if not camino:
+                    return [], float('inf'), metodo
+                return [compilado.nombres[nodo] for nodo in camino], costo, metodo
+            metodo = 'dijkstra'
+            dist, prev = compilado.dijkstra(origen_id, idx, destino_id, contadores=contadores)
 
         # Reconstruir camino si existe
-        if dist[destino] == float('inf'):
+        if dist[destino_id] == float('inf'):
+            return [], float('inf'), metodo
+        return compilado.camino(prev, destino_id), dist[destino_id], metodo
+
+    def dijkstra_desde(self, inicio, criterio='distancia'):
+        """
+        Dijkstra de origen único: calcula el árbol completo de caminos mínimos
+        desde `inicio`. Retorna (dist, prev) sólo con las ciudades alcanzables.
+        El árbol se guarda en caché hasta la próxima modificación del grafo.
+        """
+        compilado = self.compilado()
+        if inicio not in compilado.ids:
+            return {}, {}
+
+        idx = INDICES_CRITERIO.get(criterio, 1)
+        dist_ids, prev_ids = compilado.arbol(compilado.ids[inicio], idx)
+        nombres = compilado.nombres
+        dist = {}
+        prev = {}
+        for nodo, costo in enumerate(dist_ids):
+            if costo != float('inf'):
+                dist[nombres[nodo]] = costo
+                anterior = prev_ids[nodo]
+                prev[nombres[nodo]] = nombres[anterior] if anterior != -1 else None
+        return dist, prev
+
+    def rutas_lote(self, pares):
+        """
+        Calcula varias rutas a la vez. `pares` es una lista de
+        (origen, destino, criterio); los pares que comparten origen y criterio
+        se resuelven con un único árbol de caminos mínimos (con SciPy si el
+        backend NumPy está disponible). Retorna una lista de (camino, costo)
+        en el mismo orden que `pares`.
+        """
+        compilado = self.compilado()
+        ids = compilado.ids
+        resultados = [([], float('inf'))] * len(pares)
+        grupos = defaultdict(list)
+        for i, (origen, destino, criterio) in enumerate(pares):
+            if origen in ids and destino in ids:
+                grupos[(ids[origen], INDICES_CRITERIO.get(criterio, 1))].append((i, ids[destino]))
+
+        if backend_numpy.usar(len(grupos)):
+            # Todos los orígenes de un criterio en una sola llamada a SciPy
+            origenes = defaultdict(list)
+            for origen_id, idx in grupos:
+                origenes[idx].append(origen_id)
+            arboles = ((origen_id, idx, dist, prev)
+                       for idx, origenes_ids in origenes.items()
+                       for origen_id, dist, prev in backend_numpy.arboles(compilado, origenes_ids, idx))
+        else:
+            # Los árboles de un lote no se guardan: desplazarían de la caché a
+            # los de las consultas frecuentes
+            arboles = ((origen_id, idx, *compilado.arbol(origen_id, idx, guardar=False))
+                       for origen_id, idx in grupos)
+
+        for origen_id, idx, dist, prev in arboles:
+            for i, destino_id in grupos[(origen_id, idx)]:
+                if dist[destino_id] != float('inf'):
+                    resultados[i] = (compilado.camino(prev, destino_id), dist[destino_id])
+        return resultados
+
+    def matriz(self, origenes, destinos, criterio='distancia'):
+        """
+        Matriz de costos mínimos origenes × destinos para un criterio, con un
+        árbol de caminos mínimos por origen (calculados juntos con SciPy si el
+        backend NumPy está disponible). Los pares sin ruta valen inf.
+        """
+        compilado = self.compilado()
+        ids = compilado.ids
+        idx = INDICES_CRITERIO.get(criterio, 1)
+        destinos_ids = [ids.get(destino) for destino in destinos]
+        origenes_ids = list(dict.fromkeys(ids[origen] for origen in origenes if origen in ids))
+        if backend_numpy.usar(len(origenes_ids)):
+            # Las ciudades inexistentes se consultan como la 0 y se corrigen abajo
+            costos = backend_numpy.matriz_costos(compilado, origenes_ids,
+                                                 [d or 0 for d in destinos_ids], idx)
+            dist_origenes = dict(zip(origenes_ids, costos))
+        else:
+            dist_origenes = None
+        filas = []
+        for origen in origenes:
+            if origen not in ids:
+                filas.append([float('inf')] * len(destinos))
+                continue
+            if dist_origenes is not None:
+                fila = dist_origenes[ids[origen]]
+                filas.append([fila[j] if d is not None else float('inf')
+                              for j, d in enumerate(destinos_ids)])
+                continue
+            dist, _ = compilado.arbol(ids[origen], idx, guardar=False)
+            filas.append([dist[d] if d is not None else float('inf') for d in destinos_ids])
+        return filas
+
+    def rutas_pareto(self, inicio, destino, max_rutas=None):
+        """
+        Frente de Pareto de rutas entre dos ciudades considerando a la vez
+        distancia, tiempo y peaje, en una sola búsqueda multiobjetivo.
+        Retorna una lista de {"camino", "distancia", "tiempo", "peaje"}.
+        """
+        compilado = self.compilado()
+        if inicio not in compilado.ids or destino not in compilado.ids:
+            return []
+        nombres = compilado.nombres
+        return [
+            {
+                "camino": [nombres[nodo] for nodo in camino],
+                "distancia": distancia,
+                "tiempo": tiempo,
+                "peaje": peaje
+            }
+            for (distancia, tiempo, peaje), camino in compilado.rutas_pareto(
+                compilado.ids[inicio], compilado.ids[destino], max_rutas)
+        ]
+
+    def rutas_alternativas(self, inicio, destino, k=3, criterio='distancia'):
+        """
+        Hasta `k` rutas sin ciudades repetidas entre dos ciudades, de la mejor
+        a la peor según el criterio (algoritmo de Yen). Retorna una lista de
+        {"camino", "costo", "distancia", "tiempo", "peaje"}.
+        """
+        compilado = self.compilado()
+        if inicio not in compilado.ids or destino not in compilado.ids:
+            return []
+        if inicio == destino:
+            return [{"camino": [inicio], "costo": 0, "distancia": 0, "tiempo": 0, "peaje": 0}]
+        nombres = compilado.nombres
+        return [
+            {
+                "camino": [nombres[nodo] for nodo in camino],
+                "costo": costo,
+                **dict(zip(CRITERIOS, compilado.costos_camino(camino)))
+            }
+            for costo, camino in compilado.k_rutas(compilado.ids[inicio], compilado.ids[destino],
+                                                   INDICES_CRITERIO.get(criterio, 1), k)
+        ]
+
+    def ruta_ponderada(self, inicio, destino, pesos):
+        """
+        Ruta que minimiza una combinación de criterios. `pesos` es un dict
+        como {'distancia': 1, 'tiempo': 0.5, 'peaje': 2}. Retorna (camino, costo).
+        """
+        compilado = self.compilado()
+        if inicio not in compilado.ids or destino not in compilado.ids:
+            return [], float('inf')
+        columna = compilado.columna_ponderada(
+            tuple(float(pesos.get(criterio, 0)) for criterio in CRITERIOS))
+        destino_id = compilado.ids[destino]
+        dist, prev = compilado.dijkstra(compilado.ids[inicio], None, destino_id, columna)
+        if dist[destino_id] == float('inf'):
             return [], float('inf')
+        return compilado.camino(prev, destino_id), dist[destino_id]
 
-        camino = []
-        nodo = destino
-        while nodo is not None:
-            camino.insert(0, nodo)
-            nodo = prev.get(nodo)
-            
-        return camino, dist[destino]
+    def costos_camino(self, camino):
+        """Totales de distancia, tiempo y peaje de un camino de ciudades"""
+        compilado = self.compilado()
+        ids = compilado.ids
+        if any(ciudad not in ids for ciudad in camino):
+            return None
+        return dict(zip(CRITERIOS, compilado.costos_camino([ids[ciudad] for ciudad in camino])))
+
+    def todas_las_rutas(self, procesos=1):
+        """
+        Calcula las rutas óptimas entre todos los pares de ciudades para los
+        tres criterios, con un Dijkstra de origen único por origen y criterio.
+        Con `procesos` > 1 los orígenes se reparten entre varios procesos
+        (ver paralelo.py). La tabla se mantiene en caché hasta la próxima
+        modificación del grafo.
+        """
+        compilado = self.compilado()
+        if compilado.todas_rutas is None:
+            compilado.todas_rutas = list(self._iterar_rutas(compilado, procesos))
+        return compilado.todas_rutas
+
+    def iterar_todas_las_rutas(self, procesos=1):
+        """
+        Genera una por una las rutas de todas_las_rutas() sin construir la
+        tabla completa: sólo mantiene en memoria los árboles del origen actual
+        (o las rutas de los orígenes que están calculando los procesos).
+        """
+        compilado = self.compilado()
+        if compilado.todas_rutas is not None:
+            return iter(compilado.todas_rutas)
+        return self._iterar_rutas(compilado, procesos)
+
+    def iterar_rutas_ndjson(self, procesos):
+        """
+        Variante de iterar_todas_las_rutas() repartida entre `procesos`
+        procesos que además serializan las rutas: genera bloques (texto
+        NDJSON, rutas por criterio). Retorna None si no conviene repartir
+        (un solo proceso, pocas ciudades o la tabla ya está en caché).
+        """
+        compilado = self.compilado()
+        if procesos <= 1 or len(compilado) < paralelo.MIN_CIUDADES or compilado.todas_rutas is not None:
+            return None
+        return paralelo.iterar_ndjson(compilado, INDICES_CRITERIO, procesos)
+
+    def _iterar_rutas(self, compilado, procesos=1):
+        """Generador de rutas de todos los pares sobre una forma compilada"""
+        if procesos > 1 and len(compilado) >= paralelo.MIN_CIUDADES:
+            return paralelo.iterar_rutas(compilado, INDICES_CRITERIO, procesos)
+        return compilado.rutas(compilado.ids.values(), INDICES_CRITERIO)
+
+    def construir_jerarquias(self, criterios=CRITERIOS):
+        """Preprocesa una jerarquía de contracción por criterio"""
+        compilado = self.compilado()
+        for criterio in criterios:
+            j = jerarquia.JerarquiaContraccion.construir(compilado, INDICES_CRITERIO[criterio])
+            j.version = compilado.version
+            self._jerarquias[criterio] = j
+
+    def jerarquia(self, criterio):
+        """Jerarquía del criterio, o None si no existe o el grafo cambió desde que se construyó"""
+        j = self._jerarquias.get(criterio)
+        if j is None or j.version != self.compilado().version:
+            return None
+        return j
+
+    def guardar_jerarquias(self, ruta):
+        """Guarda en disco las jerarquías vigentes junto a la huella del grafo"""
+        compilado = self.compilado()
+        vigentes = {criterio: j for criterio, j in self._jerarquias.items()
+                    if j.version == compilado.version}
+        jerarquia.guardar(ruta, compilado.huella(), vigentes)
+
+    def cargar_jerarquias(self, ruta):
+        """
+        Carga jerarquías guardadas si fueron construidas para este mismo grafo.
+        Retorna la lista de criterios cargados.
+        """
+        huella, jerarquias = jerarquia.cargar(ruta)
+        compilado = self.compilado()
+        if huella != compilado.huella():
+            return []
+        for criterio, j in jerarquias.items():
+            j.version = compilado.version
+            self._jerarquias[criterio] = j
+        return list(jerarquias)
+
+    def aristas(self):
+        """Genera cada arista una sola vez como (ciudad1, ciudad2, distancia, tiempo, peaje)"""
+        compilado = self.compilado()
+        nombres = compilado.nombres
+        for u, v, distancia, tiempo, peaje in compilado.aristas():
+            yield nombres[u], nombres[v], distancia, tiempo, peaje
+
+    def conexiones(self, ciudad):
+        """Lista de (vecino, distancia, tiempo, peaje) de una ciudad"""
+        compilado = self.compilado()
+        u = compilado.ids.get(ciudad)
+        if u is None:
+            return []
+        nombres = compilado.nombres
+        return [(nombres[v], distancia, tiempo, peaje)
+                for v, distancia, tiempo, peaje in compilado.vecinos(u)]
+
+    def grado(self, ciudad):
+        """Cantidad de conexiones de una ciudad"""
+        # La adyacencia la modifican los escritores: se lee sin un lote a medio aplicar
+        with self._lock:
+            adyacencia = self._adyacencia
+            if adyacencia is not None:
+                return len(adyacencia.get(ciudad, ()))
+        compilado = self.compilado()
+        u = compilado.ids.get(ciudad)
+        return compilado.grado(u) if u is not None else 0
+
+    def total_aristas(self):
+        """Cantidad de carreteras (aristas no dirigidas) del grafo"""
+        with self._lock:
+            estadisticas = self._estadisticas
+            if estadisticas is not None:
+                return estadisticas.total_aristas
+        return self.compilado().total_aristas
 
     def obtener_info_arista(self, ciudad1, ciudad2):
         """Obtiene información de una arista específica"""
-        for conexion in self.adyacencia[ciudad1]:
-            if conexion[0] == ciudad2:
-                return {
-                    'distancia': conexion[1],
-                    'tiempo': conexion[2],
-                    'peaje': conexion[3]
-                }
-        return None
\ No newline at end of file
+        conexion = self.adyacencia.get(ciudad1, {}).get(ciudad2)
+        if conexion is None:
+            return None
+        return {
+            'distancia': conexion[1],
+            'tiempo': conexion[2],
+            'peaje': conexion[3]
+        }
\ No newline at end of file
@@ -0,0 +1,260 @@
+"""Jerarquías de contracción sobre un GrafoCompilado (python jerarquia.py las construye)"""
+from array import array
+import heapq
+import json
+
+from compilado import sumar_contadores
+
+INF = float('inf')
+
+
+class JerarquiaContraccion:
+    """Jerarquía de contracción de un criterio, en formato CSR ascendente"""
+
+    def __init__(self, rango, offsets, destinos, costos, medios):
+        self.rango = rango  # Orden de contracción de cada id (-1 si no existe)
+        # Aristas ascendentes: de cada ciudad sólo hacia ciudades de mayor rango
+        self.offsets = offsets
+        self.destinos = destinos
+        self.costos = costos
+        self.medios = medios  # Ciudad contraída que reemplaza cada atajo (-1 si es original)
+        self.version = None  # Versión del Grafo para la que es válida
+        self._medio = {}
+        for u in range(len(offsets) - 1):
+            for k in range(offsets[u], offsets[u + 1]):
+                if medios[k] != -1:
+                    self._medio[(u, destinos[k])] = medios[k]
+
+    @classmethod
+    def construir(cls, compilado, idx, limite_testigos=200):
+        """
+        Contrae todas las ciudades del grafo compilado para el criterio `idx`.
+        `limite_testigos` acota las ciudades que asienta cada búsqueda de
+        caminos testigo; si se alcanza, se agrega el atajo por seguridad.
+        """
+        n = len(compilado.nombres)
+        ady = [{} for _ in range(n)]  # vecino -> (costo, medio) del grafo restante
+        for u, v, distancia, tiempo, peaje in compilado.aristas():
+            costo = (distancia, tiempo, peaje)[idx - 1]
+            if costo == INF:
+                continue
+            actual = ady[u].get(v)
+            if actual is None or costo < actual[0]:
+                ady[u][v] = (costo, -1)
+                ady[v][u] = (costo, -1)
+
+        finales = {}  # (u, v) con u < v -> (costo, medio) de la jerarquía final
+        for u in range(n):
+            for v, arista in ady[u].items():
+                if u < v:
+                    finales[(u, v)] = arista
+
+        def atajos(v):
+            """Atajos necesarios para contraer `v` sin alterar distancias"""
+            vecinos = list(ady[v].items())
+            necesarios = []
+            for i, (u, (costo_u, _)) in enumerate(vecinos):
+                objetivos = {w: costo_u + costo_w for w, (costo_w, _) in vecinos[i + 1:]}
+                if not objetivos:
+                    continue
+                testigos = _busqueda_testigo(ady, u, v, max(objetivos.values()),
+                                             objetivos, limite_testigos)
+                for w, costo in objetivos.items():
+                    if testigos.get(w, INF) > costo:
+                        necesarios.append((u, w, costo))
+            return necesarios
+
+        contraidos_vecinos = [0] * n
+
+        def prioridad(v):
+            return len(atajos(v)) - len(ady[v]) + contraidos_vecinos[v]
+
+        rango = [-1] * n
+        pq = [(prioridad(v), v) for v in compilado.ids.values()]
+        heapq.heapify(pq)
+        orden = 0
+        while pq:
+            _, v = heapq.heappop(pq)
+            if rango[v] != -1:
+                continue
+            # Actualización perezosa: si la prioridad empeoró, se reinserta
+            nueva = prioridad(v)
+            if pq and nueva > pq[0][0]:
+                heapq.heappush(pq, (nueva, v))
+                continue
+
+            for u, w, costo in atajos(v):
+                actual = ady[u].get(w)
+                if actual is None or costo < actual[0]:
+                    ady[u][w] = (costo, v)
+                    ady[w][u] = (costo, v)
+                    finales[(u, w) if u < w else (w, u)] = (costo, v)
+            for u in ady[v]:
+                del ady[u][v]
+                contraidos_vecinos[u] += 1
+            ady[v] = {}
+            rango[v] = orden
+            orden += 1
+
+        ascendentes = [[] for _ in range(n)]
+        for (u, v), (costo, medio) in finales.items():
+            if rango[u] < rango[v]:
+                ascendentes[u].append((v, costo, medio))
+            else:
+                ascendentes[v].append((u, costo, medio))
+
+        offsets = array('q', [0])
+        destinos = array('i')
+        costos = array('d')
+        medios = array('i')
+        for aristas in ascendentes:
+            for v, costo, medio in aristas:
+                destinos.append(v)
+                costos.append(costo)
+                medios.append(medio)
+            offsets.append(len(destinos))
+        return cls(rango, offsets, destinos, costos, medios)
+
+    def consultar(self, origen, destino, contadores=None):
+        """
+        Búsqueda bidireccional ascendente entre dos ids. Retorna
+        (costo, camino en ids) con los atajos ya expandidos.
+        """
+        if origen == destino:
+            return 0, [origen]
+        if self.rango[origen] == -1 or self.rango[destino] == -1:
+            return INF, []
+
+        offsets, destinos, costos = self.offsets, self.destinos, self.costos
+        dist = ({origen: 0}, {destino: 0})
+        prev = ({origen: -1}, {destino: -1})
+        colas = ([(0, origen)], [(0, destino)])
+        mejor = INF
+        encuentro = -1
+        extraidos = obsoletos = descartados = 0
+
+        while colas[0] or colas[1]:
+            # Cada lado sigue mientras su mínimo pueda mejorar el encuentro
+            for lado in (0, 1):
+                cola = colas[lado]
+                if cola and cola[0][0] >= mejor:
+                    descartados += len(cola)
+                    cola.clear()
+                if not cola:
+                    continue
+                costo_actual, u = heapq.heappop(cola)
+                extraidos += 1
+                dist_lado, prev_lado = dist[lado], prev[lado]
+                if costo_actual > dist_lado[u]:
+                    obsoletos += 1
+                    continue
+                otro = dist[1 - lado].get(u)
+                if otro is not None and costo_actual + otro < mejor:
+                    mejor = costo_actual + otro
+                    encuentro = u
+                for k in range(offsets[u], offsets[u + 1]):
+                    v = destinos[k]
+                    nuevo_costo = costo_actual + costos[k]
+                    if nuevo_costo < dist_lado.get(v, INF):
+                        dist_lado[v] = nuevo_costo
+                        prev_lado[v] = u
+                        heapq.heappush(cola, (nuevo_costo, v))
+
+        if contadores is not None:
+            sumar_contadores(contadores, extraidos, obsoletos, descartados)
+        if encuentro == -1:
+            return INF, []
+
+        subida = []
+        nodo = encuentro
+        while nodo != -1:
+            subida.append(nodo)
+            nodo = prev[0][nodo]
+        subida.reverse()
+        nodo = prev[1][encuentro]
+        while nodo != -1:
+            subida.append(nodo)
+            nodo = prev[1][nodo]
+
+        camino = [subida[0]]
+        for u, v in zip(subida, subida[1:]):
+            self._expandir(u, v, camino)
+        return mejor, camino
+
+    def _expandir(self, u, v, camino):
+        """Agrega a `camino` las ciudades del tramo u -> v (sin u), expandiendo atajos"""
+        pila = [(u, v)]
+        while pila:
+            a, b = pila.pop()
+            medio = self._medio.get((a, b) if self.rango[a] < self.rango[b] else (b, a), -1)
+            if medio == -1:
+                camino.append(b)
+            else:
+                pila.append((medio, b))
+                pila.append((a, medio))
+
+    def a_dict(self):
+        return {
+            "rango": list(self.rango),
+            "offsets": list(self.offsets),
+            "destinos": list(self.destinos),
+            "costos": list(self.costos),
+            "medios": list(self.medios)
+        }
+
+    @classmethod
+    def desde_dict(cls, datos):
+        return cls(list(datos["rango"]), array('q', datos["offsets"]),
+                   array('i', datos["destinos"]), array('d', datos["costos"]),
+                   array('i', datos["medios"]))
+
+
+def _busqueda_testigo(ady, origen, excluido, limite, objetivos, max_asentados):
+    """Dijkstra acotado desde `origen` que ignora la ciudad `excluido`"""
+    dist = {origen: 0}
+    pq = [(0, origen)]
+    pendientes = set(objetivos)
+    asentados = 0
+    while pq and pendientes and asentados < max_asentados:
+        costo_actual, u = heapq.heappop(pq)
+        if costo_actual > dist[u]:
+            continue
+        if costo_actual > limite:
+            break
+        pendientes.discard(u)
+        asentados += 1
+        for v, (costo, _) in ady[u].items():
+            if v == excluido:
+                continue
+            nuevo_costo = costo_actual + costo
+            if nuevo_costo < dist.get(v, INF):
+                dist[v] = nuevo_costo
+                heapq.heappush(pq, (nuevo_costo, v))
+    return dist
+
+
+def guardar(ruta, huella, jerarquias):
+    """Guarda las jerarquías {criterio: JerarquiaContraccion} junto a la huella del grafo"""
+    with open(ruta, 'w', encoding='utf-8') as archivo:
+        json.dump({
+            "huella": huella,
+            "criterios": {criterio: j.a_dict() for criterio, j in jerarquias.items()}
+        }, archivo)
+
+
+def cargar(ruta):
+    """Lee un archivo de jerarquías. Retorna (huella, {criterio: JerarquiaContraccion})"""
+    with open(ruta, encoding='utf-8') as archivo:
+        datos = json.load(archivo)
+    return datos["huella"], {
+        criterio: JerarquiaContraccion.desde_dict(j)
+        for criterio, j in datos["criterios"].items()
+    }
+
+
+if __name__ == '__main__':
+    from app import mapa, RUTA_JERARQUIAS
+
+    mapa.construir_jerarquias()
+    mapa.guardar_jerarquias(RUTA_JERARQUIAS)
+    print(f"Jerarquías guardadas en {RUTA_JERARQUIAS}")
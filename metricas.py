@@ -0,0 +1,244 @@
+"""Métricas de la aplicación en formato Prometheus y perfilador por muestreo"""
+from bisect import bisect_left
+from collections import Counter
+import os
+import sys
+import threading
+
+# Con GRAFO_METRICAS=0 las búsquedas no registran nada (cuesta una comparación por búsqueda)
+activo = os.environ.get('GRAFO_METRICAS', '1') != '0'
+
+
+def _formatear_etiquetas(etiquetas):
+    if not etiquetas:
+        return ''
+    pares = []
+    for clave, valor in etiquetas.items():
+        valor = str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pares.append(f'{clave}="{valor}"')
+    return '{' + ','.join(pares) + '}'
+
+
+def _formatear_valor(valor):
+    if valor == float('inf'):
+        return '+Inf'
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return repr(valor)
+
+
+class Contador:
+    tipo = 'counter'
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self._valores = {}  # valores de las etiquetas -> total
+        self._lock = threading.Lock()
+
+    def sumar(self, *valores_etiquetas, cantidad=1):
+        with self._lock:
+            self._valores[valores_etiquetas] = self._valores.get(valores_etiquetas, 0) + cantidad
+
+    def muestras(self):
+        with self._lock:
+            valores = list(self._valores.items())
+        for valores_etiquetas, total in valores:
+            yield self.nombre, dict(zip(self.etiquetas, valores_etiquetas)), total
+
+
+class Histograma:
+    tipo = 'histogram'
+
+    def __init__(self, nombre, ayuda, limites, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.limites = tuple(limites)
+        self.etiquetas = etiquetas
+        self._valores = {}  # valores de las etiquetas -> [cuentas por balde, suma, cantidad]
+        self._lock = threading.Lock()
+
+    def observar(self, valor, *valores_etiquetas):
+        balde = bisect_left(self.limites, valor)
+        with self._lock:
+            datos = self._valores.get(valores_etiquetas)
+            if datos is None:
+                datos = self._valores[valores_etiquetas] = [[0] * (len(self.limites) + 1), 0, 0]
+            datos[0][balde] += 1
+            datos[1] += valor
+            datos[2] += 1
+
+    def muestras(self):
+        with self._lock:
+            valores = [(etiquetas, (list(cuentas), suma, cantidad))
+                       for etiquetas, (cuentas, suma, cantidad) in self._valores.items()]
+        for valores_etiquetas, (cuentas, suma, cantidad) in valores:
+            etiquetas = dict(zip(self.etiquetas, valores_etiquetas))
+            acumulado = 0
+            for limite, cuenta in zip(self.limites + (float('inf'),), cuentas):
+                acumulado += cuenta
+                yield self.nombre + '_bucket', {**etiquetas, 'le': _formatear_valor(limite)}, acumulado
+            yield self.nombre + '_sum', etiquetas, suma
+            yield self.nombre + '_count', etiquetas, cantidad
+
+
+class Medidor:
+    """Métrica que se calcula al exponerla; `funcion` retorna un número"""
+
+    def __init__(self, nombre, ayuda, funcion, tipo='gauge'):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.funcion = funcion
+        self.tipo = tipo
+
+    def muestras(self):
+        yield self.nombre, {}, self.funcion()
+
+
+class Registro:
+    def __init__(self):
+        self._metricas = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, metrica):
+        """Agrega una métrica (si ya hay una con el mismo nombre, la reemplaza)"""
+        with self._lock:
+            self._metricas[metrica.nombre] = metrica
+        return metrica
+
+    def exponer(self):
+        """Texto en el formato de exposición de Prometheus (versión 0.0.4)"""
+        with self._lock:
+            metricas = list(self._metricas.values())
+        lineas = []
+        for metrica in metricas:
+            lineas.append(f'# HELP {metrica.nombre} {metrica.ayuda}')
+            lineas.append(f'# TYPE {metrica.nombre} {metrica.tipo}')
+            for nombre, etiquetas, valor in metrica.muestras():
+                lineas.append(f'{nombre}{_formatear_etiquetas(etiquetas)} {_formatear_valor(valor)}')
+        return '\n'.join(lineas) + '\n'
+
+
+REGISTRO = Registro()
+
+BUSQUEDAS = REGISTRO.registrar(Contador(
+    'grafo_busquedas_total', 'Búsquedas de rutas punto a punto', ('metodo', 'criterio')))
+ASENTADOS = REGISTRO.registrar(Contador(
+    'grafo_busqueda_asentados_total', 'Ciudades asentadas por las búsquedas', ('metodo', 'criterio')))
+EMPUJES = REGISTRO.registrar(Contador(
+    'grafo_busqueda_empujes_total', 'Elementos agregados a las colas de prioridad', ('metodo', 'criterio')))
+OBSOLETOS = REGISTRO.registrar(Contador(
+    'grafo_busqueda_obsoletos_total', 'Extracciones de la cola con distancias ya superadas',
+    ('metodo', 'criterio')))
+ASENTADOS_POR_BUSQUEDA = REGISTRO.registrar(Histograma(
+    'grafo_busqueda_asentados', 'Ciudades asentadas en cada búsqueda',
+    (1, 10, 100, 1000, 10000, 100000, 1000000), ('metodo',)))
+
+SOLICITUDES = REGISTRO.registrar(Contador(
+    'http_solicitudes_total', 'Solicitudes HTTP atendidas', ('endpoint', 'metodo', 'estado')))
+DURACION_SOLICITUDES = REGISTRO.registrar(Histograma(
+    'http_duracion_segundos', 'Duración de las solicitudes HTTP',
+    (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10), ('endpoint',)))
+
+
+def nuevos_contadores():
+    """Contadores para pasar a una búsqueda, o None si las métricas están apagadas"""
+    return {} if activo else None
+
+
+def registrar_busqueda(metodo, criterio, contadores):
+    """Suma a las métricas el trabajo de una búsqueda"""
+    if contadores is None:
+        return
+    BUSQUEDAS.sumar(metodo, criterio)
+    asentados = contadores.get('asentados', 0)
+    if asentados:
+        ASENTADOS.sumar(metodo, criterio, cantidad=asentados)
+        EMPUJES.sumar(metodo, criterio, cantidad=contadores.get('empujes', 0))
+        OBSOLETOS.sumar(metodo, criterio, cantidad=contadores.get('obsoletos', 0))
+    ASENTADOS_POR_BUSQUEDA.observar(asentados, metodo)
+
+
+def registrar_solicitud(endpoint, metodo, estado, duracion):
+    """Suma una solicitud HTTP atendida y su duración en segundos"""
+    SOLICITUDES.sumar(endpoint, metodo, str(estado))
+    DURACION_SOLICITUDES.observar(duracion, endpoint)
+
+
+class PerfiladorMuestreo:
+    """
+    Perfilador por muestreo: un hilo toma cada `intervalo` segundos la pila
+    de los demás hilos y cuenta cuántas veces aparece cada una. Las pilas se
+    guardan en formato "colapsado" (funciones separadas por ';'), que leen
+    herramientas de flame graphs.
+    """
+
+    def __init__(self):
+        self.pilas = Counter()
+        self.muestras = 0
+        self.intervalo = None
+        self._hilo = None
+        self._detener = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def activo(self):
+        return self._hilo is not None
+
+    def iniciar(self, intervalo=0.01):
+        with self._lock:
+            if self._hilo is not None:
+                return
+            self.intervalo = intervalo
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self._muestrear, name='perfilador', daemon=True)
+            self._hilo.start()
+
+    def detener(self):
+        with self._lock:
+            hilo, self._hilo = self._hilo, None
+        if hilo is not None:
+            self._detener.set()
+            hilo.join()
+
+    def limpiar(self):
+        with self._lock:
+            self.pilas.clear()
+            self.muestras = 0
+
+    def _muestrear(self):
+        propio = threading.get_ident()
+        while not self._detener.wait(self.intervalo):
+            for hilo, cuadro in sys._current_frames().items():
+                if hilo == propio:
+                    continue
+                pila = []
+                while cuadro is not None:
+                    codigo = cuadro.f_code
+                    pila.append(f"{os.path.basename(codigo.co_filename)}:{codigo.co_name}")
+                    cuadro = cuadro.f_back
+                with self._lock:
+                    self.pilas[';'.join(reversed(pila))] += 1
+            with self._lock:
+                self.muestras += 1
+
+    def resumen(self, limite=20):
+        """Pilas y funciones más frecuentes (las funciones, por muestras en las que estaban en ejecución)"""
+        with self._lock:
+            pilas = self.pilas.most_common()
+            muestras = self.muestras
+        funciones = Counter()
+        for pila, cantidad in pilas:
+            funciones[pila.rsplit(';', 1)[-1]] += cantidad
+        return {
+            "activo": self.activo,
+            "intervalo": self.intervalo,
+            "muestras": muestras,
+            "funciones": [{"funcion": funcion, "muestras": cantidad}
+                          for funcion, cantidad in funciones.most_common(limite)],
+            "pilas": [{"pila": pila, "muestras": cantidad} for pila, cantidad in pilas[:limite]]
+        }
+
+
+perfilador = PerfiladorMuestreo()
@@ -0,0 +1,103 @@
+"""Tabla de todas las rutas repartida entre procesos que leen la forma compilada de memoria compartida"""
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import json
+import multiprocessing
+from multiprocessing import shared_memory
+import os
+
+from almacen import leer_compilado, serializar
+
+# Con menos ciudades, levantar los procesos cuesta más de lo que se gana
+MIN_CIUDADES = 200
+
+# Orígenes por tarea: bloques chicos reparten mejor la carga entre procesos
+ORIGENES_POR_TAREA = 16
+
+# Forma compilada abierta sobre la memoria compartida, en cada proceso
+_memoria = None
+_compilado = None
+
+
+def procesos_disponibles():
+    """CPUs que puede usar este proceso"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _abrir_compilado(nombre):
+    global _memoria, _compilado
+    _memoria = shared_memory.SharedMemory(name=nombre)
+    _compilado = leer_compilado(_memoria.buf)[1]
+
+
+def _rutas_origenes(origenes, criterios, ndjson):
+    rutas = _compilado.rutas(origenes, criterios)
+    if not ndjson:
+        return list(rutas)
+    conteos = dict.fromkeys(criterios, 0)
+    lineas = []
+    for ruta in rutas:
+        conteos[ruta["criterio"]] += 1
+        # Mismo formato que el JSON de Flask (claves ordenadas, ASCII)
+        lineas.append(json.dumps(ruta, sort_keys=True) + "\n")
+    return ''.join(lineas), conteos
+
+
+def iterar_rutas(compilado, criterios, procesos=None):
+    """
+    Genera las mismas rutas que compilado.rutas(ids, criterios) para todos
+    los ids, calculadas en `procesos` procesos (por defecto, uno por CPU).
+    """
+    for rutas in _repartir(compilado, criterios, procesos, False):
+        yield from rutas
+
+
+def iterar_ndjson(compilado, criterios, procesos=None):
+    """
+    Como iterar_rutas(), pero genera bloques (texto NDJSON, rutas por
+    criterio) con las rutas de varios orígenes ya serializadas.
+    """
+    return _repartir(compilado, criterios, procesos, True)
+
+
+def _repartir(compilado, criterios, procesos, ndjson):
+    """
+    Reparte los orígenes entre los procesos y genera el resultado de cada
+    tarea en orden. Como mucho hay dos tareas por proceso esperando a ser
+    consumidas, así que la memoria no crece con el tamaño de la tabla.
+    """
+    procesos = procesos or procesos_disponibles()
+    origenes = list(compilado.ids.values())
+    tareas = (origenes[i:i + ORIGENES_POR_TAREA]
+              for i in range(0, len(origenes), ORIGENES_POR_TAREA))
+
+    datos = list(serializar(compilado, compilado.version or 0))
+    memoria = shared_memory.SharedMemory(create=True, size=sum(len(bloque) for bloque in datos))
+    try:
+        posicion = 0
+        for bloque in datos:
+            memoria.buf[posicion:posicion + len(bloque)] = bloque
+            posicion += len(bloque)
+        del datos
+
+        # 'spawn': hacer fork de un servidor con hilos y conexiones SQLite abiertas no es seguro
+        with ProcessPoolExecutor(procesos, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_abrir_compilado, initargs=(memoria.name,)) as pool:
+            pendientes = deque(pool.submit(_rutas_origenes, tarea, criterios, ndjson)
+                               for tarea in islice(tareas, 2 * procesos))
+            try:
+                while pendientes:
+                    resultado = pendientes.popleft().result()
+                    for tarea in islice(tareas, 1):
+                        pendientes.append(pool.submit(_rutas_origenes, tarea, criterios, ndjson))
+                    yield resultado
+            finally:
+                # Si se deja de consumir a medio camino, no se calcula el resto
+                for futuro in pendientes:
+                    futuro.cancel()
+    finally:
+        memoria.close()
+        memoria.unlink()
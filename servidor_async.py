@@ -0,0 +1,253 @@
+"""Servidor ASGI para picos de tráfico: consultas de ruta compartidas, 503 por sobrecarga y 504 por demora"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import io
+import os
+import sys
+import time
+from urllib.parse import parse_qsl
+
+from app import app as app_flask, leer_consulta_ruta, mapa, respuesta_ruta
+import metricas
+
+# Hilos que calculan rutas y atienden las solicitudes de Flask. Las búsquedas no
+# liberan el GIL: para usar varios núcleos se levantan varios workers
+HILOS = int(os.environ.get('GRAFO_ASYNC_HILOS', min(4, os.cpu_count() or 1)))
+
+# Cálculos en curso o en espera a partir de los cuales se rechaza con 503
+MAX_PENDIENTES = int(os.environ.get('GRAFO_ASYNC_PENDIENTES', 64))
+
+# Segundos que una solicitud puede esperar su respuesta antes del 504
+TIEMPO_LIMITE = float(os.environ.get('GRAFO_ASYNC_TIEMPO_LIMITE', 10))
+
+# Tamaño máximo del cuerpo de una solicitud
+MAX_CUERPO = 32 * 1024 * 1024
+
+COALESCIDAS = metricas.REGISTRO.registrar(metricas.Contador(
+    'async_coalescidas_total', 'Consultas de ruta resueltas con un cálculo ya en curso'))
+RECHAZADAS = metricas.REGISTRO.registrar(metricas.Contador(
+    'async_rechazadas_total', 'Solicitudes rechazadas con 503 por exceso de pendientes'))
+VENCIDAS = metricas.REGISTRO.registrar(metricas.Contador(
+    'async_vencidas_total', 'Solicitudes que superaron el tiempo límite (504)'))
+
+
+class ServidorAsync:
+    def __init__(self, app_wsgi, hilos=HILOS, max_pendientes=MAX_PENDIENTES, tiempo_limite=TIEMPO_LIMITE):
+        self.app_wsgi = app_wsgi
+        self.ejecutor = ThreadPoolExecutor(hilos, thread_name_prefix='ruta')
+        self.max_pendientes = max_pendientes
+        self.tiempo_limite = tiempo_limite
+        self.pendientes = 0
+        self._en_curso = {}  # (versión, consulta) -> futuro del cálculo compartido
+        # Hilo aparte para sincronizar el grafo: no espera detrás de las búsquedas
+        self.sincronizador = ThreadPoolExecutor(1, thread_name_prefix='sincronizar')
+        metricas.REGISTRO.registrar(metricas.Medidor(
+            'async_pendientes', 'Cálculos en curso o en espera', lambda: self.pendientes))
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._ciclo_de_vida(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        if scope['path'] == '/api/ruta' and scope['method'] == 'GET':
+            inicio = time.perf_counter()
+            estado = await self._ruta(scope, send)
+            if metricas.activo:
+                # Las demás solicitudes las registra Flask
+                metricas.registrar_solicitud('/api/ruta', 'GET', estado, time.perf_counter() - inicio)
+        else:
+            await self._wsgi(scope, receive, send)
+
+    async def _ciclo_de_vida(self, receive, send):
+        while True:
+            mensaje = await receive()
+            if mensaje['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif mensaje['type'] == 'lifespan.shutdown':
+                self.ejecutor.shutdown(wait=False, cancel_futures=True)
+                self.sincronizador.shutdown(wait=False, cancel_futures=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def _enviar_a_ejecutor(self, funcion, *args):
+        """Agenda `funcion` en el pool; retorna None si ya hay demasiado pendiente"""
+        if self.pendientes >= self.max_pendientes:
+            RECHAZADAS.sumar()
+            return None
+        self.pendientes += 1
+        futuro = asyncio.get_running_loop().run_in_executor(self.ejecutor, funcion, *args)
+        futuro.add_done_callback(self._terminar_pendiente)
+        return futuro
+
+    def _terminar_pendiente(self, futuro):
+        self.pendientes -= 1
+
+    async def _esperar(self, futuro, limite):
+        """Espera el resultado sin cancelar el cálculo (puede compartirlo otra solicitud)"""
+        try:
+            return await asyncio.wait_for(asyncio.shield(futuro), limite)
+        except asyncio.TimeoutError:
+            VENCIDAS.sumar()
+            raise
+
+    async def _ruta(self, scope, send):
+        args = dict(parse_qsl(scope['query_string'].decode('latin-1')))
+        try:
+            consulta = leer_consulta_ruta(args)
+        except ValueError as e:
+            return await self._json(send, {"error": str(e)}, 400)
+
+        # La versión se lee después de sincronizar: una consulta posterior a
+        # una modificación no se une a un cálculo que empezó antes de ella
+        limite = time.monotonic() + self.tiempo_limite
+        try:
+            await self._esperar(asyncio.get_running_loop().run_in_executor(
+                self.sincronizador, mapa.sincronizar), self.tiempo_limite)
+        except asyncio.TimeoutError:
+            return await self._json(send, {"error": "La ruta tardó demasiado en calcularse"}, 504)
+        except Exception as e:
+            return await self._json(send, {"error": f"Error al calcular la ruta: {str(e)}"}, 500)
+        clave = (mapa.version, consulta)
+
+        futuro = self._en_curso.get(clave)
+        if futuro is not None:
+            COALESCIDAS.sumar()
+        else:
+            futuro = self._enviar_a_ejecutor(respuesta_ruta, *consulta)
+            if futuro is None:
+                return await self._sobrecarga(send)
+            self._en_curso[clave] = futuro
+            futuro.add_done_callback(lambda _: self._en_curso.pop(clave, None))
+
+        try:
+            datos, estado, estado_cache = await self._esperar(futuro, max(0, limite - time.monotonic()))
+        except asyncio.TimeoutError:
+            return await self._json(send, {"error": "La ruta tardó demasiado en calcularse"}, 504)
+        except Exception as e:
+            return await self._json(send, {"error": f"Error al calcular la ruta: {str(e)}"}, 500)
+        return await self._json(send, datos, estado, [(b'x-cache', estado_cache.encode())])
+
+    async def _json(self, send, datos, estado, cabeceras=()):
+        cuerpo = (app_flask.json.dumps(datos) + "\n").encode('utf-8')
+        await send({
+            'type': 'http.response.start',
+            'status': estado,
+            'headers': [(b'content-type', b'application/json'),
+                        (b'content-length', str(len(cuerpo)).encode())] + list(cabeceras)
+        })
+        await send({'type': 'http.response.body', 'body': cuerpo})
+        return estado
+
+    async def _sobrecarga(self, send):
+        return await self._json(send, {"error": "Servidor ocupado, intente de nuevo"}, 503,
+                                [(b'retry-after', b'1')])
+
+    async def _wsgi(self, scope, receive, send):
+        """Atiende la solicitud con la aplicación Flask, en el pool de hilos"""
+        partes = []
+        tamano = 0
+        while True:
+            mensaje = await receive()
+            if mensaje['type'] == 'http.disconnect':
+                return 499
+            partes.append(mensaje.get('body', b''))
+            tamano += len(partes[-1])
+            if tamano > MAX_CUERPO:
+                return await self._json(send, {"error": "Solicitud demasiado grande"}, 413)
+            if not mensaje.get('more_body'):
+                break
+
+        respuesta = {}
+
+        def iniciar_respuesta(estado, cabeceras, exc_info=None):
+            respuesta['estado'] = int(estado.split(' ', 1)[0])
+            respuesta['cabeceras'] = [(nombre.lower().encode('latin-1'), valor.encode('latin-1'))
+                                      for nombre, valor in cabeceras]
+
+        def llamar():
+            contenido = self.app_wsgi(_entorno_wsgi(scope, b''.join(partes)), iniciar_respuesta)
+            # El primer bloque se genera acá: Flask puede llamar a
+            # iniciar_respuesta recién al empezar a iterar
+            iterador = iter(contenido)
+            return contenido, iterador, next(iterador, None)
+
+        futuro = self._enviar_a_ejecutor(llamar)
+        if futuro is None:
+            return await self._sobrecarga(send)
+        # Las modificaciones no se cortan: el hilo las terminaría igual y un
+        # 504 haría creer que no se aplicaron
+        limite = self.tiempo_limite if scope['method'] in ('GET', 'HEAD') else None
+        try:
+            contenido, iterador, bloque = await self._esperar(futuro, limite)
+        except asyncio.TimeoutError:
+            # El hilo sigue trabajando: la respuesta se cierra cuando termine
+            futuro.add_done_callback(_cerrar_abandonada)
+            return await self._json(send, {"error": "La solicitud tardó demasiado"}, 504)
+        except Exception as e:
+            return await self._json(send, {"error": f"Error interno del servidor: {str(e)}"}, 500)
+
+        try:
+            await send({'type': 'http.response.start', 'status': respuesta['estado'],
+                        'headers': respuesta['cabeceras']})
+            loop = asyncio.get_running_loop()
+            while bloque is not None:
+                if bloque:
+                    await send({'type': 'http.response.body', 'body': bloque, 'more_body': True})
+                # Las respuestas en streaming siguen generándose en el pool
+                bloque = await loop.run_in_executor(self.ejecutor, next, iterador, None)
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(contenido, 'close'):
+                contenido.close()
+        return respuesta['estado']
+
+
+def _cerrar_abandonada(futuro):
+    """Cierra la respuesta de Flask de una solicitud que ya recibió el 504"""
+    if futuro.cancelled() or futuro.exception() is not None:
+        return
+    contenido = futuro.result()[0]
+    if hasattr(contenido, 'close'):
+        contenido.close()
+
+
+def _entorno_wsgi(scope, cuerpo):
+    """Entorno WSGI (PEP 3333) equivalente a una solicitud ASGI"""
+    servidor = scope.get('server') or ('localhost', 80)
+    cliente = scope.get('client') or ('', 0)
+    entorno = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': servidor[0],
+        'SERVER_PORT': str(servidor[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': cliente[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(cuerpo),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for nombre, valor in scope['headers']:
+        nombre = nombre.decode('latin-1').upper().replace('-', '_')
+        valor = valor.decode('latin-1')
+        if nombre in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            entorno[nombre] = valor
+            continue
+        clave = 'HTTP_' + nombre
+        entorno[clave] = f"{entorno[clave]},{valor}" if clave in entorno else valor
+    return entorno
+
+
+app = ServidorAsync(app_flask)
+
+if __name__ == '__main__':
+    import uvicorn  # Dependencia opcional: pip install -r requirements-async.txt
+
+    uvicorn.run(app, host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
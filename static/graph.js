@@ -2,6 +2,13 @@ let network = null;
 let allNodes = null;
 let allEdges = null;
 
+// Vista geográfica: píxeles por grado y carreteras pedidas por vista (máximo de la API)
+const ESCALA_MAPA = 100;
+const LIMITE_VISTA = 1000;
+let cargaVisible = null;
+// Posición en el mapa de las ciudades sin coordenadas (en una grilla al costado)
+const posicionesSinCoordenadas = new Map();
+
 // Iconos según tipo de ciudad
 const iconos = {
     capital: '🏛️',
@@ -11,127 +18,231 @@ const iconos = {
     industrial: '🏭'
 };
 
+// Las ciudades con coordenadas se dibujan en su lugar (x = longitud, y = -latitud)
+function crearNodo(ciudad, coordenadas) {
+    const nodo = {
+        id: ciudad,
+        label: `${iconos.normal} ${ciudad}`,
+        title: ciudad,
+        color: getColorPorTipo('normal'),
+        font: { color: 'white', size: 16 },
+        shape: 'circle',
+        size: 25
+    };
+    if (coordenadas) {
+        nodo.x = coordenadas[1] * ESCALA_MAPA;
+        nodo.y = -coordenadas[0] * ESCALA_MAPA;
+        nodo.fixed = true;
+    } else if (posicionesSinCoordenadas.has(ciudad)) {
+        Object.assign(nodo, posicionesSinCoordenadas.get(ciudad), { fixed: true });
+    }
+    return nodo;
+}
+
+function crearArista(e) {
+    return {
+        id: `${e.from}-${e.to}`,
+        from: e.from,
+        to: e.to,
+        label: `📏 ${e.distancia}km\n⏱️ ${e.tiempo}min\n💰 ${e.peaje}bs`,
+        title: `Distancia: ${e.distancia}km\nTiempo: ${e.tiempo}min\nPeaje: ${e.peaje}bs`,
+        color: { color: '#7f8c8d', opacity: 0.7 },
+        width: 2,
+        font: { color: '#ecf0f1', size: 12, strokeWidth: 3, strokeColor: '#2c3e50' }
+    };
+}
+
+// Agrega a los DataSet las ciudades y carreteras que todavía no están
+function agregarAristas(edges) {
+    const nuevosNodos = [];
+    const nuevasAristas = [];
+    const vistos = new Set();
+    edges.forEach(e => {
+        [e.from, e.to].forEach((ciudad, i) => {
+            if (!vistos.has(ciudad) && !allNodes.get(ciudad)) {
+                nuevosNodos.push(crearNodo(ciudad, e.coordenadas && e.coordenadas[i]));
+            }
+            vistos.add(ciudad);
+        });
+        if (!allEdges.get(`${e.from}-${e.to}`)) {
+            nuevasAristas.push(crearArista(e));
+        }
+    });
+    allNodes.add(nuevosNodos);
+    allEdges.add(nuevasAristas);
+}
+
 function cargarGrafo() {
+    // Si las ciudades tienen coordenadas se carga sólo lo que se ve
+    fetch('/api/ciudades/extension')
+        .then(res => res.json())
+        .then(extension => extension ? cargarGrafoGeografico(extension) : cargarGrafoCompleto())
+        .catch(() => cargarGrafoCompleto());
+}
+
+function cargarGrafoCompleto() {
     fetch('/api/data')
         .then(res => res.json())
         .then(edges => {
-            const nodes = new vis.DataSet([]);
-            const edgesSet = new vis.DataSet([]);
-            const nodeIds = new Set();
-
-            // Procesar nodos
-            edges.forEach(e => {
-                if (!nodeIds.has(e.from)) {
-                    nodes.add({
-                        id: e.from,
-                        label: `${iconos.normal} ${e.from}`,
-                        title: e.from,
-                        color: getColorPorTipo('normal'),
-                        font: { color: 'white', size: 16 },
-                        shape: 'circle',
-                        size: 25
-                    });
-                    nodeIds.add(e.from);
-                }
-                if (!nodeIds.has(e.to)) {
-                    nodes.add({
-                        id: e.to,
-                        label: `${iconos.normal} ${e.to}`,
-                        title: e.to,
-                        color: getColorPorTipo('normal'),
-                        font: { color: 'white', size: 16 },
-                        shape: 'circle',
-                        size: 25
-                    });
-                    nodeIds.add(e.to);
-                }
-
-                // Agregar arista con información completa
-                edgesSet.add({
-                    id: `${e.from}-${e.to}`,
-                    from: e.from,
-                    to: e.to,
-                    label: `📏 ${e.distancia}km\n⏱️ ${e.tiempo}min\n💰 ${e.peaje}bs`,
-                    title: `Distancia: ${e.distancia}km\nTiempo: ${e.tiempo}min\nPeaje: ${e.peaje}bs`,
-                    color: { color: '#7f8c8d', opacity: 0.7 },
-                    width: 2,
-                    font: { color: '#ecf0f1', size: 12, strokeWidth: 3, strokeColor: '#2c3e50' }
+            allNodes = new vis.DataSet([]);
+            allEdges = new vis.DataSet([]);
+            agregarAristas(edges);
+            crearRed(true);
+        })
+        .catch(error => console.error('Error cargando grafo:', error));
+}
+
+function cargarGrafoGeografico(extension) {
+    allNodes = new vis.DataSet([]);
+    allEdges = new vis.DataSet([]);
+    crearRed(false);
+
+    // Encuadrar la caja de las ciudades ubicadas
+    const container = document.getElementById("mynetwork");
+    const ancho = Math.max(extension.lon_max - extension.lon_min, 0.01) * ESCALA_MAPA;
+    const alto = Math.max(extension.lat_max - extension.lat_min, 0.01) * ESCALA_MAPA;
+    network.moveTo({
+        position: {
+            x: (extension.lon_min + extension.lon_max) / 2 * ESCALA_MAPA,
+            y: -(extension.lat_min + extension.lat_max) / 2 * ESCALA_MAPA
+        },
+        scale: 0.9 * Math.min(container.clientWidth / ancho, container.clientHeight / alto)
+    });
+
+    cargarSinCoordenadas(extension).then(cargarVisible);
+    // Al mover o acercar la vista se piden las carreteras de la nueva zona
+    network.on("dragEnd", programarCargaVisible);
+    network.on("zoom", programarCargaVisible);
+}
+
+// Lo que no tiene coordenadas no cae en ninguna caja: se pide una sola vez y
+// esas ciudades se ubican en una grilla a la derecha de las ubicadas
+function cargarSinCoordenadas(extension) {
+    return fetch('/api/ciudades?sin_coordenadas=1')
+        .then(res => res.json())
+        .then(ciudades => {
+            const paso = 80;
+            const columnas = Math.max(1, Math.ceil(Math.sqrt(ciudades.length)));
+            const x0 = extension.lon_max * ESCALA_MAPA + 2 * paso;
+            const y0 = -extension.lat_max * ESCALA_MAPA;
+            ciudades.forEach((ciudad, i) => {
+                posicionesSinCoordenadas.set(ciudad.nombre, {
+                    x: x0 + (i % columnas) * paso,
+                    y: y0 + Math.floor(i / columnas) * paso
                 });
             });
+            allNodes.add(ciudades.map(ciudad => crearNodo(ciudad.nombre, null)));
+            return fetch('/api/data?sin_coordenadas=1');
+        })
+        .then(res => res.json())
+        .then(agregarAristas)
+        .catch(error => console.error('Error cargando las ciudades sin coordenadas:', error));
+}
 
-            allNodes = nodes;
-            allEdges = edgesSet;
-
-            // Crear red (Es el proceso de planificar, diseñar e implementar la estructura física )
-            const container = document.getElementById("mynetwork");
-            const data = { nodes, edges: edgesSet };
-            const options = {
-                nodes: {
-                    shape: "dot",
-                    size: 25,
-                    font: {
-                        size: 16,
-                        color: "#ffffff",
-                        strokeWidth: 3,
-                        strokeColor: "rgba(0,0,0,0.8)"
-                    },
-                    borderWidth: 2,
-                    shadow: true
-                },
-                edges: {
-                    width: 2,
-                    shadow: true,
-                    smooth: {
-                        type: "continuous",
-                        roundness: 0.5
-                    },
-                    font: {
-                        color: '#ecf0f1',
-                        size: 12,
-                        face: 'arial',
-                        background: 'rgba(0,0,0,0.7)',
-                        strokeWidth: 3
-                    }
-                },
-                physics: {
-                    enabled: true,
-                    stabilization: { iterations: 100 },
-                    barnesHut: {
-                        gravitationalConstant: -8000,
-                        springConstant: 0.04,
-                        springLength: 95
-                    }
-                },
-                interaction: {
-                    dragNodes: true,
-                    dragView: true,
-                    zoomView: true,
-                    hover: true,
-                    tooltipDelay: 200
-                }
-            };
-
-            network = new vis.Network(container, data, options);
-
-            // Resaltar ruta si existe (usando las nuevas variables)
-            // Verificar si las variables existen antes de usarlas
+function programarCargaVisible() {
+    clearTimeout(cargaVisible);
+    cargaVisible = setTimeout(cargarVisible, 250);
+}
+
+function cargarVisible() {
+    const container = document.getElementById("mynetwork");
+    const esquina1 = network.DOMtoCanvas({ x: 0, y: 0 });
+    const esquina2 = network.DOMtoCanvas({ x: container.clientWidth, y: container.clientHeight });
+    const limitar = (valor, maximo) => Math.max(-maximo, Math.min(maximo, valor));
+    const bbox = [
+        limitar(esquina1.x / ESCALA_MAPA, 180),
+        limitar(-esquina2.y / ESCALA_MAPA, 90),
+        limitar(esquina2.x / ESCALA_MAPA, 180),
+        limitar(-esquina1.y / ESCALA_MAPA, 90)
+    ].map(valor => valor.toFixed(5)).join(',');
+
+    // También las ciudades de la zona, para dibujar las que no tienen carreteras
+    fetch(`/api/ciudades?bbox=${bbox}&limite=${LIMITE_VISTA}`)
+        .then(res => res.json())
+        .then(ciudades => {
+            allNodes.add(ciudades.filter(ciudad => !allNodes.get(ciudad.nombre))
+                .map(ciudad => crearNodo(ciudad.nombre, [ciudad.lat, ciudad.lon])));
+            return fetch(`/api/data?bbox=${bbox}&limite=${LIMITE_VISTA}`);
+        })
+        .then(res => res.json())
+        .then(edges => {
+            agregarAristas(edges);
             if (typeof rutaCamino !== "undefined" && rutaCamino && rutaCamino.length > 0) {
                 resaltarRuta(rutaCamino);
             }
+        })
+        .catch(error => console.error('Error cargando la vista:', error));
+}
 
-            // Eventos de interacción
-            network.on("selectNode", function(params) {
-                console.log("Nodo seleccionado:", params.nodes[0]);
-            });
+function crearRed(fisica) {
+    // Crear red (Es el proceso de planificar, diseñar e implementar la estructura física )
+    const container = document.getElementById("mynetwork");
+    const data = { nodes: allNodes, edges: allEdges };
+    const options = {
+        nodes: {
+            shape: "dot",
+            size: 25,
+            font: {
+                size: 16,
+                color: "#ffffff",
+                strokeWidth: 3,
+                strokeColor: "rgba(0,0,0,0.8)"
+            },
+            borderWidth: 2,
+            shadow: true
+        },
+        edges: {
+            width: 2,
+            shadow: true,
+            smooth: {
+                type: "continuous",
+                roundness: 0.5
+            },
+            font: {
+                color: '#ecf0f1',
+                size: 12,
+                face: 'arial',
+                background: 'rgba(0,0,0,0.7)',
+                strokeWidth: 3
+            }
+        },
+        physics: {
+            enabled: fisica,
+            stabilization: { iterations: 100 },
+            barnesHut: {
+                gravitationalConstant: -8000,
+                springConstant: 0.04,
+                springLength: 95
+            }
+        },
+        interaction: {
+            dragNodes: true,
+            dragView: true,
+            zoomView: true,
+            hover: true,
+            tooltipDelay: 200
+        }
+    };
 
-            network.on("doubleClick", function(params) {
-                if (params.nodes.length > 0) {
-                    const nodeId = params.nodes[0];
-                    mostrarInfoCiudad(nodeId);
-                }
-            });
-        })
-        .catch(error => console.error('Error cargando grafo:', error));
+    network = new vis.Network(container, data, options);
+
+    // Resaltar ruta si existe (usando las nuevas variables)
+    // Verificar si las variables existen antes de usarlas
+    if (typeof rutaCamino !== "undefined" && rutaCamino && rutaCamino.length > 0) {
+        resaltarRuta(rutaCamino);
+    }
+
+    // Eventos de interacción
+    network.on("selectNode", function(params) {
+        console.log("Nodo seleccionado:", params.nodes[0]);
+    });
+
+    network.on("doubleClick", function(params) {
+        if (params.nodes.length > 0) {
+            const nodeId = params.nodes[0];
+            mostrarInfoCiudad(nodeId);
+        }
+    });
 }
 
 function getColorPorTipo(tipo) {
@@ -0,0 +1,33 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Los módulos del proyecto están en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importar app no debe tocar la base ni las jerarquías del repositorio
+_temporal = tempfile.TemporaryDirectory()
+os.environ['GRAFO_DB'] = os.path.join(_temporal.name, 'grafo.db')
+os.environ['GRAFO_JERARQUIAS'] = os.path.join(_temporal.name, 'jerarquias.json')
+
+from almacen import AlmacenGrafo  # noqa: E402
+from grafo import Grafo  # noqa: E402
+
+
+@pytest.fixture
+def aplicacion(tmp_path, monkeypatch):
+    """El módulo app con un grafo nuevo (los datos de ejemplo) en un almacén propio"""
+    import app as modulo
+    grafo = Grafo(AlmacenGrafo(str(tmp_path / 'grafo.db')))
+    modulo.cargar_datos_iniciales(grafo)
+    grafo.guardar_snapshot()
+    monkeypatch.setattr(modulo, 'mapa', grafo)
+    modulo.cache_rutas.limpiar()
+    return modulo
+
+
+@pytest.fixture
+def cliente(aplicacion):
+    return aplicacion.app.test_client()
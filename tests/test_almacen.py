@@ -0,0 +1,79 @@
+import os
+import threading
+
+import pytest
+
+from almacen import AlmacenGrafo
+from grafo import Grafo
+from utilidades import descripcion, modificar_al_azar
+
+
+@pytest.mark.parametrize('semilla', range(5))
+def test_ida_y_vuelta_por_snapshot_y_por_base(tmp_path, semilla):
+    ruta = str(tmp_path / 'grafo.db')
+    grafo = Grafo(AlmacenGrafo(ruta))
+    modificar_al_azar(grafo, semilla)
+    grafo.guardar_snapshot()
+    esperado = descripcion(grafo)
+
+    assert descripcion(Grafo.desde_almacen(AlmacenGrafo(ruta))) == esperado
+    # Sin snapshot se lee la base (y se vuelve a escribir el snapshot)
+    os.remove(ruta + '.snapshot')
+    assert descripcion(Grafo.desde_almacen(AlmacenGrafo(ruta))) == esperado
+    assert os.path.exists(ruta + '.snapshot')
+
+
+def test_snapshot_atrasado_se_ignora(tmp_path):
+    ruta = str(tmp_path / 'grafo.db')
+    grafo = Grafo(AlmacenGrafo(ruta))
+    modificar_al_azar(grafo, 0)
+    grafo.guardar_snapshot()
+    # Otro proceso escribe en la base sin actualizar el snapshot
+    otro = AlmacenGrafo(ruta)
+    otro.aplicar([('agregar_arista', 'Nueva', 'C0', 12, 3, 0)])
+    assert otro.cargar_snapshot()[0] == grafo.version
+
+    cargado = Grafo.desde_almacen(AlmacenGrafo(ruta))
+    assert cargado.version == grafo.version + 1
+    assert cargado.existe_arista('Nueva', 'C0')
+    assert otro.cargar_snapshot()[0] == cargado.version
+
+
+def test_eliminaciones_vacias_no_cambian_la_version(tmp_path):
+    almacen = AlmacenGrafo(str(tmp_path / 'grafo.db'))
+    grafo = Grafo(almacen)
+    grafo.agregar_arista('A', 'B', 5)
+    version = grafo.version
+
+    grafo.eliminar_arista('A', 'C')
+    grafo.eliminar_arista('X', 'Y')
+    grafo.eliminar_ciudad('X')
+    grafo.aplicar_lote([('eliminar_arista', 'B', 'C'), ('eliminar_ciudad', 'Z')])
+    assert grafo.version == almacen.version() == version
+
+    # En un lote, lo que agregan las operaciones anteriores sí se puede eliminar
+    grafo.aplicar_lote([('agregar_arista', 'B', 'C', 1, 0, 0), ('eliminar_arista', 'B', 'C'),
+                        ('eliminar_ciudad', 'C')])
+    assert grafo.version == almacen.version() == version + 1
+    assert not grafo.existe_ciudad('C')
+    assert descripcion(Grafo.desde_almacen(AlmacenGrafo(almacen.ruta_db))) == descripcion(grafo)
+
+
+def test_preparar_escrituras_en_segundo_plano(tmp_path):
+    ruta = str(tmp_path / 'grafo.db')
+    grafo = Grafo(AlmacenGrafo(ruta))
+    modificar_al_azar(grafo, 1)
+    grafo.guardar_snapshot()
+
+    cargado = Grafo.desde_almacen(AlmacenGrafo(ruta), preparar_escrituras=True)
+    for hilo in threading.enumerate():
+        if hilo.name == 'preparar-escrituras':
+            hilo.join()
+    assert cargado._adyacencia is not None and cargado._espacial is not None
+    assert cargado.estadisticas() == grafo.estadisticas()
+
+    for g in (grafo, cargado):
+        g.agregar_arista('C1', 'C2', 99, 1, 1)
+        g.eliminar_ciudad('C3')
+    assert descripcion(cargado)[:2] == descripcion(grafo)[:2]
+    assert cargado.estadisticas() == grafo.estadisticas()
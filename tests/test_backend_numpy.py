@@ -0,0 +1,91 @@
+import random
+
+import pytest
+
+import backend_numpy
+from grafo import CRITERIOS
+from utilidades import INF, costo_camino, costos, grafo_aleatorio
+
+pytest.importorskip('scipy')
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    """Retorna una función que activa o desactiva el backend; cuenta los árboles que calcula"""
+    llamadas = []
+    arboles = backend_numpy.arboles
+
+    def contar(compilado, origenes, idx):
+        llamadas.append(len(origenes))
+        return arboles(compilado, origenes, idx)
+
+    monkeypatch.setattr(backend_numpy, 'arboles', contar)
+    # Bloques chicos, para que los orígenes se repartan en varias llamadas a SciPy
+    monkeypatch.setattr(backend_numpy, 'MAX_CELDAS_BLOQUE', 40)
+
+    def usar(activo):
+        monkeypatch.setattr(backend_numpy, 'disponible', activo)
+        return llamadas
+    return usar
+
+
+def grafo_con_huecos(semilla):
+    grafo = grafo_aleatorio(semilla, ciudades=14, carreteras=18)
+    grafo.eliminar_ciudad('C5')
+    grafo.agregar_ciudad('Aislada')
+    return grafo
+
+
+@pytest.mark.parametrize('semilla', range(8))
+def test_rutas_lote_igual_a_python(backend, semilla):
+    azar = random.Random(semilla)
+    grafo = grafo_con_huecos(semilla)
+    ciudades = grafo.obtener_ciudades() + ['No existe']
+    pares = [(azar.choice(ciudades), azar.choice(ciudades), azar.choice(CRITERIOS)) for _ in range(80)]
+
+    backend(False)
+    esperados = grafo.rutas_lote(pares)
+    llamadas = backend(True)
+    resultados = grafo.rutas_lote(pares)
+    assert llamadas
+    for (origen, destino, criterio), (camino, costo), (_, esperado) in zip(pares, resultados, esperados):
+        # Con empates el camino puede ser otro, pero cuesta lo mismo
+        assert costo == esperado
+        if costo < INF:
+            assert camino[0] == origen and camino[-1] == destino
+            assert costo_camino(costos(grafo, criterio), camino) == costo
+        else:
+            assert camino == []
+
+
+@pytest.mark.parametrize('semilla', range(8))
+def test_matriz_igual_a_python(backend, semilla):
+    grafo = grafo_con_huecos(semilla)
+    ciudades = grafo.obtener_ciudades()
+    origenes = ciudades[:8] + ['No existe', ciudades[0]]
+    destinos = ['No existe'] + ciudades
+    for criterio in CRITERIOS:
+        backend(False)
+        esperada = grafo.matriz(origenes, destinos, criterio)
+        backend(True)
+        assert grafo.matriz(origenes, destinos, criterio) == esperada
+
+
+def test_costos_no_numericos(backend):
+    grafo = grafo_aleatorio(2, ciudades=8, carreteras=16)
+    # Una conexión sin costo válido no se puede recorrer
+    grafo.agregar_arista('C0', 'C1', 'sin dato', 3, 3)
+    ciudades = grafo.obtener_ciudades()
+    backend(False)
+    esperada = grafo.matriz(ciudades, ciudades)
+    backend(True)
+    assert grafo.matriz(ciudades, ciudades) == esperada
+    assert esperada[ciudades.index('C0')][ciudades.index('C1')] != 0
+
+
+def test_pocos_origenes_en_python(backend):
+    grafo = grafo_aleatorio(1)
+    llamadas = backend(True)
+    grafo.rutas_lote([('C0', 'C1', 'distancia')] * 10 + [('C2', 'C3', 'tiempo')])
+    grafo.matriz(['C0', 'C1'], ['C2'])
+    assert llamadas == [] and not backend_numpy.usar(backend_numpy.MIN_ORIGENES - 1)
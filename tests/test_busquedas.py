@@ -0,0 +1,70 @@
+import pytest
+
+from grafo import CRITERIOS, INDICES_CRITERIO
+from utilidades import INF, costo_camino, costos, dijkstra_referencia, grafo_aleatorio
+
+
+def comparar(grafo, buscar):
+    """`buscar(compilado, origen_id, destino_id, idx)` da lo mismo que un Dijkstra simple"""
+    compilado = grafo.compilado()
+    nombres = compilado.nombres
+    for criterio in CRITERIOS:
+        idx = INDICES_CRITERIO[criterio]
+        ady = costos(grafo, criterio)
+        for origen, origen_id in compilado.ids.items():
+            esperadas = dijkstra_referencia(ady, origen)
+            for destino, destino_id in compilado.ids.items():
+                costo, camino = buscar(compilado, origen_id, destino_id, idx)
+                assert costo == esperadas.get(destino, INF), (origen, destino, criterio)
+                if costo < INF:
+                    camino = [nombres[nodo] for nodo in camino]
+                    assert camino[0] == origen and camino[-1] == destino
+                    assert costo_camino(ady, camino) == costo
+                else:
+                    assert not camino
+
+
+@pytest.mark.parametrize('semilla', range(15))
+def test_bidireccional_igual_a_dijkstra(semilla):
+    grafo = grafo_aleatorio(semilla, carreteras=14)
+    comparar(grafo, lambda compilado, o, d, idx: compilado.dijkstra_bidireccional(o, d, idx))
+
+
+@pytest.mark.parametrize('semilla', range(15))
+def test_astar_igual_a_dijkstra(semilla):
+    grafo = grafo_aleatorio(semilla, carreteras=14)
+    comparar(grafo, lambda compilado, o, d, idx: compilado.a_estrella(o, d, idx))
+
+
+@pytest.mark.parametrize('semilla', range(10))
+def test_cota_alt_admisible(semilla):
+    grafo = grafo_aleatorio(semilla, carreteras=14)
+    compilado = grafo.compilado()
+    for criterio in CRITERIOS:
+        idx = INDICES_CRITERIO[criterio]
+        ady = costos(grafo, criterio)
+        for destino, destino_id in compilado.ids.items():
+            h = compilado.heuristica_alt(destino_id, idx)
+            hasta_destino = dijkstra_referencia(ady, destino)
+            for ciudad, u in compilado.ids.items():
+                assert h(u) <= hasta_destino.get(ciudad, INF)
+
+
+@pytest.mark.parametrize('metodo', ['bidireccional', 'astar'])
+def test_metodos_del_grafo_tras_modificar(metodo):
+    grafo = grafo_aleatorio(7, carreteras=14)
+    for paso in range(3):
+        for criterio in CRITERIOS:
+            ady = costos(grafo, criterio)
+            for origen in ady:
+                esperadas = dijkstra_referencia(ady, origen)
+                for destino in ady:
+                    # Sin árboles guardados, para que se use el método pedido
+                    grafo.compilado().arboles.clear()
+                    camino, costo = grafo.dijkstra(origen, destino, criterio, metodo)
+                    assert costo == esperadas.get(destino, INF)
+                    if camino:
+                        assert costo_camino(ady, camino) == costo
+        # Los landmarks de A* son de cada versión: un atajo nuevo tiene que verse
+        grafo.agregar_arista('C0', f'C{paso + 5}', 0, 0, 0)
+        grafo.eliminar_ciudad(f'C{paso + 1}')
@@ -0,0 +1,107 @@
+from cache import CacheRutas
+
+
+class Reloj:
+    """Reloj manual para los vencimientos"""
+    def __init__(self):
+        self.ahora = 0.0
+
+    def __call__(self):
+        return self.ahora
+
+
+def test_lru_desaloja_la_menos_usada():
+    cache = CacheRutas(capacidad=3, ttl=None)
+    for clave in 'abc':
+        cache.guardar(clave, 1, clave.upper())
+    assert cache.obtener('a', 1) == 'A'
+    cache.guardar('d', 1, 'D')
+    # 'b' era la menos usada: 'a' se acababa de leer
+    assert cache.obtener('b', 1) is None
+    assert [cache.obtener(clave, 1) for clave in 'acd'] == ['A', 'C', 'D']
+    cache.guardar('a', 1, 'A2')
+    cache.guardar('e', 1, 'E')
+    assert cache.obtener('c', 1) is None and cache.obtener('a', 1) == 'A2'
+    estadisticas = cache.estadisticas()
+    assert (estadisticas["entradas"], estadisticas["desalojos"]) == (3, 2)
+    assert (estadisticas["aciertos"], estadisticas["fallos"]) == (5, 2)
+    assert estadisticas["tasa_aciertos"] == round(5 / 7, 4)
+
+
+def test_ttl():
+    reloj = Reloj()
+    cache = CacheRutas(capacidad=10, ttl=5, reloj=reloj)
+    cache.guardar('a', 1, 'A')
+    reloj.ahora = 3
+    cache.guardar('b', 1, 'B')
+    reloj.ahora = 4.9
+    assert cache.obtener('a', 1) == 'A'
+    reloj.ahora = 5
+    # Leerla no renueva su vida
+    assert cache.obtener('a', 1) is None
+    assert cache.obtener('b', 1) == 'B'
+    reloj.ahora = 8
+    assert cache.obtener('b', 1) is None
+    assert cache.estadisticas()["vencidas"] == 2 and cache.estadisticas()["entradas"] == 0
+
+
+def test_version_del_grafo():
+    cache = CacheRutas(capacidad=10, ttl=None)
+    cache.guardar('a', 1, 'A')
+    assert cache.obtener('a', 1) == 'A'
+    # Una versión nueva descarta todo
+    assert cache.obtener('a', 2) is None
+    assert cache.estadisticas()["entradas"] == 0
+    # Lo calculado sobre una versión anterior no se guarda ni se sirve
+    cache.guardar('a', 1, 'viejo')
+    assert cache.obtener('a', 2) is None and cache.obtener('a', 1) is None
+    cache.guardar('a', 2, 'A2')
+    assert cache.obtener('a', 1) is None and cache.obtener('a', 2) == 'A2'
+    assert cache.estadisticas()["version_grafo"] == 2
+
+
+def test_limpiar_olvida_la_version():
+    cache = CacheRutas(capacidad=10, ttl=None)
+    cache.guardar('a', 5, 'A')
+    cache.limpiar()
+    # Otro grafo, con una versión menor
+    cache.guardar('a', 2, 'B')
+    assert cache.obtener('a', 2) == 'B'
+
+
+def test_capacidad_cero_desactiva():
+    cache = CacheRutas(capacidad=0)
+    cache.guardar('a', 1, 'A')
+    assert cache.obtener('a', 1) is None
+    assert cache.estadisticas()["entradas"] == 0
+
+
+def test_api_ruta_en_cache(aplicacion, cliente):
+    consulta = {"origen": "La Paz", "destino": "Tarija", "criterio": "tiempo"}
+    primera = cliente.get('/api/ruta', query_string=consulta)
+    segunda = cliente.get('/api/ruta', query_string=consulta)
+    assert (primera.headers['X-Cache'], segunda.headers['X-Cache']) == ('MISS', 'HIT')
+    assert primera.get_json() == segunda.get_json()
+
+    # Un cambio en el grafo invalida la respuesta guardada
+    camino = primera.get_json()["camino"]
+    aplicacion.mapa.eliminar_arista(camino[0], camino[1])
+    tercera = cliente.get('/api/ruta', query_string=consulta)
+    assert tercera.headers['X-Cache'] == 'MISS'
+    assert tercera.get_json() != primera.get_json()
+    assert cliente.get('/api/cache-rutas').get_json()["aciertos"] == 1
+
+
+def test_post_ruta_en_cache(aplicacion, cliente, monkeypatch):
+    formulario = {"origen": "La Paz", "destino": "Tarija", "criterio": "distancia"}
+    primera = cliente.post('/ruta', data=formulario).get_data(as_text=True)
+
+    calculos = []
+    dijkstra = aplicacion.mapa.dijkstra
+    monkeypatch.setattr(aplicacion.mapa, 'dijkstra', lambda *args: calculos.append(args) or dijkstra(*args))
+    assert cliente.post('/ruta', data=formulario).get_data(as_text=True) == primera
+    assert calculos == []
+
+    aplicacion.mapa.agregar_arista('La Paz', 'Tarija', 1, 1, 1)
+    nueva = cliente.post('/ruta', data=formulario).get_data(as_text=True)
+    assert len(calculos) == 1 and nueva != primera
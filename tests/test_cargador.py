@@ -0,0 +1,125 @@
+import json
+import os
+
+import pytest
+
+from almacen import AlmacenGrafo
+import cargador
+from grafo import Grafo
+from utilidades import descripcion
+
+CSV = """origen,destino,distancia,tiempo,peaje
+A,B,10,20,0
+B,C,5,7.5,1
+A,B,12,20,0
+C,D,x,1,1
+D,E,3,,
+E,E,1,1,1
+C,A,8,9,0
+F,G,-1,0,0
+C,B,6,7,2
+"""
+
+
+def escribir(tmp_path, nombre, contenido):
+    ruta = tmp_path / nombre
+    ruta.write_text(contenido, encoding='utf-8')
+    return str(ruta)
+
+
+def columnas(grafo):
+    compilado = grafo.compilado()
+    return (compilado.nombres, compilado.ids, compilado.tipos, compilado.coordenadas,
+            list(compilado.offsets), list(compilado.destinos),
+            [list(columna) for columna in compilado.costos[1:]])
+
+
+def test_carga_inicial_igual_a_aplicar_lote(tmp_path):
+    ruta = escribir(tmp_path, 'red.csv', CSV)
+    grafo = Grafo(AlmacenGrafo(str(tmp_path / 'grafo.db')))
+    resumen = cargador.cargar(grafo, ruta)
+    assert resumen == {"leidas": 6, "repetidas": 2, "omitidas": 3, "lotes": 1}
+    assert grafo.version == 1
+
+    # Lo mismo aplicando las carreteras válidas una por una, en orden
+    esperado = Grafo()
+    esperado.aplicar_lote([('agregar_arista', 'A', 'B', 10, 20, 0), ('agregar_arista', 'B', 'C', 5, 7.5, 1),
+                           ('agregar_arista', 'A', 'B', 12, 20, 0), ('agregar_arista', 'D', 'E', 3, 0, 0),
+                           ('agregar_arista', 'C', 'A', 8, 9, 0), ('agregar_arista', 'C', 'B', 6, 7, 2)])
+    assert columnas(grafo) == columnas(esperado)
+    assert grafo.obtener_info_arista('A', 'B') == esperado.obtener_info_arista('A', 'B')
+
+    # La base y el snapshot tienen lo mismo
+    ruta_db = str(tmp_path / 'grafo.db')
+    assert columnas(Grafo.desde_almacen(AlmacenGrafo(ruta_db))) == columnas(grafo)
+    os.remove(ruta_db + '.snapshot')
+    assert descripcion(Grafo.desde_almacen(AlmacenGrafo(ruta_db))) == descripcion(grafo)
+
+
+def test_escrituras_despues_de_la_carga_inicial(tmp_path):
+    ruta_db = str(tmp_path / 'grafo.db')
+    grafo = Grafo(AlmacenGrafo(ruta_db))
+    cargador.cargar(grafo, escribir(tmp_path, 'red.csv', CSV))
+    grafo.agregar_arista('E', 'Nueva', 4, 4, 4)
+    grafo.eliminar_ciudad('B')
+    assert grafo.existe_arista('E', 'Nueva') and not grafo.existe_ciudad('B')
+    assert grafo.estadisticas()["total_rutas"] == 3
+    assert descripcion(Grafo.desde_almacen(AlmacenGrafo(ruta_db))) == descripcion(grafo)
+    with pytest.raises(ValueError):
+        grafo.cargar_aristas([('X', 'Y', 1, 1, 1)])
+
+
+def test_carga_por_bloques_en_un_grafo_con_datos(tmp_path):
+    ruta_db = str(tmp_path / 'grafo.db')
+    grafo = Grafo(AlmacenGrafo(ruta_db))
+    grafo.agregar_arista('A', 'Z', 1, 1, 1)
+    resumen = cargador.cargar(grafo, escribir(tmp_path, 'red.csv', CSV), tamano_bloque=2)
+    # A-B se repite en otro bloque, C-B (igual a B-C) también
+    assert resumen == {"leidas": 6, "repetidas": 2, "omitidas": 3, "lotes": 3}
+    assert grafo.total_aristas() == 5
+    assert grafo.obtener_info_arista('A', 'B')["distancia"] == 12
+    assert grafo.obtener_info_arista('B', 'C')["distancia"] == 6
+    assert descripcion(Grafo.desde_almacen(AlmacenGrafo(ruta_db))) == descripcion(grafo)
+
+
+@pytest.mark.parametrize('por_lineas', [False, True])
+def test_geojson_con_coordenadas(tmp_path, por_lineas):
+    features = [
+        {"type": "Feature", "properties": {"origen": "La Paz", "destino": "Oruro", "tiempo": 180},
+         "geometry": {"type": "LineString", "coordinates": [[-68.15, -16.5], [-67.1, -17.97]]}},
+        {"type": "Feature", "properties": {"from": "Oruro", "to": "Potosí", "distancia": 310},
+         "geometry": {"type": "LineString", "coordinates": [[-67.1, -17.97], [-65.75, -19.58]]}},
+        {"type": "Feature", "properties": {"origen": "Sucre", "destino": "Potosí"},
+         "geometry": {"type": "Point", "coordinates": [-65.26, -19.03]}},
+    ]
+    if por_lineas:
+        contenido = "\n".join(json.dumps(feature) for feature in features)
+    else:
+        contenido = json.dumps({"type": "FeatureCollection", "features": features})
+    grafo = Grafo()
+    resumen = cargador.cargar(grafo, escribir(tmp_path, 'red.geojson', contenido))
+    assert resumen == {"leidas": 2, "repetidas": 0, "omitidas": 1, "lotes": 1}
+    # Sin distancia se calcula de la geometría (unos 195 km)
+    distancia = grafo.obtener_info_arista('La Paz', 'Oruro')["distancia"]
+    assert 190 < distancia < 200
+    assert grafo.obtener_info_arista('Oruro', 'Potosí')["distancia"] == 310
+    assert grafo.coordenadas_ciudad('La Paz') == (-16.5, -68.15)
+    assert grafo.coordenadas_ciudad('Potosí') == (-19.58, -65.75)
+    assert grafo.ciudades_cercanas(-17.9, -67.0, 1)[0][0] == 'Oruro'
+
+
+def test_osm(tmp_path):
+    contenido = "u,v,length,travel_time,toll\n1,2,1500,90,yes\n2,3,250.5,,\n3,4,abc,1,\n"
+    grafo = Grafo()
+    resumen = cargador.cargar(grafo, escribir(tmp_path, 'aristas.csv', contenido), 'osm')
+    assert resumen == {"leidas": 2, "repetidas": 0, "omitidas": 1, "lotes": 1}
+    assert grafo.obtener_ciudades() == ['1', '2', '3']
+    info = grafo.obtener_info_arista('1', '2')
+    assert (info["distancia"], info["tiempo"], info["peaje"]) == (1.5, 1.5, 1)
+    info = grafo.obtener_info_arista('2', '3')
+    assert (info["distancia"], info["tiempo"], info["peaje"]) == (0.251, 0, 0)
+
+
+def test_formato_no_soportado(tmp_path):
+    with pytest.raises(ValueError):
+        cargador.cargar(Grafo(), escribir(tmp_path, 'red.csv', CSV), 'shp')
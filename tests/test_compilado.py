@@ -0,0 +1,82 @@
+import pytest
+
+from grafo import CRITERIOS, INDICES_CRITERIO
+from utilidades import INF, costo_camino, costos, dijkstra_referencia, grafo_aleatorio
+
+
+def verificar_csr(grafo):
+    """Cada fila CSR tiene exactamente las conexiones de la lista de adyacencia"""
+    compilado = grafo.compilado()
+    assert list(compilado.offsets) == sorted(compilado.offsets)
+    assert len(compilado.offsets) == len(compilado.nombres) + 1
+    for nombre, u in compilado.ids.items():
+        assert compilado.nombres[u] == nombre
+        fila = {compilado.nombres[v]: (d, t, p) for v, d, t, p in compilado.vecinos(u)}
+        esperada = {vecino: tuple(conexion[1:4]) for vecino, conexion in grafo.adyacencia[nombre].items()}
+        assert fila == esperada
+        assert compilado.grado(u) == len(esperada)
+    # Los ids de ciudades eliminadas no tienen conexiones
+    for u, nombre in enumerate(compilado.nombres):
+        if nombre is None:
+            assert compilado.grado(u) == 0
+    aristas = list(compilado.aristas())
+    assert len(aristas) == compilado.total_aristas == grafo.total_aristas()
+    assert len({(u, v) for u, v, *_ in aristas}) == len(aristas)
+
+
+@pytest.mark.parametrize('semilla', range(10))
+def test_csr_igual_a_la_adyacencia(semilla):
+    grafo = grafo_aleatorio(semilla)
+    verificar_csr(grafo)
+    grafo.eliminar_ciudad('C3')
+    grafo.agregar_arista('C1', 'C2', 7, 8, 9)
+    grafo.eliminar_arista('C4', 'C5')
+    grafo.agregar_ciudad('Aislada')
+    verificar_csr(grafo)
+    assert grafo.compilado().nombres[grafo.compilado().ids['Aislada']] == 'Aislada'
+
+
+@pytest.mark.parametrize('semilla', range(10))
+def test_dijkstra_sobre_el_csr(semilla):
+    grafo = grafo_aleatorio(semilla, carreteras=12)
+    for criterio in CRITERIOS:
+        ady = costos(grafo, criterio)
+        for origen in ady:
+            esperadas = dijkstra_referencia(ady, origen)
+            for destino in ady:
+                camino, costo = grafo.dijkstra(origen, destino, criterio)
+                assert costo == esperadas.get(destino, INF)
+                if costo < INF:
+                    assert camino[0] == origen and camino[-1] == destino
+                    assert costo_camino(ady, camino) == costo
+                else:
+                    assert camino == []
+    assert grafo.dijkstra('C0', 'No existe') == ([], INF)
+
+
+def test_forma_compilada_inmutable_entre_versiones():
+    grafo = grafo_aleatorio(1)
+    compilado = grafo.compilado()
+    assert grafo.compilado() is compilado
+    destinos, huella = list(compilado.destinos), compilado.huella()
+    grafo.agregar_arista('C0', 'Nueva', 1, 2, 3)
+    nuevo = grafo.compilado()
+    assert nuevo is not compilado and nuevo.version == grafo.version
+    # Quien tenía la forma anterior sigue viendo el grafo anterior
+    assert list(compilado.destinos) == destinos and compilado.huella() == huella
+    assert 'Nueva' not in compilado.ids and 'Nueva' in nuevo.ids
+    assert nuevo.costos[INDICES_CRITERIO['tiempo']][nuevo.offsets[nuevo.ids['Nueva']]] == 2
+
+
+def test_api_data_y_ciudad(aplicacion, cliente):
+    mapa = aplicacion.mapa
+    aristas = cliente.get('/api/data').get_json()
+    assert len(aristas) == mapa.total_aristas()
+    for arista in aristas:
+        info = mapa.obtener_info_arista(arista["from"], arista["to"])
+        assert (arista["distancia"], arista["tiempo"], arista["peaje"]) == (
+            int(info["distancia"]), int(info["tiempo"]), int(info["peaje"]))
+
+    ciudad = cliente.get('/api/ciudad/La Paz').get_json()
+    assert ciudad["conexiones"] == mapa.grado('La Paz') == len(mapa.adyacencia['La Paz'])
+    assert cliente.get('/api/ciudad/No existe').status_code == 404
@@ -0,0 +1,149 @@
+import sys
+import threading
+import time
+
+import pytest
+
+from grafo import Grafo, CRITERIOS
+
+CIUDADES = [f"C{i}" for i in range(12)]
+# El escritor mueve el atajo de C0 de una ciudad a otra en un solo cambio
+MOVER = [
+    [('eliminar_arista', 'C0', 'C6'), ('agregar_arista', 'C0', 'C9', 1, 1, 1)],
+    [('eliminar_arista', 'C0', 'C9'), ('agregar_arista', 'C0', 'C6', 1, 1, 1)],
+]
+# Caminos óptimos a C11 con cada uno de los atajos
+CAMINOS = {
+    51: ['C0', 'C6', 'C7', 'C8', 'C9', 'C10', 'C11'],
+    21: ['C0', 'C9', 'C10', 'C11'],
+}
+
+
+@pytest.fixture(autouse=True)
+def cambios_de_hilo_frecuentes():
+    """Cambia de hilo mucho más seguido, para que los lectores caigan en medio de las escrituras"""
+    intervalo = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(intervalo)
+
+
+def grafo_cadena():
+    """Cadena C0-C1-...-C11 de costo 10 por tramo y un atajo C0-C6 de costo 1"""
+    grafo = Grafo()
+    grafo.aplicar_lote([('agregar_arista', a, b, 10, 10, 10) for a, b in zip(CIUDADES, CIUDADES[1:])]
+                       + [('agregar_arista', 'C0', 'C6', 1, 1, 1)])
+    return grafo
+
+
+def en_hilos(escribir, leer, lectores=4):
+    """Corre `escribir()` mientras varios hilos repiten `leer()`; retorna los errores de los lectores"""
+    detener = threading.Event()
+    errores = []
+
+    def lector():
+        try:
+            while not detener.is_set():
+                leer()
+        except Exception as e:
+            errores.append(e)
+
+    hilos = [threading.Thread(target=lector) for _ in range(lectores)]
+    for hilo in hilos:
+        hilo.start()
+    try:
+        escribir()
+    finally:
+        detener.set()
+        for hilo in hilos:
+            hilo.join()
+    return errores
+
+
+def verificar_forma(compilado):
+    """Una forma compilada publicada tiene uno solo de los atajos y es simétrica"""
+    nombres = compilado.nombres
+    filas = {nombres[u]: {nombres[v]: (d, t, p) for v, d, t, p in compilado.vecinos(u)}
+             for u in range(len(nombres)) if nombres[u] is not None}
+    assert ('C6' in filas['C0']) != ('C9' in filas['C0'])
+    for ciudad, fila in filas.items():
+        for vecino, costo in fila.items():
+            assert filas[vecino][ciudad] == costo
+    assert sum(map(len, filas.values())) == 2 * compilado.total_aristas == 2 * len(CIUDADES)
+
+
+def test_lectores_ven_versiones_completas():
+    grafo = grafo_cadena()
+    local = threading.local()
+    versiones = set()
+
+    def leer():
+        compilado = grafo.compilado()
+        # Cada lector ve las versiones en orden
+        assert compilado.version >= getattr(local, 'version', 0)
+        local.version = compilado.version
+        versiones.add(compilado.version)
+        verificar_forma(compilado)
+        # Nunca un camino por una carretera ya eliminada ni un estado intermedio
+        for criterio in CRITERIOS:
+            camino, costo = grafo.dijkstra('C0', 'C11', criterio)
+            assert CAMINOS[costo] == camino
+        assert {vecino for vecino, *_ in grafo.conexiones('C0')} in ({'C1', 'C6'}, {'C1', 'C9'})
+        assert grafo.total_aristas() == len(CIUDADES)
+
+    def escribir():
+        for paso in range(300):
+            grafo.aplicar_lote(MOVER[paso % 2])
+            # Cede el GIL para que los lectores vean cada versión
+            time.sleep(0.001)
+
+    assert en_hilos(escribir, leer) == []
+    assert len(versiones) > 100
+    verificar_forma(grafo.compilado())
+    assert grafo.dijkstra('C0', 'C11') == (CAMINOS[51], 51)
+
+
+def test_lectores_de_tablas_durante_escrituras():
+    grafo = grafo_cadena()
+
+    def leer():
+        rutas = grafo.todas_las_rutas()
+        costos = {(r["origen"], r["destino"], r["criterio"]): r["costo"] for r in rutas}
+        assert len(costos) == len(rutas) == len(CIUDADES) * (len(CIUDADES) - 1) * len(CRITERIOS)
+        assert costos[('C0', 'C11', 'distancia')] in CAMINOS
+        lote = grafo.rutas_lote([('C0', 'C11', criterio) for criterio in CRITERIOS])
+        assert all(CAMINOS[costo] == camino for camino, costo in lote)
+        assert all(fila[0] in CAMINOS for fila in grafo.matriz(['C0'], ['C11']))
+
+    def escribir():
+        for paso in range(100):
+            grafo.aplicar_lote(MOVER[paso % 2])
+            # Y modificaciones sueltas que no cambian el camino a C11
+            grafo.agregar_ciudad(f"N{paso}")
+            grafo.eliminar_ciudad(f"N{paso}")
+            time.sleep(0.001)
+
+    assert en_hilos(escribir, leer) == []
+
+
+def test_api_durante_escrituras(aplicacion):
+    mapa = aplicacion.mapa
+    origen, destino = 'La Paz', 'Tarija'
+    esperado = mapa.dijkstra(origen, destino)
+
+    def leer():
+        cliente = aplicacion.app.test_client()
+        datos = cliente.get('/api/ruta', query_string={"origen": origen, "destino": destino}).get_json()
+        assert (datos["camino"], datos["costo"]) == esperado
+        assert cliente.get('/api/estadisticas').status_code == 200
+
+    def escribir():
+        cliente = aplicacion.app.test_client()
+        for paso in range(30):
+            ciudad = f"Nueva {paso}"
+            assert cliente.post('/api/ciudades', json={"nombre": ciudad}).status_code == 200
+            assert cliente.post('/api/rutas', json={"origen": ciudad, "destino": origen,
+                                                    "distancia": 1000}).status_code == 200
+            assert cliente.delete('/api/ciudades', json={"nombre": ciudad}).status_code == 200
+
+    assert en_hilos(escribir, leer, lectores=2) == []
@@ -0,0 +1,146 @@
+import heapq
+import random
+
+import pytest
+
+from dinamico import reparar_arbol
+from grafo import CRITERIOS, INDICES_CRITERIO, Grafo
+from utilidades import (INF, costos, dijkstra_referencia, grafo_aleatorio,
+                        operaciones_aleatorias)
+
+
+def arbol_completo(ady, origen):
+    """(dist, prev) en listas, como los árboles de GrafoCompilado"""
+    n = len(ady)
+    dist, prev = [INF] * n, [-1] * n
+    dist[origen] = 0
+    pq = [(0, origen)]
+    while pq:
+        d, u = heapq.heappop(pq)
+        if d > dist[u]:
+            continue
+        for v, costo in ady[u].items():
+            if d + costo < dist[v]:
+                dist[v] = d + costo
+                prev[v] = u
+                heapq.heappush(pq, (d + costo, v))
+    return dist, prev
+
+
+def verificar_arbol(dist, prev, ady, origen):
+    """Las distancias son las mínimas y prev forma un árbol de caminos mínimos"""
+    esperadas = dijkstra_referencia(ady, origen)
+    assert dist == [esperadas.get(v, INF) for v in range(len(dist))]
+    for v in range(len(dist)):
+        if v == origen or dist[v] == INF:
+            continue
+        u = prev[v]
+        assert v in ady[u] and dist[u] + ady[u][v] == dist[v]
+        # Siguiendo prev se llega al origen (sin ciclos entre costos 0)
+        pasos = 0
+        while v != origen:
+            v = prev[v]
+            pasos += 1
+            assert v != -1 and pasos < len(dist)
+
+
+@pytest.mark.parametrize('semilla', range(40))
+def test_reparar_igual_a_recalcular(semilla):
+    azar = random.Random(semilla)
+    n = 12
+    ady = [{} for _ in range(n)]
+    for _ in range(18):
+        u, v = azar.sample(range(n), 2)
+        ady[u][v] = ady[v][u] = azar.randint(0, 10)
+    origen = azar.randrange(n)
+    dist, prev = arbol_completo(ady, origen)
+
+    for _ in range(30):
+        # Un lote de cambios sobre carreteras distintas: altas, bajas y
+        # cambios de costo en las dos direcciones
+        cambios = []
+        for u, v in {tuple(sorted(azar.sample(range(n), 2))) for _ in range(azar.randint(1, 4))}:
+            anterior = ady[u].get(v, INF)
+            nuevo = azar.choice([INF, azar.randint(0, 10)])
+            if nuevo == INF:
+                ady[u].pop(v, None)
+                ady[v].pop(u, None)
+            else:
+                ady[u][v] = ady[v][u] = nuevo
+            cambios.append((u, v, anterior, nuevo))
+        reparar_arbol(dist, prev, cambios, lambda u: ady[u].items())
+        verificar_arbol(dist, prev, ady, origen)
+
+
+def operacion_aleatoria(azar, grafo):
+    ciudades = sorted(grafo.adyacencia)
+    tipo = azar.choice(['alta', 'costo', 'costo', 'baja', 'baja', 'ciudad', 'quitar_ciudad'])
+    if tipo == 'baja':
+        aristas = [(a, b) for a in ciudades for b in grafo.adyacencia[a] if a < b]
+        if aristas:
+            return ('eliminar_arista', *azar.choice(aristas))
+    if tipo == 'costo':
+        aristas = [(a, b) for a in ciudades for b in grafo.adyacencia[a] if a < b]
+        if aristas:
+            return ('agregar_arista', *azar.choice(aristas),
+                    azar.randint(0, 20), azar.randint(0, 20), azar.randint(0, 20))
+    if tipo == 'ciudad':
+        return ('agregar_ciudad', f"N{azar.randrange(1000)}")
+    if tipo == 'quitar_ciudad' and len(ciudades) > 4:
+        return ('eliminar_ciudad', azar.choice(ciudades))
+    ciudad1, ciudad2 = azar.sample(ciudades, 2)
+    return ('agregar_arista', ciudad1, ciudad2,
+            azar.randint(0, 20), azar.randint(0, 20), azar.randint(0, 20))
+
+
+@pytest.mark.parametrize('semilla', range(20))
+def test_arboles_reparados_del_grafo(semilla):
+    azar = random.Random(semilla)
+    grafo = grafo_aleatorio(semilla, ciudades=10, carreteras=18)
+    for _ in range(40):
+        # Árboles en caché desde algunos orígenes, que los cambios reparan
+        for ciudad in azar.sample(sorted(grafo.adyacencia), 2):
+            grafo.dijkstra_desde(ciudad, azar.choice(CRITERIOS))
+
+        operaciones = [operacion_aleatoria(azar, grafo) for _ in range(azar.randint(1, 3))]
+        if len(operaciones) == 1:
+            getattr(grafo, operaciones[0][0])(*operaciones[0][1:])
+        else:
+            grafo.aplicar_lote(operaciones)
+
+        compilado = grafo.compilado()
+        arboles = compilado.arboles.items()
+        assert arboles
+        for criterio in CRITERIOS:
+            ady = costos(grafo, criterio)
+            ady_ids = [{} for _ in compilado.nombres]
+            for ciudad, vecinos in ady.items():
+                ady_ids[compilado.ids[ciudad]] = {compilado.ids[v]: c for v, c in vecinos.items()}
+            for (origen, idx), (dist, prev) in arboles:
+                if idx == INDICES_CRITERIO[criterio]:
+                    verificar_arbol(dist, prev, ady_ids, origen)
+
+
+def columnas_csr(compilado):
+    return (compilado.nombres, compilado.ids, compilado.tipos, list(compilado.offsets),
+            list(compilado.destinos), [list(columna) for columna in compilado.costos[1:]])
+
+
+@pytest.mark.parametrize('semilla', range(20))
+def test_compilacion_incremental_igual_a_completa(semilla):
+    azar = random.Random(semilla)
+    historial = operaciones_aleatorias(semilla, ciudades=20, carreteras=30)
+    grafo = Grafo()
+    grafo.aplicar_lote(historial)
+    for _ in range(40):
+        operaciones = [operacion_aleatoria(azar, grafo) for _ in range(azar.randint(1, 3))]
+        if len(operaciones) == 1:
+            getattr(grafo, operaciones[0][0])(*operaciones[0][1:])
+        else:
+            grafo.aplicar_lote(operaciones)
+        historial.extend(operaciones)
+
+        # Mismas operaciones sobre un grafo que compila todo de una vez
+        completo = Grafo()
+        completo.aplicar_lote(historial)
+        assert columnas_csr(grafo.compilado()) == columnas_csr(completo.compilado())
@@ -0,0 +1,170 @@
+import random
+
+import pytest
+
+from espacial import IndiceEspacial, caja_circulo, distancia_km, leer_caja
+from grafo import Grafo
+from utilidades import grafo_aleatorio
+
+
+def puntos_aleatorios(semilla, cantidad=300):
+    """Puntos en Bolivia, cerca de los polos y del antimeridiano, y en bordes de celdas"""
+    azar = random.Random(semilla)
+    zonas = [((-22.9, -9.7), (-69.6, -57.5)), ((89.0, 90.0), (-180.0, 180.0)),
+             ((-90.0, -89.0), (-180.0, 180.0)), ((-10.0, 10.0), (179.0, 180.0)),
+             ((-10.0, 10.0), (-180.0, -179.0)), ((-90.0, 90.0), (-180.0, 180.0))]
+    puntos = {}
+    for i in range(cantidad):
+        (lat_min, lat_max), (lon_min, lon_max) = azar.choice(zonas)
+        lat, lon = azar.uniform(lat_min, lat_max), azar.uniform(lon_min, lon_max)
+        if i % 10 == 0:
+            lat, lon = round(lat, 1), round(lon, 1)
+        puntos[f"P{i}"] = (lat, lon)
+    return puntos
+
+
+def en_caja_fuerza_bruta(puntos, lat_min, lon_min, lat_max, lon_max):
+    def adentro(lat, lon):
+        if lon_min <= lon_max:
+            return lat_min <= lat <= lat_max and lon_min <= lon <= lon_max
+        return lat_min <= lat <= lat_max and (lon >= lon_min or lon <= lon_max)
+    return {clave for clave, punto in puntos.items() if adentro(*punto)}
+
+
+def verificar_cercanas(cercanas, puntos, lat, lon, k, radio_km=None):
+    """Las distancias son las k menores; con empates cualquiera de las empatadas sirve"""
+    distancias = sorted(distancia_km(lat, lon, *punto) for punto in puntos.values())
+    if radio_km is not None:
+        distancias = [d for d in distancias if d <= radio_km]
+    assert [d for d, _ in cercanas] == distancias[:k]
+    assert all(distancia_km(lat, lon, *puntos[clave]) == d for d, clave in cercanas)
+    assert len({clave for _, clave in cercanas}) == len(cercanas)
+
+
+def cajas_aleatorias(azar, puntos, cantidad=60):
+    """Cajas al azar, algunas con bordes sobre puntos y otras cruzando el antimeridiano"""
+    for _ in range(cantidad):
+        if azar.random() < 0.3:
+            (lat1, lon1), (lat2, lon2) = azar.sample(list(puntos.values()), 2)
+        else:
+            lat1, lat2 = azar.uniform(-90, 90), azar.uniform(-90, 90)
+            lon1, lon2 = azar.uniform(-180, 180), azar.uniform(-180, 180)
+        yield min(lat1, lat2), lon1, max(lat1, lat2), lon2
+
+
+@pytest.mark.parametrize('semilla', range(5))
+def test_en_caja_igual_a_fuerza_bruta(semilla):
+    azar = random.Random(semilla)
+    puntos = puntos_aleatorios(semilla)
+    indice = IndiceEspacial.desde_puntos(puntos)
+    for caja in list(cajas_aleatorias(azar, puntos)) + [(-90, -180, 90, 180), (-17, -66, -17, -66)]:
+        assert set(indice.en_caja(*caja)) == en_caja_fuerza_bruta(puntos, *caja), caja
+
+
+@pytest.mark.parametrize('semilla', range(5))
+def test_cercanas_igual_a_fuerza_bruta(semilla):
+    azar = random.Random(semilla)
+    puntos = puntos_aleatorios(semilla)
+    indice = IndiceEspacial.desde_puntos(puntos)
+    # Se mueven y quitan algunas, como al editar el grafo
+    for clave in azar.sample(sorted(puntos), 40):
+        if azar.random() < 0.5:
+            indice.quitar(clave)
+            del puntos[clave]
+        else:
+            puntos[clave] = (azar.uniform(-90, 90), azar.uniform(-180, 180))
+            indice.ubicar(clave, *puntos[clave])
+    consultas = list(puntos_aleatorios(semilla + 100, 40).values()) + [(90, 0), (-90, 180), (0, -180)]
+    for lat, lon in consultas:
+        for k in (1, 5, 30, len(puntos) + 5):
+            verificar_cercanas(indice.cercanas(lat, lon, k), puntos, lat, lon, k)
+        radio_km = azar.uniform(0, 3000)
+        verificar_cercanas(indice.cercanas(lat, lon, 10, radio_km), puntos, lat, lon, 10, radio_km)
+    assert IndiceEspacial().cercanas(0, 0, 3) == [] and indice.cercanas(0, 0, 0) == []
+
+
+@pytest.mark.parametrize('semilla', range(3))
+def test_caja_circulo_contiene_el_circulo(semilla):
+    azar = random.Random(semilla)
+    for lat, lon in puntos_aleatorios(semilla, 100).values():
+        radio_km = azar.choice([1, 50, 500, 5000])
+        caja = caja_circulo(lat, lon, radio_km)
+        puntos = puntos_aleatorios(semilla + 1, 300)
+        cerca = {clave for clave, punto in puntos.items() if distancia_km(lat, lon, *punto) <= radio_km}
+        assert cerca <= en_caja_fuerza_bruta(puntos, *caja)
+
+
+def test_leer_caja():
+    assert leer_caja('-69.6,-22.9,-57.5,-9.7') == (-22.9, -69.6, -9.7, -57.5)
+    assert leer_caja('170,-10,-170,10') == (-10, 170, 10, -170)
+    for texto in ('1,2,3', 'a,b,c,d', '0,10,1,5', '0,-91,1,0', '-181,0,0,1'):
+        with pytest.raises(ValueError):
+            leer_caja(texto)
+
+
+def test_grafo_espacial_igual_a_fuerza_bruta():
+    azar = random.Random(3)
+    grafo = grafo_aleatorio(3, ciudades=40, carreteras=80)
+    for ciudad in grafo.obtener_ciudades()[:30]:
+        grafo.ubicar_ciudad(ciudad, azar.uniform(-22.9, -9.7), azar.uniform(-69.6, -57.5))
+    grafo.ubicar_ciudad('C1', None, None)
+    grafo.eliminar_ciudad('C2')
+    grafo.ubicar_ciudad('Nueva', -16.5, -68.1)
+    puntos = {c["nombre"]: (c["lat"], c["lon"]) for c in grafo.obtener_ciudades_detalladas() if "lat" in c}
+    assert 'C1' not in puntos and 'C2' not in puntos and len(puntos) == 29
+
+    for lat, lon in list(puntos_aleatorios(4, 20).values()):
+        cercanas = grafo.ciudades_cercanas(lat, lon, 5)
+        verificar_cercanas([(d, ciudad) for ciudad, d in cercanas], puntos, lat, lon, 5)
+
+    for caja in cajas_aleatorias(azar, puntos, 30):
+        dentro = en_caja_fuerza_bruta(puntos, *caja)
+        assert {nombre for _, nombre, _ in grafo.filtrar_ciudades(caja=caja)} == dentro
+        aristas = {(c1, c2) for _, c1, c2, *_ in grafo.filtrar_aristas(caja=caja)}
+        assert aristas == {(c1, c2) for c1, c2, *_ in grafo.aristas() if c1 in dentro or c2 in dentro}
+
+    lats, lons = zip(*puntos.values())
+    assert grafo.extension() == (min(lats), min(lons), max(lats), max(lons))
+
+
+def test_api_cercanas(aplicacion, cliente):
+    mapa = aplicacion.mapa
+    datos = cliente.get('/api/ciudades/cercanas', query_string={"lat": -17.0, "lon": -66.0, "k": 3}).get_json()
+    assert [c["nombre"] for c in datos] == [ciudad for ciudad, _ in mapa.ciudades_cercanas(-17.0, -66.0, 3)]
+    assert [c["distancia_km"] for c in datos] == sorted(c["distancia_km"] for c in datos)
+    assert all((c["lat"], c["lon"]) == mapa.coordenadas_ciudad(c["nombre"]) for c in datos)
+    assert cliente.get('/api/ciudades/cercanas', query_string={
+        "lat": -17.0, "lon": -66.0, "k": 3, "radio_km": 1}).get_json() == []
+    for consulta in ({"lat": -17.0}, {"lat": 91, "lon": 0}, {"lat": 0, "lon": 0, "k": 0},
+                     {"lat": 0, "lon": 0, "radio_km": "x"}, {"lat": 0, "lon": 0, "radio_km": -1}):
+        assert cliente.get('/api/ciudades/cercanas', query_string=consulta).status_code == 400
+
+    caja = cliente.get('/api/ciudades/extension').get_json()
+    assert tuple(caja[clave] for clave in ('lat_min', 'lon_min', 'lat_max', 'lon_max')) == mapa.extension()
+    mapa.limpiar()
+    assert cliente.get('/api/ciudades/extension').get_json() is None
+
+
+def test_mapa_incluye_ciudades_sin_coordenadas(cliente):
+    # Como desde el formulario de la página: ciudades sin lat ni lon
+    for nombre in ('X', 'Y', 'Z'):
+        assert cliente.post('/api/ciudades', json={"nombre": nombre}).status_code == 200
+    assert cliente.post('/api/rutas', json={"origen": "X", "destino": "Y", "distancia": 10}).status_code == 200
+    assert cliente.post('/api/rutas', json={"origen": "La Paz", "destino": "X", "distancia": 20}).status_code == 200
+
+    mundo = '-180,-90,180,90'
+    todas = {arista["id"] for arista in cliente.get('/api/data').get_json()}
+    en_caja = cliente.get(f'/api/data?bbox={mundo}').get_json()
+    sin_coordenadas = cliente.get('/api/data?sin_coordenadas=1').get_json()
+    # Lo que dibuja el mapa (la caja más lo que no tiene coordenadas) es todo el grafo
+    assert {a["id"] for a in en_caja} | {a["id"] for a in sin_coordenadas} == todas
+    assert {a["id"] for a in sin_coordenadas} == {"X-Y", "La Paz-X"}
+    coordenadas = {a["id"]: a["coordenadas"] for a in sin_coordenadas}
+    assert coordenadas["X-Y"] == [None, None]
+    assert coordenadas["La Paz-X"][0] is not None and coordenadas["La Paz-X"][1] is None
+
+    ciudades = {c["nombre"] for c in cliente.get('/api/ciudades').get_json()}
+    ubicadas = {c["nombre"] for c in cliente.get(f'/api/ciudades?bbox={mundo}').get_json()}
+    sin_ubicar = {c["nombre"] for c in cliente.get('/api/ciudades?sin_coordenadas=1').get_json()}
+    assert sin_ubicar == {'X', 'Y', 'Z'}
+    assert ubicadas | sin_ubicar == ciudades and not ubicadas & sin_ubicar
@@ -0,0 +1,95 @@
+import math
+import random
+
+import pytest
+
+from estadisticas import AgregadoCriterio, EstadisticasGrafo, SketchCuantiles
+from grafo import CRITERIOS, Grafo
+from utilidades import modificar_al_azar
+
+
+def recalcular(grafo):
+    """Los mismos agregados recorriendo todas las carreteras del grafo"""
+    aristas = list(grafo.aristas())
+    grados = {ciudad: len(grafo.conexiones(ciudad)) for ciudad in grafo.obtener_ciudades()}
+    criterios = {}
+    for i, criterio in enumerate(CRITERIOS):
+        valores = sorted(arista[2 + i] for arista in aristas if arista[2 + i] != math.inf)
+        criterios[criterio] = valores
+    return len(aristas), grados, criterios
+
+
+def verificar(grafo):
+    resumen = grafo.estadisticas()
+    total_aristas, grados, criterios = recalcular(grafo)
+    assert resumen["total_ciudades"] == len(grados)
+    assert resumen["total_rutas"] == total_aristas
+    assert resumen["grado"]["maximo"] == max(grados.values(), default=0)
+    assert resumen["grado"]["ciudades_aisladas"] == sum(1 for g in grados.values() if g == 0)
+    for criterio, valores in criterios.items():
+        agregado = resumen["criterios"][criterio]
+        assert agregado["cantidad"] == len(valores)
+        assert agregado["suma"] == pytest.approx(sum(valores))
+        assert agregado["minimo"] == (valores[0] if valores else None)
+        assert agregado["maximo"] == (valores[-1] if valores else None)
+        for q in (50, 90, 99):
+            if not valores:
+                assert agregado[f"p{q}"] is None
+                continue
+            exacto = valores[int(q / 100 * (len(valores) - 1))]
+            assert abs(agregado[f"p{q}"] - exacto) <= 0.01 * exacto + 0.01
+    return resumen
+
+
+@pytest.mark.parametrize('semilla', range(10))
+def test_agregados_incrementales_igual_a_recalcular(semilla):
+    azar = random.Random(semilla)
+    grafo = Grafo()
+    modificar_al_azar(grafo, semilla, pasos=10)
+    for ronda in range(15):
+        modificar_al_azar(grafo, semilla * 100 + ronda, pasos=5)
+        # Una ciudad con muchas conexiones que después pierde, para el grado máximo
+        if ronda % 5 == 0:
+            for ciudad in azar.sample(grafo.obtener_ciudades(), 6):
+                grafo.agregar_arista('Centro', ciudad, azar.randint(0, 30), 1, 0)
+        elif ronda % 5 == 2:
+            grafo.eliminar_ciudad('Centro')
+        resumen = verificar(grafo)
+        # Y lo mismo que armarlos de una vez
+        completo = EstadisticasGrafo.desde_aristas(
+            CRITERIOS, grafo.obtener_ciudades(),
+            ((c1, c2, d, t, p) for c1, c2, d, t, p in grafo.aristas()))
+        assert resumen == completo.resumen()
+
+
+def test_minimo_y_maximo_al_quitar():
+    azar = random.Random(3)
+    agregado = AgregadoCriterio()
+    valores = []
+    for _ in range(3000):
+        if valores and azar.random() < 0.5:
+            valor = valores.pop(azar.randrange(len(valores)))
+            agregado.quitar(valor)
+        else:
+            valor = azar.choice([azar.randint(0, 40), azar.uniform(0, 40)])
+            valores.append(valor)
+            agregado.agregar(valor)
+        assert agregado._minimo == (min(valores) if valores else None)
+        assert agregado._maximo == (max(valores) if valores else None)
+    # Las entradas viejas de los montículos no crecen sin límite
+    assert len(agregado._minimos) <= 2 * len(agregado._valores) + 16
+
+
+def test_cuantiles_en_una_pasada():
+    azar = random.Random(4)
+    sketch = SketchCuantiles()
+    valores = [0] * 30 + [azar.expovariate(0.01) for _ in range(1000)]
+    for valor in valores:
+        sketch.agregar(valor)
+    qs = [0, 0.01, 0.5, 0.9, 0.99, 1]
+    assert sketch.cuantiles(qs) == [sketch.cuantil(q) for q in qs]
+    valores.sort()
+    for q, estimado in zip(qs, sketch.cuantiles(qs)):
+        exacto = valores[int(q * (len(valores) - 1))]
+        assert abs(estimado - exacto) <= 0.01 * exacto
+    assert SketchCuantiles().cuantiles([0.5, 0.9]) == [None, None]
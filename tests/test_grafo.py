@@ -0,0 +1,98 @@
+import random
+
+import pytest
+
+from grafo import Grafo
+
+
+def verificar_modelo(grafo, modelo):
+    """Las consultas de aristas del grafo coinciden con un dict de pares no dirigidos"""
+    ciudades = set(grafo.obtener_ciudades())
+    for ciudad in ciudades:
+        esperados = {otra for par in modelo if ciudad in par for otra in par if otra != ciudad}
+        assert set(grafo.adyacencia[ciudad]) == esperados
+        assert grafo.grado(ciudad) == len(esperados)
+        assert {vecino for vecino, *_ in grafo.conexiones(ciudad)} == esperados
+    for ciudad1 in ciudades:
+        for ciudad2 in ciudades:
+            costos = modelo.get(frozenset((ciudad1, ciudad2)))
+            assert grafo.existe_arista(ciudad1, ciudad2) == (costos is not None)
+            info = grafo.obtener_info_arista(ciudad1, ciudad2)
+            if costos is None:
+                assert info is None
+            else:
+                assert (info['distancia'], info['tiempo'], info['peaje']) == costos
+    assert grafo.total_aristas() == len(modelo) == len(list(grafo.aristas()))
+
+
+@pytest.mark.parametrize('semilla', range(10))
+def test_aristas_igual_a_modelo(semilla):
+    azar = random.Random(semilla)
+    grafo = Grafo()
+    modelo = {}
+    for paso in range(150):
+        nombres = [f"C{i}" for i in range(8)]
+        ciudad1, ciudad2 = azar.sample(nombres, 2)
+        tipo = azar.random()
+        if tipo < 0.55:
+            costos = (azar.randint(1, 50), azar.randint(1, 50), azar.randint(0, 10))
+            grafo.agregar_arista(ciudad1, ciudad2, *costos)
+            modelo[frozenset((ciudad1, ciudad2))] = costos
+        elif tipo < 0.9:
+            # En cualquiera de los dos sentidos, exista o no
+            grafo.eliminar_arista(ciudad1, ciudad2)
+            modelo.pop(frozenset((ciudad1, ciudad2)), None)
+        else:
+            grafo.eliminar_ciudad(ciudad1)
+            modelo = {par: costos for par, costos in modelo.items() if ciudad1 not in par}
+        if paso % 10 == 0:
+            verificar_modelo(grafo, modelo)
+    verificar_modelo(grafo, modelo)
+
+
+def test_actualizar_arista_no_la_duplica():
+    grafo = Grafo()
+    grafo.agregar_arista('A', 'B', 1, 2, 3)
+    grafo.agregar_arista('B', 'A', 4, 5, 6)
+    assert grafo.total_aristas() == 1
+    assert list(grafo.adyacencia['A']) == ['B'] and list(grafo.adyacencia['B']) == ['A']
+    assert grafo.obtener_info_arista('A', 'B') == grafo.obtener_info_arista('B', 'A') == {
+        'distancia': 4, 'tiempo': 5, 'peaje': 6}
+
+
+def test_eliminar_ciudad_la_quita_de_sus_vecinos():
+    grafo = Grafo()
+    for vecino in ['B', 'C', 'D']:
+        grafo.agregar_arista('A', vecino, 1, 1, 1)
+    grafo.agregar_arista('B', 'C', 1, 1, 1)
+    grafo.eliminar_ciudad('A')
+    assert not grafo.existe_ciudad('A')
+    assert grafo.adyacencia == {'B': {'C': grafo.adyacencia['B']['C']},
+                                'C': {'B': grafo.adyacencia['C']['B']}, 'D': {}}
+    assert not grafo.existe_arista('B', 'A') and grafo.obtener_info_arista('A', 'B') is None
+    assert grafo.total_aristas() == 1
+    # Eliminar algo que no existe no cambia la versión
+    version = grafo.version
+    grafo.eliminar_arista('B', 'D')
+    grafo.eliminar_ciudad('A')
+    assert grafo.version == version
+
+
+def test_api_rutas_existentes(aplicacion, cliente):
+    mapa = aplicacion.mapa
+    origen, destino = next((c1, c2) for c1, c2, *_ in mapa.aristas())
+    total = mapa.total_aristas()
+    nueva = {"origen": destino, "destino": origen, "distancia": 1}
+    # Repetida en el otro sentido
+    assert cliente.post('/api/rutas', json=nueva).status_code == 400
+    assert cliente.delete('/api/rutas', json=nueva).status_code == 200
+    assert not mapa.existe_arista(origen, destino) and mapa.total_aristas() == total - 1
+    assert cliente.delete('/api/rutas', json=nueva).status_code == 400
+    assert cliente.post('/api/rutas', json=nueva).status_code == 200
+    assert mapa.obtener_info_arista(origen, destino)['distancia'] == 1
+
+    datos = cliente.post('/api/eliminar-carretera', json={"origen": origen, "destino": destino}).get_json()
+    assert datos["carretera_eliminada"] == {"distancia": 1, "tiempo": 0, "peaje": 0}
+    assert datos["total_rutas_restantes"] == total - 1
+    assert cliente.post('/api/eliminar-carretera',
+                        json={"origen": origen, "destino": destino}).status_code == 400
@@ -0,0 +1,81 @@
+import pytest
+
+from grafo import CRITERIOS, INDICES_CRITERIO
+from jerarquia import JerarquiaContraccion
+from utilidades import INF, costo_camino, costos, dijkstra_referencia, grafo_aleatorio
+
+
+def comparar(jerarquia, compilado, ady):
+    nombres = compilado.nombres
+    for origen, origen_id in compilado.ids.items():
+        esperadas = dijkstra_referencia(ady, origen)
+        for destino, destino_id in compilado.ids.items():
+            costo, camino = jerarquia.consultar(origen_id, destino_id)
+            assert costo == esperadas.get(destino, INF), (origen, destino)
+            if costo < INF:
+                camino = [nombres[nodo] for nodo in camino]
+                assert camino[0] == origen and camino[-1] == destino
+                assert costo_camino(ady, camino) == costo
+
+
+@pytest.mark.parametrize('semilla', range(20))
+@pytest.mark.parametrize('limite_testigos', [200, 1])
+def test_consultas_iguales_a_dijkstra(semilla, limite_testigos):
+    # Con limite_testigos=1 casi todas las búsquedas testigo se cortan y se
+    # agregan atajos de más: los costos tienen que seguir siendo exactos
+    grafo = grafo_aleatorio(semilla, ciudades=12, carreteras=10 + semilla)
+    compilado = grafo.compilado()
+    for criterio in CRITERIOS:
+        jerarquia = JerarquiaContraccion.construir(compilado, INDICES_CRITERIO[criterio],
+                                                   limite_testigos)
+        comparar(jerarquia, compilado, costos(grafo, criterio))
+
+
+@pytest.mark.parametrize('semilla', range(5))
+def test_jerarquia_guardada_responde_igual(semilla):
+    grafo = grafo_aleatorio(semilla)
+    compilado = grafo.compilado()
+    jerarquia = JerarquiaContraccion.construir(compilado, INDICES_CRITERIO['tiempo'])
+    copia = JerarquiaContraccion.desde_dict(jerarquia.a_dict())
+    comparar(copia, compilado, costos(grafo, 'tiempo'))
+
+
+@pytest.mark.parametrize('semilla', range(5))
+def test_metodo_ch_del_grafo(semilla):
+    grafo = grafo_aleatorio(semilla)
+    grafo.construir_jerarquias()
+    # Después de modificar el grafo la jerarquía deja de estar vigente y
+    # 'ch' tiene que volver a la búsqueda clásica
+    for modificar in (False, True):
+        if modificar:
+            grafo.agregar_arista('C0', 'C1', 1, 1, 1)
+        for criterio in CRITERIOS:
+            ady = costos(grafo, criterio)
+            for origen in ady:
+                esperadas = dijkstra_referencia(ady, origen)
+                for destino in ady:
+                    camino, costo = grafo.dijkstra(origen, destino, criterio, metodo='ch')
+                    assert costo == esperadas.get(destino, INF)
+                    if camino:
+                        assert costo_camino(ady, camino) == costo
+
+
+@pytest.mark.parametrize('metodo', ['ch', 'dijkstra', 'bidireccional', 'astar'])
+def test_api_metodos_validos(cliente, metodo):
+    respuesta = cliente.get('/api/ruta', query_string={'origen': 'La Paz', 'destino': 'Tarija',
+                                                       'metodo': metodo})
+    assert respuesta.status_code == 200
+    assert respuesta.get_json()["camino"][0] == 'La Paz'
+    respuesta = cliente.post('/ruta', data={'origen': 'La Paz', 'destino': 'Tarija', 'metodo': metodo})
+    assert respuesta.status_code == 200
+
+
+@pytest.mark.parametrize('consulta', [{'metodo': 'xyz'}, {'metodo': ''}, {'criterio': 'altura'}])
+def test_api_metodo_no_valido(aplicacion, cliente, consulta):
+    datos = {'origen': 'La Paz', 'destino': 'Tarija', **consulta}
+    respuesta = cliente.get('/api/ruta', query_string=datos)
+    assert respuesta.status_code == 400
+    assert 'error' in respuesta.get_json()
+    assert cliente.post('/ruta', data=datos).status_code == 400
+    # Nada de eso ocupa lugar en la caché de rutas
+    assert aplicacion.cache_rutas.estadisticas()["entradas"] == 0
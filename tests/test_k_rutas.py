@@ -0,0 +1,30 @@
+import pytest
+
+from grafo import CRITERIOS
+from utilidades import caminos_simples, costo_camino, costos, grafo_aleatorio
+
+
+@pytest.mark.parametrize('semilla', range(25))
+@pytest.mark.parametrize('k', [1, 3, 10])
+def test_k_rutas_iguales_a_la_enumeracion(semilla, k):
+    grafo = grafo_aleatorio(semilla, ciudades=8, carreteras=8 + semilla % 10, costo_max=10)
+    ciudades = sorted(grafo.adyacencia)
+    for criterio in CRITERIOS:
+        ady = costos(grafo, criterio)
+        for origen in ciudades:
+            for destino in ciudades:
+                if origen == destino:
+                    continue
+                esperados = sorted(costo_camino(ady, camino)
+                                   for camino in caminos_simples(ady, origen, destino))[:k]
+
+                rutas = grafo.rutas_alternativas(origen, destino, k, criterio)
+                assert [ruta["costo"] for ruta in rutas] == esperados, (origen, destino, criterio)
+                caminos = [tuple(ruta["camino"]) for ruta in rutas]
+                assert len(set(caminos)) == len(caminos)
+                for ruta in rutas:
+                    camino = ruta["camino"]
+                    assert camino[0] == origen and camino[-1] == destino
+                    assert len(set(camino)) == len(camino)
+                    assert costo_camino(ady, camino) == ruta["costo"]
+                    assert ruta[criterio] == ruta["costo"]
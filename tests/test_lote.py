@@ -0,0 +1,94 @@
+import random
+
+import pytest
+
+import backend_numpy
+from grafo import CRITERIOS
+from utilidades import INF, costo_camino, costos, dijkstra_referencia, grafo_aleatorio
+
+
+@pytest.fixture(autouse=True)
+def sin_numpy(monkeypatch):
+    """Los árboles en Python; el backend NumPy se compara aparte"""
+    monkeypatch.setattr(backend_numpy, 'disponible', False)
+
+
+@pytest.mark.parametrize('semilla', range(10))
+def test_rutas_lote_igual_a_dijkstra(semilla):
+    azar = random.Random(semilla)
+    grafo = grafo_aleatorio(semilla, carreteras=12)
+    ciudades = grafo.obtener_ciudades() + ['No existe']
+    # Orígenes repetidos con distintos criterios, en desorden
+    pares = [(azar.choice(ciudades), azar.choice(ciudades), azar.choice(CRITERIOS)) for _ in range(60)]
+    resultados = grafo.rutas_lote(pares)
+    assert len(resultados) == len(pares)
+    for (origen, destino, criterio), (camino, costo) in zip(pares, resultados):
+        ady = costos(grafo, criterio)
+        esperado = dijkstra_referencia(ady, origen).get(destino, INF) if origen in ady else INF
+        assert costo == esperado
+        if costo < INF:
+            assert camino[0] == origen and camino[-1] == destino
+            assert costo_camino(ady, camino) == costo
+        else:
+            assert camino == []
+    # Los árboles del lote no ocupan la caché de las consultas frecuentes
+    assert len(grafo.compilado().arboles) == 0
+
+
+@pytest.mark.parametrize('semilla', range(5))
+def test_matriz_igual_a_dijkstra(semilla):
+    grafo = grafo_aleatorio(semilla, carreteras=12)
+    ciudades = grafo.obtener_ciudades()
+    origenes = ciudades[:5] + ['No existe', ciudades[0]]
+    destinos = ['No existe'] + ciudades
+    for criterio in CRITERIOS:
+        ady = costos(grafo, criterio)
+        filas = grafo.matriz(origenes, destinos, criterio)
+        assert len(filas) == len(origenes)
+        for origen, fila in zip(origenes, filas):
+            esperadas = dijkstra_referencia(ady, origen) if origen in ady else {}
+            assert fila == [esperadas.get(destino, INF) for destino in destinos]
+
+
+def test_api_rutas_lote(aplicacion, cliente):
+    pares = [{"origen": "La Paz", "destino": "Tarija"},
+             {"origen": "La Paz", "destino": "Beni", "criterio": "tiempo"},
+             {"origen": "Pando", "destino": "No existe"}]
+    datos = cliente.post('/api/rutas/lote', json={"pares": pares, "criterio": "peaje"}).get_json()
+    assert datos["total_rutas"] == 3
+    for par, ruta in zip(pares, datos["rutas"]):
+        criterio = par.get("criterio", "peaje")
+        assert ruta["criterio"] == criterio
+        camino, costo = aplicacion.mapa.dijkstra(par["origen"], par["destino"], criterio)
+        assert ruta["costo"] == (costo if camino else None)
+    assert "error" in datos["rutas"][2] and datos["rutas"][2]["camino"] == []
+
+
+@pytest.mark.parametrize('cuerpo', [
+    {}, {"pares": []}, {"pares": "La Paz"}, {"pares": [["La Paz", "Oruro"]]},
+    {"pares": [{"origen": "La Paz"}]}, {"pares": [{"origen": "La Paz", "destino": "Oruro", "criterio": "x"}]},
+])
+def test_api_rutas_lote_no_valido(cliente, cuerpo):
+    assert cliente.post('/api/rutas/lote', json=cuerpo).status_code == 400
+
+
+def test_api_rutas_lote_limite(aplicacion, cliente):
+    pares = [{"origen": "La Paz", "destino": "Oruro"}] * (aplicacion.MAX_PARES_LOTE + 1)
+    assert cliente.post('/api/rutas/lote', json={"pares": pares}).status_code == 400
+
+
+def test_api_matriz(aplicacion, cliente):
+    aplicacion.mapa.agregar_ciudad('Aislada')
+    origenes = ["La Paz", "Oruro", "Aislada"]
+    datos = cliente.post('/api/matriz', json={"origenes": origenes, "criterios": "tiempo"}).get_json()
+    assert list(datos["matrices"]) == ["tiempo"]
+    assert datos["destinos"] == origenes
+    for origen, fila in zip(origenes, datos["matrices"]["tiempo"]):
+        for destino, costo in zip(origenes, fila):
+            esperado = aplicacion.mapa.dijkstra(origen, destino, 'tiempo')[1]
+            assert costo == (None if esperado == INF else esperado)
+
+    assert cliente.post('/api/matriz', json={"origenes": []}).status_code == 400
+    assert cliente.post('/api/matriz', json={"origenes": origenes, "criterios": ["x"]}).status_code == 400
+    muchas = ["La Paz"] * 501
+    assert cliente.post('/api/matriz', json={"origenes": muchas}).status_code == 400
@@ -0,0 +1,117 @@
+import re
+import time
+
+import pytest
+
+import metricas
+from grafo import Grafo
+
+# nombre{etiquetas} valor
+MUESTRA = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{.*\})? (\S+)$')
+ETIQUETA = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+
+def leer_exposicion(texto):
+    """Valida el formato de texto de Prometheus; retorna ({nombre: tipo}, {(nombre, etiquetas): valor})"""
+    assert texto.endswith('\n')
+    tipos = {}
+    valores = {}
+    for linea in texto.splitlines():
+        if linea.startswith('# HELP '):
+            continue
+        if linea.startswith('# TYPE '):
+            _, _, nombre, tipo = linea.split(' ')
+            assert nombre not in tipos and tipo in ('counter', 'gauge', 'histogram')
+            tipos[nombre] = tipo
+            continue
+        nombre, etiquetas, valor = MUESTRA.match(linea).groups()
+        base = re.sub(r'_(bucket|sum|count)$', '', nombre) if nombre not in tipos else nombre
+        assert base in tipos, linea
+        etiquetas = tuple(sorted(ETIQUETA.findall(etiquetas or '')))
+        assert (nombre, etiquetas) not in valores
+        valores[nombre, etiquetas] = float(valor)
+    return tipos, valores
+
+
+def test_formato_del_registro():
+    registro = metricas.Registro()
+    contador = registro.registrar(metricas.Contador('prueba_total', 'Ayuda', ('ruta',)))
+    histograma = registro.registrar(metricas.Histograma('prueba_segundos', 'Ayuda', (0.1, 1), ('ruta',)))
+    registro.registrar(metricas.Medidor('prueba_medidor', 'Ayuda', lambda: 2.5))
+    contador.sumar('a "b"\\\n')
+    contador.sumar('a "b"\\\n', cantidad=2)
+    for valor in (0.05, 0.1, 0.5, 3):
+        histograma.observar(valor, 'x')
+
+    texto = registro.exponer()
+    assert 'prueba_total{ruta="a \\"b\\"\\\\\\n"} 3\n' in texto
+    tipos, valores = leer_exposicion(texto)
+    assert tipos == {'prueba_total': 'counter', 'prueba_segundos': 'histogram', 'prueba_medidor': 'gauge'}
+    # Los baldes son acumulados e incluyen los valores iguales al límite
+    assert [valores['prueba_segundos_bucket', (('le', le), ('ruta', 'x'))] for le in ('0.1', '1', '+Inf')] \
+        == [2, 3, 4]
+    assert valores['prueba_segundos_count', (('ruta', 'x'),)] == 4
+    assert valores['prueba_segundos_sum', (('ruta', 'x'),)] == pytest.approx(3.65)
+    assert valores['prueba_medidor', ()] == 2.5
+
+
+def test_busquedas_cuentan_el_trabajo():
+    grafo = Grafo()
+    grafo.aplicar_lote([('agregar_arista', f"C{i}", f"C{i + 1}", 1, 1, 1) for i in range(10)])
+    antes = leer_exposicion(metricas.REGISTRO.exponer())[1]
+    grafo.dijkstra('C0', 'C10', 'tiempo', 'bidireccional')
+    despues = leer_exposicion(metricas.REGISTRO.exponer())[1]
+
+    def diferencia(nombre, *etiquetas):
+        clave = (nombre, tuple(sorted(etiquetas)))
+        return despues.get(clave, 0) - antes.get(clave, 0)
+
+    etiquetas = (('criterio', 'tiempo'), ('metodo', 'bidireccional'))
+    assert diferencia('grafo_busquedas_total', *etiquetas) == 1
+    asentados = diferencia('grafo_busqueda_asentados_total', *etiquetas)
+    assert 1 <= asentados <= 11
+    assert diferencia('grafo_busqueda_empujes_total', *etiquetas) >= asentados
+    assert diferencia('grafo_busqueda_asentados_count', ('metodo', 'bidireccional')) == 1
+
+
+def test_metricas_apagadas(monkeypatch):
+    monkeypatch.setattr(metricas, 'activo', False)
+    grafo = Grafo()
+    grafo.agregar_arista('A', 'B', 1)
+    antes = metricas.REGISTRO.exponer()
+    assert grafo.dijkstra('A', 'B') == (['A', 'B'], 1)
+    assert metricas.REGISTRO.exponer() == antes
+
+
+def test_api_metrics(aplicacion, cliente):
+    cliente.get('/api/ruta', query_string={"origen": "La Paz", "destino": "Oruro"})
+    cliente.get('/api/ruta', query_string={"origen": "La Paz", "destino": "No existe"})
+    respuesta = cliente.get('/metrics')
+    assert respuesta.mimetype == 'text/plain'
+    assert respuesta.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+    tipos, valores = leer_exposicion(respuesta.get_data(as_text=True))
+    assert tipos['http_solicitudes_total'] == 'counter' and tipos['http_duracion_segundos'] == 'histogram'
+    for estado in ('200', '404'):
+        assert valores['http_solicitudes_total', (('endpoint', '/api/ruta'), ('estado', estado),
+                                                  ('metodo', 'GET'))] >= 1
+    mapa = aplicacion.mapa
+    assert valores['grafo_ciudades', ()] == mapa.total_ciudades()
+    assert valores['grafo_rutas', ()] == mapa.total_aristas()
+    assert valores['grafo_version', ()] == mapa.version
+    assert valores['cache_rutas_entradas', ()] == 2
+
+
+def test_api_perfilador(cliente):
+    assert cliente.post('/api/perfilador', json={"activo": "si"}).status_code == 400
+    assert cliente.post('/api/perfilador', json={"activo": True, "intervalo": 5}).status_code == 400
+    datos = cliente.post('/api/perfilador', json={"activo": True, "intervalo": 0.001, "limpiar": True}).get_json()
+    assert datos["activo"] and datos["intervalo"] == 0.001
+    try:
+        limite = time.monotonic() + 5
+        while metricas.perfilador.resumen()["muestras"] < 3 and time.monotonic() < limite:
+            time.sleep(0.01)
+    finally:
+        datos = cliente.post('/api/perfilador', json={"activo": False}).get_json()
+    assert not datos["activo"] and datos["muestras"] >= 3
+    resumen = cliente.get('/api/perfilador', query_string={"limite": 2}).get_json()
+    assert 0 < len(resumen["pilas"]) <= 2 and 0 < len(resumen["funciones"]) <= 2
@@ -0,0 +1,69 @@
+import random
+
+import pytest
+
+from grafo import CRITERIOS
+from utilidades import (INF, caminos_simples, costo_camino, costos, costos_ponderados,
+                        dijkstra_referencia, grafo_aleatorio)
+
+
+def frente_pareto(vectores):
+    """Vectores de costos distintos que ningún otro domina"""
+    vectores = set(vectores)
+    return {a for a in vectores
+            if not any(b != a and all(x <= y for x, y in zip(b, a)) for b in vectores)}
+
+
+@pytest.mark.parametrize('semilla', range(25))
+def test_frente_igual_a_la_enumeracion(semilla):
+    grafo = grafo_aleatorio(semilla, ciudades=8, carreteras=8 + semilla % 8, costo_max=10)
+    ady = {criterio: costos(grafo, criterio) for criterio in CRITERIOS}
+    ciudades = sorted(grafo.adyacencia)
+    for origen in ciudades:
+        for destino in ciudades:
+            caminos = caminos_simples(ady['distancia'], origen, destino)
+            esperado = frente_pareto(
+                tuple(costo_camino(ady[criterio], camino) for criterio in CRITERIOS)
+                for camino in caminos)
+
+            rutas = grafo.rutas_pareto(origen, destino)
+            vectores = [tuple(ruta[criterio] for criterio in CRITERIOS) for ruta in rutas]
+            assert set(vectores) == esperado, (origen, destino)
+            assert len(vectores) == len(esperado)
+            assert [v[0] for v in vectores] == sorted(v[0] for v in vectores)
+            for ruta, vector in zip(rutas, vectores):
+                camino = ruta["camino"]
+                assert camino[0] == origen and camino[-1] == destino
+                assert len(set(camino)) == len(camino)
+                assert tuple(costo_camino(ady[criterio], camino) for criterio in CRITERIOS) == vector
+
+
+@pytest.mark.parametrize('semilla', range(10))
+def test_max_rutas_corta_el_frente(semilla):
+    grafo = grafo_aleatorio(semilla, ciudades=8, carreteras=14, costo_max=10)
+    completo = {tuple(ruta[c] for c in CRITERIOS) for ruta in grafo.rutas_pareto('C0', 'C1')}
+    for max_rutas in (1, 2):
+        rutas = grafo.rutas_pareto('C0', 'C1', max_rutas)
+        assert len(rutas) == min(max_rutas, len(completo))
+        assert {tuple(ruta[c] for c in CRITERIOS) for ruta in rutas} <= completo
+
+
+@pytest.mark.parametrize('semilla', range(20))
+def test_ruta_ponderada_igual_a_dijkstra(semilla):
+    azar = random.Random(semilla)
+    grafo = grafo_aleatorio(semilla, ciudades=12, carreteras=24)
+    for pesos in ({'distancia': 1, 'tiempo': 0.5, 'peaje': 2},
+                  {'tiempo': 1},
+                  {criterio: azar.uniform(0, 3) for criterio in CRITERIOS}):
+        ady = costos_ponderados(grafo, pesos)
+        for origen in ady:
+            esperadas = dijkstra_referencia(ady, origen)
+            for destino in ady:
+                camino, costo = grafo.ruta_ponderada(origen, destino, pesos)
+                esperado = esperadas.get(destino, INF)
+                if esperado == INF:
+                    assert (camino, costo) == ([], INF)
+                    continue
+                assert costo == pytest.approx(esperado)
+                assert camino[0] == origen and camino[-1] == destino
+                assert costo_camino(ady, camino) == pytest.approx(costo)
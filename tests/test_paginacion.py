@@ -0,0 +1,124 @@
+import os
+
+from almacen import AlmacenGrafo
+from grafo import Grafo
+
+
+def dos_workers(tmp_path):
+    """
+    Dos Grafo sobre el mismo almacén, como dos workers: el primero elimina
+    ciudades (quedan huecos en sus ids) y el segundo carga esos cambios de
+    la base, porque nadie publicó el snapshot
+    """
+    ruta = str(tmp_path / 'grafo.db')
+    a = Grafo(AlmacenGrafo(ruta))
+    a.aplicar_lote([('agregar_arista', f"C{i}", f"C{(i * 7 + 3) % 30}", i, i, i) for i in range(30)])
+    a.guardar_snapshot()
+    b = Grafo.desde_almacen(AlmacenGrafo(ruta))
+    a.eliminar_ciudad('C2')
+    a.eliminar_ciudad('C5')
+    a.agregar_arista('C1', 'Nueva', 1, 1, 1)
+    a.eliminar_arista('C3', 'C24')
+    assert b.sincronizar()
+    assert b.version == a.version
+    return a, b
+
+
+def test_ids_iguales_tras_recargar_de_la_base(tmp_path):
+    a, b = dos_workers(tmp_path)
+    assert b._ids == a._ids
+    assert b.compilado().nombres == a.compilado().nombres
+    # Un tercero que arranca del snapshot también numera igual
+    a.guardar_snapshot()
+    c = Grafo.desde_almacen(AlmacenGrafo(str(tmp_path / 'grafo.db')))
+    assert c._ids == a._ids
+
+
+def test_cursores_entre_workers(tmp_path):
+    a, b = dos_workers(tmp_path)
+    todas = list(a.filtrar_ciudades())
+    paginas, despues, workers = [], -1, [a, b]
+    while True:
+        pagina = [fila for fila, _ in zip(workers[len(paginas) % 2].filtrar_ciudades(despues=despues),
+                                          range(4))]
+        if not pagina:
+            break
+        paginas.extend(pagina)
+        despues = pagina[-1][0]
+    assert paginas == todas
+
+    todas = list(a.filtrar_aristas())
+    paginas, despues = [], (-1, -1)
+    while True:
+        pagina = [fila for fila, _ in zip(workers[len(paginas) % 2].filtrar_aristas(despues=despues),
+                                          range(5))]
+        if not pagina:
+            break
+        paginas.extend(pagina)
+        despues = pagina[-1][0]
+    assert paginas == todas
+
+
+def test_api_paginas_alternando_workers(tmp_path, aplicacion, monkeypatch):
+    cliente = aplicacion.app.test_client()
+    a = aplicacion.mapa
+    a.eliminar_ciudad('Oruro')
+    a.agregar_arista('Tarija', 'Villazón', 190, 180, 5)
+    a.agregar_arista('Villazón', 'Tupiza', 90, 80, 0)
+    # El segundo worker lee la base: su snapshot quedó atrás
+    b = Grafo.desde_almacen(AlmacenGrafo(a.almacen.ruta_db))
+    assert b.version == a.version
+    workers = [a, b]
+
+    def filas(ruta, datos):
+        if ruta == '/api/rutas':
+            return [(r["origen"], r["destino"], r["distancia"]) for r in datos["rutas"]]
+        return [(c["nombre"], c["conexiones"]) for c in datos]
+
+    for ruta in ('/api/ciudades', '/api/rutas'):
+        monkeypatch.setattr(aplicacion, 'mapa', a)
+        completo = filas(ruta, cliente.get(ruta).get_json())
+        vistos, url, paso = [], f'{ruta}?limite=2', 0
+        while url:
+            monkeypatch.setattr(aplicacion, 'mapa', workers[paso % 2])
+            respuesta = cliente.get(url)
+            assert respuesta.status_code == 200
+            vistos.extend(filas(ruta, respuesta.get_json()))
+            url = respuesta.headers.get('Link', '').partition('>')[0].lstrip('<') or None
+            paso += 1
+        # Ni filas repetidas ni salteadas (sin paginar, /api/rutas se ordena por origen)
+        assert sorted(vistos) == sorted(completo)
+        assert len(set(vistos)) == len(vistos)
+        assert paso > 2
+
+
+def test_etag_misma_respuesta_en_todos_los_workers(tmp_path, aplicacion, monkeypatch):
+    cliente = aplicacion.app.test_client()
+    a = aplicacion.mapa
+    a.eliminar_ciudad('La Paz')
+    b = Grafo.desde_almacen(AlmacenGrafo(a.almacen.ruta_db))
+    respuestas = []
+    for worker in (a, b):
+        monkeypatch.setattr(aplicacion, 'mapa', worker)
+        respuestas.append(cliente.get('/api/ciudades?limite=3&cursor=1'))
+    assert respuestas[0].headers['ETag'] == respuestas[1].headers['ETag']
+    assert respuestas[0].get_data() == respuestas[1].get_data()
+    assert respuestas[0].headers['X-Cursor-Siguiente'] == respuestas[1].headers['X-Cursor-Siguiente']
+
+
+def test_etag_304_hasta_que_cambia_el_grafo(cliente, aplicacion):
+    respuesta = cliente.get('/api/ciudades?limite=3')
+    etag = respuesta.headers['ETag']
+    repetida = cliente.get('/api/ciudades?limite=3', headers={'If-None-Match': etag})
+    assert repetida.status_code == 304 and repetida.get_data() == b''
+    # Otra consulta tiene otro ETag
+    assert cliente.get('/api/ciudades?limite=4').headers['ETag'] != etag
+    aplicacion.mapa.agregar_ciudad('Uyuni')
+    nueva = cliente.get('/api/ciudades?limite=3', headers={'If-None-Match': etag})
+    assert nueva.status_code == 200 and nueva.headers['ETag'] != etag
+
+
+def test_cursor_no_valido(cliente):
+    assert cliente.get('/api/ciudades?cursor=x').status_code == 400
+    assert cliente.get('/api/rutas?cursor=1').status_code == 400
+    assert cliente.get('/api/ciudades?limite=0').status_code == 400
@@ -0,0 +1,74 @@
+import json
+
+import pytest
+
+import paralelo
+from grafo import INDICES_CRITERIO
+from utilidades import grafo_aleatorio
+
+
+@pytest.fixture(autouse=True)
+def repartir_grafos_chicos(monkeypatch):
+    """Reparte aunque el grafo sea chico, en varias tareas"""
+    monkeypatch.setattr(paralelo, 'MIN_CIUDADES', 1)
+    monkeypatch.setattr(paralelo, 'ORIGENES_POR_TAREA', 3)
+
+
+def grafo_con_huecos():
+    """Grafo con ids de ciudades eliminadas y una ciudad aislada"""
+    grafo = grafo_aleatorio(4, ciudades=20, carreteras=35)
+    grafo.eliminar_ciudad('C3')
+    grafo.eliminar_ciudad('C11')
+    grafo.agregar_ciudad('Aislada')
+    return grafo
+
+
+def test_iterar_rutas_igual_a_un_proceso():
+    compilado = grafo_con_huecos().compilado()
+    serial = list(compilado.rutas(compilado.ids.values(), INDICES_CRITERIO))
+    # Mismas rutas y en el mismo orden
+    assert list(paralelo.iterar_rutas(compilado, INDICES_CRITERIO, 2)) == serial
+
+
+def test_iterar_ndjson_igual_a_un_proceso():
+    compilado = grafo_con_huecos().compilado()
+    serial = list(compilado.rutas(compilado.ids.values(), INDICES_CRITERIO))
+    bloques = list(paralelo.iterar_ndjson(compilado, INDICES_CRITERIO, 2))
+    assert len(bloques) == -(-len(compilado.ids) // paralelo.ORIGENES_POR_TAREA)
+    texto = ''.join(bloque for bloque, _ in bloques)
+    assert [json.loads(linea) for linea in texto.splitlines()] == serial
+    conteos = {criterio: sum(c[criterio] for _, c in bloques) for criterio in INDICES_CRITERIO}
+    assert conteos == {criterio: sum(1 for r in serial if r["criterio"] == criterio)
+                       for criterio in INDICES_CRITERIO}
+
+
+def test_dejar_de_consumir():
+    compilado = grafo_con_huecos().compilado()
+    bloques = paralelo.iterar_ndjson(compilado, INDICES_CRITERIO, 2)
+    primero = next(bloques)
+    # Cerrar a medio camino cancela lo pendiente y libera la memoria compartida
+    bloques.close()
+    serial = list(compilado.rutas(list(compilado.ids.values())[:paralelo.ORIGENES_POR_TAREA],
+                                  INDICES_CRITERIO))
+    assert [json.loads(linea) for linea in primero[0].splitlines()] == serial
+
+
+def test_todas_las_rutas_del_grafo():
+    grafo = grafo_con_huecos()
+    repartida = grafo.todas_las_rutas(procesos=2)
+    grafo.compilado().todas_rutas = None
+    assert grafo.todas_las_rutas() == repartida
+    # Con la tabla en caché no se reparte
+    assert grafo.iterar_rutas_ndjson(2) is None
+    grafo.compilado().todas_rutas = None
+    assert grafo.iterar_rutas_ndjson(1) is None
+    assert grafo.iterar_rutas_ndjson(2) is not None
+
+
+def test_api_stream_con_procesos(aplicacion, cliente, monkeypatch):
+    serial = cliente.get('/api/todas-rutas-posibles/stream').get_data(as_text=True)
+    aplicacion.mapa.compilado().todas_rutas = None
+    monkeypatch.setattr(aplicacion, 'PROCESOS_RUTAS', 2)
+    respuesta = cliente.get('/api/todas-rutas-posibles/stream')
+    assert respuesta.get_data(as_text=True) == serial
+    assert aplicacion.mapa.compilado().todas_rutas is None
@@ -0,0 +1,207 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+import servidor_async
+
+
+async def solicitar(servidor, metodo, ruta, consulta='', cuerpo=None):
+    """Hace una solicitud ASGI; retorna (estado, cabeceras, cuerpo)"""
+    cabeceras = []
+    datos = b''
+    if cuerpo is not None:
+        datos = json.dumps(cuerpo).encode()
+        cabeceras = [(b'content-type', b'application/json'), (b'content-length', str(len(datos)).encode())]
+    scope = {'type': 'http', 'method': metodo, 'path': ruta, 'query_string': consulta.encode(),
+             'headers': cabeceras, 'http_version': '1.1', 'scheme': 'http', 'root_path': ''}
+    pendientes = [{'type': 'http.request', 'body': datos, 'more_body': False}]
+    mensajes = []
+
+    async def recibir():
+        return pendientes.pop(0) if pendientes else {'type': 'http.disconnect'}
+
+    async def enviar(mensaje):
+        mensajes.append(mensaje)
+
+    await servidor(scope, recibir, enviar)
+    inicio, *cuerpos = mensajes
+    assert inicio['type'] == 'http.response.start'
+    return inicio['status'], dict(inicio['headers']), b''.join(m.get('body', b'') for m in cuerpos)
+
+
+async def esperar_que(condicion, limite=5):
+    fin = time.monotonic() + limite
+    while not condicion() and time.monotonic() < fin:
+        await asyncio.sleep(0.001)
+
+
+def total(contador):
+    return sum(valor for *_, valor in contador.muestras())
+
+
+@pytest.fixture
+def servidor(aplicacion, monkeypatch):
+    """Retorna una función que arma un ServidorAsync sobre el grafo de la prueba"""
+    monkeypatch.setattr(servidor_async, 'mapa', aplicacion.mapa)
+    servidores = []
+
+    def crear(**opciones):
+        servidores.append(servidor_async.ServidorAsync(aplicacion.app, **opciones))
+        return servidores[-1]
+    yield crear
+    for creado in servidores:
+        creado.ejecutor.shutdown(cancel_futures=True)
+        creado.sincronizador.shutdown()
+
+
+@pytest.fixture
+def bloqueo(monkeypatch):
+    """Hace que los cálculos de ruta esperen a `liberar`; cuenta los que empiezan"""
+    liberar = threading.Event()
+    llamadas = []
+    respuesta_ruta = servidor_async.respuesta_ruta
+
+    def calcular(*consulta):
+        llamadas.append(consulta)
+        liberar.wait(5)
+        return respuesta_ruta(*consulta)
+
+    monkeypatch.setattr(servidor_async, 'respuesta_ruta', calcular)
+    yield liberar, llamadas
+    liberar.set()
+
+
+def test_ruta_igual_a_flask(servidor, cliente):
+    consulta = 'origen=La Paz&destino=Tarija&criterio=tiempo'
+
+    async def escenario():
+        return await solicitar(servidor(), 'GET', '/api/ruta', consulta)
+
+    estado, cabeceras, cuerpo = asyncio.run(escenario())
+    esperada = cliente.get('/api/ruta?' + consulta)
+    assert estado == 200 and cabeceras[b'x-cache'] == b'MISS'
+    assert json.loads(cuerpo) == esperada.get_json() and esperada.headers['X-Cache'] == 'HIT'
+    assert asyncio.run(solicitar(servidor(), 'GET', '/api/ruta', 'origen=La Paz'))[0] == 400
+
+
+def test_consultas_iguales_comparten_el_calculo(servidor, bloqueo):
+    liberar, llamadas = bloqueo
+    coalescidas = total(servidor_async.COALESCIDAS)
+
+    async def escenario():
+        instancia = servidor(hilos=2)
+        iguales = [asyncio.create_task(solicitar(instancia, 'GET', '/api/ruta', 'origen=La Paz&destino=Beni'))
+                   for _ in range(5)]
+        otra = asyncio.create_task(solicitar(instancia, 'GET', '/api/ruta', 'origen=Beni&destino=La Paz'))
+        await esperar_que(lambda: total(servidor_async.COALESCIDAS) - coalescidas == 4 and len(llamadas) == 2)
+        liberar.set()
+        return await asyncio.gather(*iguales), await otra
+
+    iguales, otra = asyncio.run(escenario())
+    assert sorted(llamadas) == [('Beni', 'La Paz', 'distancia', 'ch', 1),
+                                ('La Paz', 'Beni', 'distancia', 'ch', 1)]
+    assert total(servidor_async.COALESCIDAS) - coalescidas == 4
+    assert all(respuesta == iguales[0] for respuesta in iguales) and iguales[0][0] == 200
+    assert json.loads(otra[2])["camino"] == json.loads(iguales[0][2])["camino"][::-1]
+
+
+def test_no_comparte_entre_versiones(aplicacion, servidor, bloqueo):
+    liberar, llamadas = bloqueo
+
+    async def escenario():
+        instancia = servidor(hilos=2)
+        consulta = 'origen=La Paz&destino=Pando'
+        primera = asyncio.create_task(solicitar(instancia, 'GET', '/api/ruta', consulta))
+        await esperar_que(lambda: len(llamadas) == 1)
+        # Un atajo nuevo: la consulta posterior no puede recibir la ruta anterior
+        aplicacion.mapa.agregar_arista('La Paz', 'Pando', 1, 1, 1)
+        segunda = asyncio.create_task(solicitar(instancia, 'GET', '/api/ruta', consulta))
+        await esperar_que(lambda: len(llamadas) == 2)
+        liberar.set()
+        return await primera, await segunda
+
+    primera, segunda = asyncio.run(escenario())
+    assert len(llamadas) == 2
+    assert json.loads(segunda[2]) == {"origen": "La Paz", "destino": "Pando", "criterio": "distancia",
+                                      "camino": ["La Paz", "Pando"], "costo": 1}
+
+
+def test_sobrecarga_503(servidor, bloqueo):
+    liberar, llamadas = bloqueo
+
+    async def escenario():
+        instancia = servidor(hilos=1, max_pendientes=1)
+        primera = asyncio.create_task(solicitar(instancia, 'GET', '/api/ruta', 'origen=La Paz&destino=Beni'))
+        await esperar_que(lambda: len(llamadas) == 1)
+        # Una igual se une al cálculo en curso; las demás no entran
+        igual = asyncio.create_task(solicitar(instancia, 'GET', '/api/ruta', 'origen=La Paz&destino=Beni'))
+        otra = await solicitar(instancia, 'GET', '/api/ruta', 'origen=Oruro&destino=Beni')
+        flask = await solicitar(instancia, 'GET', '/api/estadisticas')
+        liberar.set()
+        return await primera, await igual, otra, flask
+
+    primera, igual, otra, flask = asyncio.run(escenario())
+    assert primera[0] == igual[0] == 200
+    for estado, cabeceras, _ in (otra, flask):
+        assert estado == 503 and cabeceras[b'retry-after'] == b'1'
+
+
+def test_tiempo_limite_504(aplicacion, servidor, bloqueo, monkeypatch):
+    liberar, _ = bloqueo
+    estadisticas = aplicacion.mapa.estadisticas
+    agregar_ciudad = aplicacion.mapa.agregar_ciudad
+    monkeypatch.setattr(aplicacion.mapa, 'estadisticas', lambda: liberar.wait(5) and estadisticas())
+    monkeypatch.setattr(aplicacion.mapa, 'agregar_ciudad',
+                        lambda *args: liberar.wait(5) and agregar_ciudad(*args))
+    vencidas = total(servidor_async.VENCIDAS)
+
+    async def escenario():
+        instancia = servidor(tiempo_limite=0.05)
+        ruta = await solicitar(instancia, 'GET', '/api/ruta', 'origen=La Paz&destino=Beni')
+        flask = await solicitar(instancia, 'GET', '/api/estadisticas')
+        # Las modificaciones no se cortan
+        alta = asyncio.create_task(solicitar(instancia, 'POST', '/api/ciudades', cuerpo={"nombre": "Uyuni"}))
+        await asyncio.sleep(0.2)
+        liberar.set()
+        return ruta, flask, await alta
+
+    ruta, flask, alta = asyncio.run(escenario())
+    assert ruta[0] == flask[0] == 504
+    assert total(servidor_async.VENCIDAS) - vencidas == 2
+    assert alta[0] == 200 and aplicacion.mapa.existe_ciudad('Uyuni')
+
+
+def test_resto_de_la_api_por_flask(aplicacion, servidor, cliente):
+    async def escenario():
+        instancia = servidor()
+        alta = await solicitar(instancia, 'POST', '/api/ciudades', cuerpo={"nombre": "Uyuni"})
+        stream = await solicitar(instancia, 'GET', '/api/todas-rutas-posibles/stream')
+        no_existe = await solicitar(instancia, 'GET', '/no-existe')
+        return alta, stream, no_existe
+
+    alta, stream, no_existe = asyncio.run(escenario())
+    assert alta[0] == 200 and json.loads(alta[2])["ciudad"] == "Uyuni"
+    assert aplicacion.mapa.existe_ciudad('Uyuni')
+    assert stream[1][b'content-type'].startswith(b'application/x-ndjson')
+    assert stream[2] == cliente.get('/api/todas-rutas-posibles/stream').get_data()
+    assert no_existe[0] == 404
+
+
+def test_ciclo_de_vida(servidor):
+    async def escenario():
+        mensajes = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+        enviados = []
+
+        async def recibir():
+            return mensajes.pop(0)
+
+        async def enviar(mensaje):
+            enviados.append(mensaje['type'])
+
+        await servidor()({'type': 'lifespan'}, recibir, enviar)
+        return enviados
+
+    assert asyncio.run(escenario()) == ['lifespan.startup.complete', 'lifespan.shutdown.complete']
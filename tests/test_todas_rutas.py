@@ -0,0 +1,102 @@
+import json
+
+import pytest
+
+from grafo import CRITERIOS
+from utilidades import costo_camino, costos, dijkstra_referencia, grafo_aleatorio
+
+
+def verificar_rutas(grafo, rutas):
+    """Una ruta por par alcanzable y criterio, con el costo mínimo y un camino que lo suma"""
+    rutas = list(rutas)
+    esperadas = 0
+    por_clave = {(r["origen"], r["destino"], r["criterio"]): r for r in rutas}
+    assert len(por_clave) == len(rutas)
+    for criterio in CRITERIOS:
+        ady = costos(grafo, criterio)
+        for origen in ady:
+            for destino, costo in dijkstra_referencia(ady, origen).items():
+                if destino == origen:
+                    continue
+                esperadas += 1
+                ruta = por_clave[(origen, destino, criterio)]
+                assert ruta["costo"] == costo
+                assert ruta["camino"][0] == origen and ruta["camino"][-1] == destino
+                assert costo_camino(ady, ruta["camino"]) == costo
+                assert ruta["paradas"] == len(ruta["camino"]) - 2
+    assert len(rutas) == esperadas
+
+
+@pytest.mark.parametrize('semilla', range(10))
+def test_todas_las_rutas_igual_a_dijkstra(semilla):
+    # Pocas carreteras: hay pares sin ruta, que no aparecen
+    grafo = grafo_aleatorio(semilla, ciudades=9, carreteras=10)
+    verificar_rutas(grafo, grafo.todas_las_rutas())
+    verificar_rutas(grafo, grafo.iterar_todas_las_rutas())
+
+
+def test_dijkstra_desde(semilla=3):
+    grafo = grafo_aleatorio(semilla)
+    for criterio in CRITERIOS:
+        ady = costos(grafo, criterio)
+        for origen in ady:
+            dist, prev = grafo.dijkstra_desde(origen, criterio)
+            assert dist == dijkstra_referencia(ady, origen)
+            assert prev[origen] is None
+            for ciudad, anterior in prev.items():
+                if anterior is not None:
+                    assert dist[anterior] + ady[anterior][ciudad] == dist[ciudad]
+    assert grafo.dijkstra_desde('No existe') == ({}, {})
+
+
+def test_tabla_en_cache_hasta_modificar():
+    grafo = grafo_aleatorio(5)
+    tabla = grafo.todas_las_rutas()
+    assert grafo.todas_las_rutas() is tabla
+    grafo.agregar_arista('C0', 'Nueva', 1, 1, 1)
+    nueva = grafo.todas_las_rutas()
+    assert nueva is not tabla
+    assert any(r["destino"] == 'Nueva' for r in nueva)
+    verificar_rutas(grafo, nueva)
+
+
+def test_api_todas_rutas_posibles(aplicacion, cliente):
+    datos = cliente.get('/api/todas-rutas-posibles').get_json()
+    mapa = aplicacion.mapa
+    assert datos["ciudades_totales"] == mapa.total_ciudades()
+    assert datos["total_rutas_calculadas"] == len(datos["rutas"])
+    assert datos["rutas_por_criterio"] == {
+        criterio: sum(1 for r in datos["rutas"] if r["criterio"] == criterio) for criterio in CRITERIOS}
+    verificar_rutas(mapa, datos["rutas"])
+
+
+def leer_ndjson(respuesta):
+    assert respuesta.mimetype == 'application/x-ndjson'
+    lineas = respuesta.get_data(as_text=True).splitlines()
+    return [json.loads(linea) for linea in lineas]
+
+
+@pytest.mark.parametrize('con_tabla', [False, True])
+def test_stream_ndjson(aplicacion, cliente, con_tabla):
+    mapa = aplicacion.mapa
+    mapa.agregar_ciudad('Aislada')
+    if con_tabla:
+        # Con la tabla ya calculada se recorre la guardada
+        mapa.todas_las_rutas()
+    *rutas, final = leer_ndjson(cliente.get('/api/todas-rutas-posibles/stream'))
+    verificar_rutas(mapa, rutas)
+    assert final == {"resumen": {
+        "total_rutas_calculadas": len(rutas),
+        "ciudades_totales": mapa.total_ciudades(),
+        "rutas_por_criterio": {criterio: sum(1 for r in rutas if r["criterio"] == criterio)
+                               for criterio in CRITERIOS}}}
+    # Mismo contenido que la respuesta completa
+    completa = cliente.get('/api/todas-rutas-posibles').get_json()
+    assert rutas == completa["rutas"]
+
+
+def test_stream_ndjson_grafo_vacio(aplicacion, cliente):
+    aplicacion.mapa.limpiar()
+    assert leer_ndjson(cliente.get('/api/todas-rutas-posibles/stream')) == [{"resumen": {
+        "total_rutas_calculadas": 0, "ciudades_totales": 0,
+        "rutas_por_criterio": {criterio: 0 for criterio in CRITERIOS}}}]
@@ -0,0 +1,57 @@
+import random
+
+import pytest
+
+from almacen import AlmacenGrafo
+from grafo import CRITERIOS, Grafo
+from utilidades import descripcion, modificar_al_azar
+
+
+def dos_grafos(tmp_path):
+    """Dos Grafo sobre el mismo almacén, como dos workers de gunicorn"""
+    ruta = str(tmp_path / 'grafo.db')
+    a = Grafo(AlmacenGrafo(ruta))
+    modificar_al_azar(a, 0, pasos=10)
+    a.guardar_snapshot()
+    return a, Grafo.desde_almacen(AlmacenGrafo(ruta))
+
+
+def verificar_iguales(a, b, azar):
+    assert descripcion(b) == descripcion(a)
+    assert b.compilado().ids == a.compilado().ids
+    ciudades = a.obtener_ciudades()
+    for _ in range(10):
+        origen, destino = azar.sample(ciudades, 2)
+        criterio = azar.choice(CRITERIOS)
+        assert b.dijkstra(origen, destino, criterio) == a.dijkstra(origen, destino, criterio)
+
+
+@pytest.mark.parametrize('publicar_snapshot', [False, True])
+def test_escritura_en_a_lectura_en_b(tmp_path, publicar_snapshot):
+    a, b = dos_grafos(tmp_path)
+    azar = random.Random(1)
+    assert not b.sincronizar()
+    for ronda in range(5):
+        # Consultas en B antes del cambio, para que tenga árboles en caché
+        b.dijkstra_desde(azar.choice(b.obtener_ciudades()))
+        modificar_al_azar(a, ronda + 1, pasos=8)
+        if publicar_snapshot:
+            a.guardar_snapshot()
+        assert b.sincronizar()
+        assert not b.sincronizar()
+        verificar_iguales(a, b, azar)
+
+
+def test_escrituras_en_los_dos(tmp_path):
+    a, b = dos_grafos(tmp_path)
+    a.agregar_arista('C0', 'Desde A', 5, 5, 5)
+    # B escribe sin haber visto el cambio de A: queda marcado para recargar
+    b.agregar_arista('C1', 'Desde B', 7, 7, 7)
+    b.eliminar_ciudad('C2')
+    assert b.sincronizar()
+    assert a.sincronizar()
+    for grafo in (a, b):
+        assert grafo.existe_arista('C0', 'Desde A')
+        assert grafo.existe_arista('C1', 'Desde B')
+        assert not grafo.existe_ciudad('C2')
+    verificar_iguales(a, b, random.Random(2))
@@ -0,0 +1,110 @@
+"""Grafos aleatorios chicos y búsquedas de referencia (Dijkstra simple, caminos simples)"""
+import heapq
+import random
+
+from grafo import Grafo, INDICES_CRITERIO
+
+INF = float('inf')
+
+
+def grafo_aleatorio(semilla, ciudades=10, carreteras=20, costo_max=20):
+    """Grafo con costos enteros al azar (incluido 0) y posiblemente desconectado"""
+    grafo = Grafo()
+    grafo.aplicar_lote(operaciones_aleatorias(semilla, ciudades, carreteras, costo_max))
+    return grafo
+
+
+def operaciones_aleatorias(semilla, ciudades=10, carreteras=20, costo_max=20):
+    """Operaciones con las que grafo_aleatorio arma el grafo"""
+    azar = random.Random(semilla)
+    nombres = [f"C{i}" for i in range(ciudades)]
+    operaciones = [('agregar_ciudad', nombre) for nombre in nombres]
+    for _ in range(carreteras):
+        ciudad1, ciudad2 = azar.sample(nombres, 2)
+        operaciones.append(('agregar_arista', ciudad1, ciudad2, azar.randint(0, costo_max),
+                            azar.randint(0, costo_max), azar.randint(0, costo_max)))
+    return operaciones
+
+
+def descripcion(grafo):
+    """Ciudades (con tipo y coordenadas), carreteras y versión, sin depender de los ids"""
+    ciudades = sorted((c['nombre'], c['tipo'], c.get('lat'), c.get('lon'))
+                      for c in grafo.obtener_ciudades_detalladas())
+    aristas = sorted((min(c1, c2), max(c1, c2), distancia, tiempo, peaje)
+                     for c1, c2, distancia, tiempo, peaje in grafo.aristas())
+    return ciudades, aristas, grafo.version
+
+
+def modificar_al_azar(grafo, semilla, pasos=30):
+    """Cambios al azar de todo tipo, sueltos y en lotes"""
+    azar = random.Random(semilla)
+    grafo.aplicar_lote(operaciones_aleatorias(semilla, ciudades=12, carreteras=20))
+    for paso in range(pasos):
+        ciudades = grafo.obtener_ciudades()
+        tipo = azar.choice(['arista', 'ciudad', 'ubicar', 'eliminar_ciudad', 'eliminar_arista'])
+        if tipo == 'arista':
+            grafo.agregar_arista(*azar.sample(ciudades, 2), azar.randint(1, 50), 7, 2.5)
+        elif tipo == 'ciudad':
+            grafo.agregar_ciudad(f"N{paso}", azar.choice(['normal', 'capital']))
+        elif tipo == 'ubicar':
+            grafo.ubicar_ciudad(azar.choice(ciudades), azar.uniform(-22, -10), azar.uniform(-69, -58))
+        elif tipo == 'eliminar_ciudad' and len(ciudades) > 4:
+            grafo.eliminar_ciudad(azar.choice(ciudades))
+        else:
+            aristas = list(grafo.aristas())
+            if aristas:
+                grafo.eliminar_arista(*azar.choice(aristas)[:2])
+
+
+def costos(grafo, criterio):
+    """Adyacencia {ciudad: {vecino: costo}} de un criterio"""
+    idx = INDICES_CRITERIO[criterio]
+    return {ciudad: {vecino: conexion[idx] for vecino, conexion in vecinos.items()}
+            for ciudad, vecinos in grafo.adyacencia.items()}
+
+
+def costos_ponderados(grafo, pesos):
+    """Adyacencia {ciudad: {vecino: costo}} con los criterios combinados por `pesos`"""
+    return {ciudad: {vecino: sum(pesos.get(criterio, 0) * conexion[idx]
+                                 for criterio, idx in INDICES_CRITERIO.items())
+                     for vecino, conexion in vecinos.items()}
+            for ciudad, vecinos in grafo.adyacencia.items()}
+
+
+def dijkstra_referencia(ady, origen):
+    """Distancias mínimas desde `origen`; las ciudades inalcanzables no aparecen"""
+    dist = {origen: 0}
+    pq = [(0, origen)]
+    while pq:
+        d, u = heapq.heappop(pq)
+        if d > dist[u]:
+            continue
+        for v, costo in ady[u].items():
+            if d + costo < dist.get(v, INF):
+                dist[v] = d + costo
+                heapq.heappush(pq, (d + costo, v))
+    return dist
+
+
+def caminos_simples(ady, origen, destino):
+    """Todos los caminos sin ciudades repetidas de origen a destino"""
+    caminos = []
+    camino = [origen]
+
+    def explorar(u):
+        if u == destino:
+            caminos.append(list(camino))
+            return
+        for v in ady[u]:
+            if v not in camino:
+                camino.append(v)
+                explorar(v)
+                camino.pop()
+
+    explorar(origen)
+    return caminos
+
+
+def costo_camino(ady, camino):
+    """Costo de un camino; falla si usa una carretera que no existe"""
+    return sum(ady[u][v] for u, v in zip(camino, camino[1:]))